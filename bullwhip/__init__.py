@@ -0,0 +1,62 @@
+"""Bullwhip effect simulation of a four-tier beer supply chain.
+
+Importing the package has no side effects and does not load plotly or NumPy; the vectorized
+engines live in ``bullwhip.batch`` (four-tier chain, with compact-precision runs in
+``bullwhip.compact`` and per-SKU runs over memory-mapped demand files in ``bullwhip.sku``) and
+``bullwhip.network`` (any acyclic network), the pluggable ordering policies of the batch engine and the
+object model in ``bullwhip.policies``, the event-driven engine for sparse, long-lead-time
+networks in ``bullwhip.events``, the analytic amplification of the linearized chain in
+``bullwhip.analytic``, early stopping of periodic deterministic runs in ``bullwhip.steadystate``, the
+asyncio server for interactive sessions in ``bullwhip.server`` (load-tested by ``bullwhip.loadtest``),
+and the command-line entry point in ``bullwhip.cli``.
+"""
+
+from .cache import ResultCache
+from .config import DEFAULT_CONFIG, SimulationConfig
+from .model import (
+    QUEUE_OVERFLOW_COALESCE,
+    QUEUE_OVERFLOW_DROP,
+    QUEUE_OVERFLOW_GROW,
+    QUEUE_OVERFLOW_RAISE,
+    Customer,
+    Distributor,
+    Factory,
+    Retailer,
+    SupplyChainActor,
+    SupplyChainQueue,
+    Wholesaler,
+)
+from .profiling import PhaseProfiler
+from .simulation import SimulationResult, continue_simulation, run_simulation, start_simulation
+from .snapshot import SimulationSnapshot
+from .statistics import SupplyChainStatistics
+from .streaming import LoadStreamedStatistics, StreamingStatistics
+from .sweep import config_grid, run_sweep
+
+__all__ = [
+    "DEFAULT_CONFIG",
+    "QUEUE_OVERFLOW_COALESCE",
+    "QUEUE_OVERFLOW_DROP",
+    "QUEUE_OVERFLOW_GROW",
+    "QUEUE_OVERFLOW_RAISE",
+    "Customer",
+    "Distributor",
+    "Factory",
+    "LoadStreamedStatistics",
+    "PhaseProfiler",
+    "ResultCache",
+    "Retailer",
+    "SimulationConfig",
+    "SimulationResult",
+    "SimulationSnapshot",
+    "SupplyChainActor",
+    "SupplyChainQueue",
+    "StreamingStatistics",
+    "SupplyChainStatistics",
+    "Wholesaler",
+    "config_grid",
+    "continue_simulation",
+    "run_simulation",
+    "run_sweep",
+    "start_simulation",
+]
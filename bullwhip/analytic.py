@@ -0,0 +1,200 @@
+"""Analytic variance amplification of the linearized four-tier chain, for screening policies without simulating.
+
+While every tier has stock left after shipping and stays at or below its target stock, a tier ships
+exactly the orders it receives and orders ``T - E + p * (P - SL)``. Here E is its effective inventory,
+SL the goods it has on order and p its pipeline weight. Each tier is then a linear filter of the orders
+it receives, with transfer function
+
+    G(z) = 1 / (1 + (p - 1) z^-1 + (1 - p) z^-λ)
+
+Its lead time λ is 2L - 1 weeks for the three lower tiers and L weeks for the factory, L being
+config.queueDelayWeeks. The backlog weight only acts in weeks with a backlog, which lie outside this
+regime. The variance of every tier's orders, for white or AR(1) demand, follows exactly from Åström's
+integral of the chain's transfer function. analyze_amplification reports which regime every combination
+is in, and estimate_amplification simulates the combinations the linear model does not cover.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .batch import NUMBER_OF_TIERS, BatchSupplyChain
+from .config import DEFAULT_CONFIG
+from .demand import AR1Demand, NormalDemand, PoissonDemand
+from .metrics import BullwhipMetrics
+
+# Regime of a policy combination; only LINEAR answers are analytic, the rest name the first violated assumption
+LINEAR, NEGATIVE_DEMAND, UNSTABLE, STOCKOUT, ABOVE_TARGET, NEGATIVE_ORDER = range(6)
+REGIME_NAMES = ('linear', 'negativeDemand', 'unstable', 'stockout', 'aboveTarget', 'negativeOrder')
+
+# Standard deviations every signal must stay away from a nonlinearity for the linear answer to count
+DEFAULT_SIGMA_MARGIN = 3.0
+
+# Replications simulated at a time by estimate_amplification
+SIMULATION_BATCH_REPLICATIONS = 65536
+
+def DemandSpectrum(demandGenerator):
+    # (mean, variance, phi) of a stationary demand generator, phi being its AR(1) coefficient (0 for white noise)
+    if isinstance(demandGenerator, PoissonDemand):
+        return float(demandGenerator.mean), float(demandGenerator.mean), 0.0
+    if isinstance(demandGenerator, NormalDemand):
+        return float(demandGenerator.mean), float(demandGenerator.std) ** 2, 0.0
+    if isinstance(demandGenerator, AR1Demand):
+        phi = float(demandGenerator.phi)
+        return float(demandGenerator.mean), float(demandGenerator.sigma) ** 2 / (1.0 - phi ** 2), phi
+    raise ValueError(f"{demandGenerator} has no stationary white-noise or AR(1) spectrum; simulate it instead")
+
+def LeadTimes(config):
+    # Weeks from placing an order to receiving it, per tier: the order and delivery queues of a link take
+    # 2L - 1 weeks between them, the factory's production queue L weeks
+    return (2 * config.queueDelayWeeks - 1,) * (NUMBER_OF_TIERS - 1) + (config.queueDelayWeeks,)
+
+def PrimedPipeline(config):
+    # Default target pipeline of every tier: its supply line right after priming, as in BatchSupplyChain
+    linkPipeline = 2 * config.queueDelayWeeks * config.customerInitialOrders + config.initialCurrentOrders
+    return np.array([linkPipeline] * (NUMBER_OF_TIERS - 1) + [config.queueDelayWeeks * config.customerInitialOrders],
+                    dtype=float)
+
+def TierDenominator(pipelineWeight, leadTime):
+    # (..., leadTime + 1) coefficients in z^-1 of 1 / G(z) for a batch of pipeline weights
+    coefficients = np.zeros(pipelineWeight.shape + (leadTime + 1,))
+    coefficients[..., 0] = 1.0
+    coefficients[..., 1] += pipelineWeight - 1.0
+    coefficients[..., leadTime] += 1.0 - pipelineWeight
+    return coefficients
+
+def PolynomialProduct(a, b):
+    # Batched product of polynomials given as (..., degree + 1) coefficient arrays
+    a, b = np.broadcast_arrays(a[..., :, None], b[..., None, :])
+    product = np.zeros(a.shape[:-2] + (a.shape[-2] + b.shape[-1] - 1,))
+    for i in range(a.shape[-2]):
+        product[..., i:i + b.shape[-1]] += a[..., i, :] * b[..., i, :]
+    return product
+
+def SquaredGain(numerator, denominator):
+    # Sum of the squared impulse response of numerator / denominator (polynomials in z^-1, denominator monic),
+    # i.e. the output variance for unit white noise, by Åström's recursion, and whether the filter is stable
+    # Unstable filters get an infinite gain
+    n = denominator.shape[-1] - 1
+    a = denominator
+    b = np.zeros(np.broadcast_shapes(numerator.shape[:-1], a.shape[:-1]) + (n + 1,))
+    b[..., :numerator.shape[-1]] = numerator
+    gain = np.zeros(b.shape[:-1])
+    stable = np.ones(b.shape[:-1], dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for k in range(n, 0, -1):
+            alpha = a[..., k] / a[..., 0]
+            beta = b[..., k] / a[..., 0]
+            stable &= np.abs(alpha) < 1.0
+            gain += beta * b[..., k]
+            mirrored = a[..., k:0:-1]
+            a, b = a[..., :k] - alpha[..., None] * mirrored, b[..., :k] - beta[..., None] * mirrored
+        gain += b[..., 0] ** 2 / a[..., 0]
+    return np.where(stable, gain, np.inf), stable
+
+@dataclass
+class AnalyticAmplification:
+    # Linear-model answer for a batch of policy combinations: (..., tiers) arrays per tier and the (...,)
+    # regime of every combination (LINEAR or the first nonlinearity it runs into)
+    amplification: np.ndarray
+    orderStd: np.ndarray
+    meanEffectiveInventory: np.ndarray
+    effectiveInventoryStd: np.ndarray
+    regime: np.ndarray
+
+    @property
+    def valid(self):
+        # (...,) mask of combinations whose amplification the linear model answers
+        return self.regime == LINEAR
+
+def analyze_amplification(config=DEFAULT_CONFIG, demandGenerator=NormalDemand(), pipelineWeight=0.0, targetStock=None,
+                          targetPipeline=None, sigmaMargin=DEFAULT_SIGMA_MARGIN):
+    # Stationary variance amplification of every tier from the linearized chain, without simulating
+    # 'pipelineWeight', 'targetStock' (default config.targetStock) and 'targetPipeline' (default: the primed
+    # pipeline) broadcast to (..., tiers), so one call screens a whole batch of policies
+    # A combination is LINEAR only if the chain is stable and, 'sigmaMargin' standard deviations around the
+    # equilibrium, demand is not clipped at zero, every tier keeps stock, stays at or below its target and orders
+    # a positive amount; other regimes need estimate_amplification or a simulation
+    mean, variance, phi = DemandSpectrum(demandGenerator)
+    innovationVariance = variance * (1.0 - phi ** 2)
+    leadTimes = LeadTimes(config)
+    targetStock = config.targetStock if targetStock is None else targetStock
+    targetPipeline = PrimedPipeline(config) if targetPipeline is None else targetPipeline
+    pipelineWeight, targetStock, targetPipeline = (
+        np.asarray(value, dtype=float) for value in np.broadcast_arrays(pipelineWeight, targetStock, targetPipeline))
+    shape = np.broadcast_shapes(pipelineWeight.shape, (NUMBER_OF_TIERS,))
+    pipelineWeight, targetStock, targetPipeline = (np.broadcast_to(value, shape)
+                                                   for value in (pipelineWeight, targetStock, targetPipeline))
+
+    gains = np.empty(shape)
+    inventoryGains = np.empty(shape)
+    stable = np.ones(shape[:-1], dtype=bool)
+    chainDenominator = np.array([1.0]) if phi == 0.0 else np.array([1.0, -phi])  # Demand filter
+    for tier in range(NUMBER_OF_TIERS):
+        # Orders of this tier are demand passed through the filters of every tier downstream and itself
+        weight = pipelineWeight[..., tier]
+        chainDenominator = PolynomialProduct(chainDenominator, TierDenominator(weight, leadTimes[tier]))
+        gains[..., tier], tierStable = SquaredGain(np.ones(1), chainDenominator)
+        # Effective inventory is -(1 + p * (z^-1 + ... + z^-(λ - 1))) times the orders
+        inventoryNumerator = np.repeat(weight[..., None], leadTimes[tier], axis=-1)
+        inventoryNumerator[..., 0] = 1.0
+        inventoryGains[..., tier], _ = SquaredGain(inventoryNumerator, chainDenominator)
+        stable &= tierStable
+
+    orderStd = np.sqrt(gains * innovationVariance)
+    inventoryStd = np.sqrt(inventoryGains * innovationVariance)
+    supplyLine = (np.array(leadTimes) - 1) * mean
+    meanInventory = targetStock - mean + pipelineWeight * (targetPipeline - supplyLine)
+
+    margin = sigmaMargin
+    clipsDemand = not isinstance(demandGenerator, PoissonDemand) and mean - margin * np.sqrt(variance) < 0.0
+    with np.errstate(invalid='ignore'):
+        conditions = [np.broadcast_to(clipsDemand, stable.shape),
+                      ~stable,
+                      np.any(meanInventory - margin * inventoryStd < 0.0, axis=-1),
+                      np.any(meanInventory + margin * inventoryStd > targetStock, axis=-1),
+                      np.any(mean - margin * orderStd < 0.0, axis=-1)]
+    regime = np.select(conditions, [NEGATIVE_DEMAND, UNSTABLE, STOCKOUT, ABOVE_TARGET, NEGATIVE_ORDER], LINEAR)
+    amplification = gains * (1.0 - phi ** 2)
+    return AnalyticAmplification(amplification, orderStd, meanInventory, inventoryStd, regime)
+
+def SimulateAmplification(config, demand, pipelineWeight, targetStock, targetPipeline, warmupWeeks):
+    # (combinations, tiers) amplification of (combinations, tiers) policies, each played against every demand row
+    numCombinations = pipelineWeight.shape[0]
+    numScenarios, weeksToPlay = demand.shape
+    policies = {name: np.repeat(values, numScenarios, axis=0) for name, values in
+                (('pipelineWeight', pipelineWeight), ('targetStock', targetStock), ('targetPipeline', targetPipeline))}
+    chain = BatchSupplyChain(numCombinations * numScenarios, np.tile(demand, (numCombinations, 1)), config, **policies)
+    metrics = BullwhipMetrics(chain.numReplications, warmupWeeks=warmupWeeks)
+    for thisWeek in range(weeksToPlay):
+        chain.TakeTurn(thisWeek)
+        metrics.UpdateFromChain(chain)
+    amplification = metrics.VarianceAmplification().reshape(numCombinations, numScenarios, NUMBER_OF_TIERS)
+    with np.errstate(invalid='ignore'):
+        return np.nanmean(amplification, axis=1)
+
+def estimate_amplification(config=DEFAULT_CONFIG, demandGenerator=NormalDemand(), pipelineWeight=0.0, targetStock=None,
+                           targetPipeline=None, sigmaMargin=DEFAULT_SIGMA_MARGIN, numReplications=64, seed=0,
+                           warmupWeeks=5):
+    # (..., tiers) variance amplification of every combination: analytic where the linear model holds, and
+    # otherwise the mean over 'numReplications' simulated runs of config.weeksToPlay weeks (the first
+    # 'warmupWeeks' left out) that every fallback combination plays with the same demand
+    # Returns the amplification and the AnalyticAmplification, whose 'valid' mask tells which answers are analytic
+    analytic = analyze_amplification(config, demandGenerator, pipelineWeight, targetStock, targetPipeline, sigmaMargin)
+    amplification = analytic.amplification.copy()
+    fallback = np.flatnonzero(~analytic.valid)
+    if fallback.size == 0:
+        return amplification, analytic
+
+    shape = amplification.shape
+    policies = [np.broadcast_to(np.asarray(value, dtype=float), shape).reshape(-1, NUMBER_OF_TIERS)
+                for value in (pipelineWeight, config.targetStock if targetStock is None else targetStock,
+                              PrimedPipeline(config) if targetPipeline is None else targetPipeline)]
+    demand = demandGenerator.Generate(numReplications, config.weeksToPlay, seed=seed)
+    flatAmplification = amplification.reshape(-1, NUMBER_OF_TIERS)
+    chunkCombinations = max(1, SIMULATION_BATCH_REPLICATIONS // numReplications)
+    for first in range(0, fallback.size, chunkCombinations):
+        combinations = fallback[first:first + chunkCombinations]
+        flatAmplification[combinations] = SimulateAmplification(
+            config, demand, *(policy[combinations] for policy in policies), warmupWeeks)
+    return amplification, analytic
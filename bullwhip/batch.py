@@ -0,0 +1,257 @@
+"""Vectorized engine stepping many replications of the four-tier chain in lock-step."""
+
+import numpy as np
+
+from .config import DEFAULT_CONFIG
+from .policies import AnchorAndAdjustPolicy, PolicyState
+
+# Column index of each actor in the (replications, tiers) state arrays
+RETAILER, WHOLESALER, DISTRIBUTOR, FACTORY = 0, 1, 2, 3
+NUMBER_OF_TIERS = 4
+
+class BatchSupplyChainQueue:
+
+    def __init__(self, queueLength, numReplications, dtype=np.float64):
+        # Vectorized counterpart of SupplyChainQueue holding one queue per replication
+        # All replications push and pop in lock-step, so the fill level is shared and only the contents differ
+        self.queueLength = queueLength
+        self.data = np.zeros((max(queueLength, 1), numReplications), dtype=dtype)  # Circular buffer, one contiguous row per slot
+        self.head = 0                   # Slot holding the oldest envelope
+        self.size = 0                   # Number of envelopes currently in the queue
+        return
+
+    def PushEnvelope(self, numberOfCasesToOrder):
+        # Same contract as SupplyChainQueue.PushEnvelope: the order is dropped when the queue is full
+        orderSuccessfullyPlaced = False
+
+        if self.size < self.queueLength:
+            self.data[(self.head + self.size) % self.queueLength] = numberOfCasesToOrder
+            self.size += 1
+            orderSuccessfullyPlaced = True
+
+        return orderSuccessfullyPlaced
+
+    def PopEnvelope(self):
+        # Retrieve the front envelope of every replication, or zeros if the queue is empty
+        if self.size >= 1:
+            quantityDelivered = self.data[self.head].copy()
+            self.head = (self.head + 1) % self.queueLength
+            self.size -= 1
+        else:
+            quantityDelivered = np.zeros(self.data.shape[1], dtype=self.data.dtype)
+
+        return quantityDelivered
+
+    def PipelineInventory(self):
+        # Total quantity queued in every replication, summed oldest first like SupplyChainQueue.PipelineInventory
+        slots = (self.head + np.arange(self.size)) % max(self.queueLength, 1)
+        return self.data[slots].sum(axis=0)
+
+def TierColumns(value, numReplications, dtype):
+    # (replications, tiers) array filled with 'value', laid out tier by tier, so the column of one tier
+    # that every step of its turn works on is contiguous
+    return np.full((NUMBER_OF_TIERS, numReplications), value, dtype=dtype).T
+
+class BatchSupplyChain:
+
+    def __init__(self, numReplications, customerOrders=None, config=DEFAULT_CONFIG,
+                 backlogWeight=0.5, targetStock=None, pipelineWeight=0.0, targetPipeline=None,
+                 storageCostPerUnit=None, backorderPenaltyCostPerUnit=None, dtype=np.float64, policy=None):
+        # Simulate 'numReplications' independent copies of the four-tier chain in lock-step
+        # 'customerOrders' is an optional (replications, weeks) demand matrix; by default every
+        # replication follows the Customer.CalculateOrder pattern
+        # The ordering policy parameters broadcast to (replications, tiers), so every replication and
+        # tier can run its own policy: 'backlogWeight' scales the backlog anchor, 'targetStock' defaults
+        # to config.targetStock, and 'pipelineWeight' corrects the order by that fraction of the gap
+        # between 'targetPipeline' (default: the primed pipeline) and the goods already on order
+        # 'policy' is any other OrderingPolicy (see bullwhip.policies) and replaces these four parameters
+        # 'storageCostPerUnit' and 'backorderPenaltyCostPerUnit' broadcast the same way and default to the config
+        # 'dtype' is the float type of the state, the queues and the recorded history; float32 halves their
+        # memory at the error bounds documented in bullwhip.compact
+        self.numReplications = numReplications
+        self.config = config
+        self.dtype = np.dtype(dtype)
+        self.customerOrders = None if customerOrders is None else np.asarray(customerOrders, dtype=dtype)
+
+        # Actor state, one column per tier (see RETAILER ... FACTORY)
+        shape = (numReplications, NUMBER_OF_TIERS)
+        self.currentStock = TierColumns(config.initialStock, numReplications, dtype)
+        self.currentOrders = TierColumns(config.initialCurrentOrders, numReplications, dtype)
+        self.costsIncurred = TierColumns(config.initialCost, numReplications, dtype)
+        self.lastOrderQuantity = TierColumns(0, numReplications, dtype)
+        self.lastIncomingOrders = TierColumns(0, numReplications, dtype)     # Orders each actor received this week
+        self.lastDeliveryQuantity = TierColumns(0, numReplications, dtype)   # Quantity each actor shipped downstream this week
+        self.customerBeerReceived = np.zeros(numReplications, dtype=dtype)
+
+        # ordersQueues[i] carries orders from tier i up to tier i + 1 (the "top" queues of the main block)
+        # deliveriesQueues[i] carries deliveries from tier i + 1 down to tier i (the "bottom" queues)
+        self.ordersQueues = [BatchSupplyChainQueue(config.queueDelayWeeks, numReplications, dtype)
+                             for _ in range(NUMBER_OF_TIERS - 1)]
+        self.deliveriesQueues = [BatchSupplyChainQueue(config.queueDelayWeeks, numReplications, dtype)
+                                 for _ in range(NUMBER_OF_TIERS - 1)]
+        self.productionDelayQueue = BatchSupplyChainQueue(config.queueDelayWeeks, numReplications, dtype)
+
+        # Populate queues with initial orders exactly as the object model does
+        for i in range(0, config.queueDelayWeeks):
+            for queue in self.ordersQueues + self.deliveriesQueues + [self.productionDelayQueue]:
+                queue.PushEnvelope(config.customerInitialOrders)
+
+        # Ordering policy of every replication and tier, prepared with the supply line right after priming
+        if policy is None:
+            policy = AnchorAndAdjustPolicy(backlogWeight, targetStock, pipelineWeight, targetPipeline)
+        self.policy = policy
+        self.policy.Prepare(config, np.stack([self.CalcSupplyLine(tier) for tier in range(NUMBER_OF_TIERS)], axis=1))
+
+        # Cost rates of every replication and tier
+        self.storageCostPerUnit = np.broadcast_to(np.asarray(
+            config.storageCostPerUnit if storageCostPerUnit is None else storageCostPerUnit, dtype=dtype), shape)
+        self.backorderPenaltyCostPerUnit = np.broadcast_to(np.asarray(
+            config.backorderPenaltyCostPerUnit if backorderPenaltyCostPerUnit is None else backorderPenaltyCostPerUnit,
+            dtype=dtype), shape)
+
+        # Time-series history, filled in by Run as (weeks, replications, tiers) arrays
+        self.costsOverTime = None
+        self.ordersOverTime = None
+        self.effectiveInventoryOverTime = None
+        return
+
+    def CalculateCustomerOrder(self, weekNum):
+        # Customer demand for this week, either from the demand matrix or the default step pattern
+        if self.customerOrders is not None:
+            return self.customerOrders[:, weekNum]
+        if weekNum <= 5:
+            return self.config.customerInitialOrders
+        return self.config.customerSubsequentOrders
+
+    def CalcBeerToDeliver(self, tier):
+        # Vectorized SupplyChainActor.CalcBeerToDeliver for one tier across all replications
+        stock = self.currentStock[:, tier]
+        orders = self.currentOrders[:, tier]
+
+        # Ship every outstanding order when stock covers them, otherwise whatever is in stock and backorder
+        # the rest; an empty stock ships nothing. fmax and fmin skip NaN like the comparisons of the object
+        # model: a NaN backlog ships the stock on hand and a NaN stock ships nothing. The result matches the
+        # object model for the non-negative backlog the game always has, several times cheaper than nested np.where
+        deliveryQuantity = np.fmin(np.fmax(stock, 0.0), orders)
+
+        stock -= deliveryQuantity
+        orders -= deliveryQuantity
+        return deliveryQuantity
+
+    def CalcAmountToOrder(self, tier, weekNum):
+        # Vectorized SupplyChainActor.CalcAmountToOrder: the start-up order, then the ordering policy
+        if weekNum <= 4:
+            return np.full(self.numReplications, 4.0, dtype=self.dtype)  # Initial equilibrium order amount for the first few weeks
+
+        state = PolicyState(tier, self.currentStock[:, tier], self.currentOrders[:, tier],
+                            self.lastIncomingOrders[:, tier], lambda: self.CalcSupplyLine(tier))
+        return self.policy.Order(state)
+
+    def CalcSupplyLine(self, tier):
+        # Goods ordered by a tier but not yet received: its orders in transit, its supplier's backlog
+        # and the deliveries on their way down (for the factory, the beer still brewing)
+        if tier == FACTORY:
+            return self.productionDelayQueue.PipelineInventory()
+        return (self.ordersQueues[tier].PipelineInventory() + self.currentOrders[:, tier + 1]
+                + self.deliveriesQueues[tier].PipelineInventory())
+
+    def TakeTierTurn(self, tier, weekNum, customerOrder):
+        # One actor's TakeTurn, applied to every replication at once
+        stock = self.currentStock[:, tier]
+        orders = self.currentOrders[:, tier]
+
+        # 1. Receive new delivery from upstream (the factory finishes production instead)
+        if tier == FACTORY:
+            quantityReceived = self.productionDelayQueue.PopEnvelope()
+        else:
+            quantityReceived = self.deliveriesQueues[tier].PopEnvelope()
+        stock += np.fmax(quantityReceived, 0.0)  # Only positive deliveries count; fmax also maps NaN to 0
+
+        # 2. Receive new order from downstream (the retailer takes it from the customer)
+        if tier == RETAILER:
+            orders += customerOrder
+            self.lastIncomingOrders[:, tier] = customerOrder
+        else:
+            thisOrder = self.ordersQueues[tier - 1].PopEnvelope()
+            np.fmax(thisOrder, 0.0, out=thisOrder)
+            orders += thisOrder
+            self.lastIncomingOrders[:, tier] = thisOrder
+
+        # 3. Ship downstream, with the fixed delivery of 4 units during the first weeks
+        if weekNum <= 4:
+            deliveryQuantity = np.full(self.numReplications, 4.0, dtype=self.dtype)
+        else:
+            deliveryQuantity = self.CalcBeerToDeliver(tier)
+        self.lastDeliveryQuantity[:, tier] = deliveryQuantity
+        if tier == RETAILER:
+            self.customerBeerReceived += deliveryQuantity
+        else:
+            self.deliveriesQueues[tier - 1].PushEnvelope(deliveryQuantity)
+
+        # 4. Place an order upstream (the factory starts production instead)
+        amountToOrder = self.CalcAmountToOrder(tier, weekNum)
+        if tier == FACTORY:
+            self.productionDelayQueue.PushEnvelope(amountToOrder)
+        else:
+            self.ordersQueues[tier].PushEnvelope(amountToOrder)
+        self.lastOrderQuantity[:, tier] = amountToOrder
+
+        # 5. Update the costs for the current turn
+        self.costsIncurred[:, tier] += (stock * self.storageCostPerUnit[:, tier]
+                                        + orders * self.backorderPenaltyCostPerUnit[:, tier])
+        return
+
+    def TakeTurn(self, weekNum):
+        # Advance every replication by one week, actors in the same order as the main loop
+        customerOrder = self.CalculateCustomerOrder(weekNum)
+        for tier in range(NUMBER_OF_TIERS):
+            self.TakeTierTurn(tier, weekNum, customerOrder)
+        return
+
+    def CalcEffectiveInventory(self):
+        # Effective inventory of every actor in every replication
+        return self.currentStock - self.currentOrders
+
+    def Run(self, weeksToPlay=None, metrics=None, history=None):
+        # Play 'weeksToPlay' weeks (config.weeksToPlay by default) and record the same series as SupplyChainStatistics
+        # 'metrics' is an optional BullwhipMetrics updated after every week
+        # 'history' is an optional (costs, orders, effectiveInventory) triple of preallocated
+        # (weeks, replications, tiers) arrays to record into, e.g. views of a shared memory block
+        if weeksToPlay is None:
+            weeksToPlay = self.config.weeksToPlay
+        if history is None:
+            # Laid out tier by tier like the state, so recording a week copies contiguous columns
+            shape = (weeksToPlay, NUMBER_OF_TIERS, self.numReplications)
+            history = tuple(np.empty(shape, self.dtype).transpose(0, 2, 1) for _ in range(3))
+        self.costsOverTime, self.ordersOverTime, self.effectiveInventoryOverTime = history
+
+        for thisWeek in range(0, weeksToPlay):
+            self.TakeTurn(thisWeek)
+            self.costsOverTime[thisWeek] = self.costsIncurred
+            self.ordersOverTime[thisWeek] = self.lastOrderQuantity
+            np.subtract(self.currentStock, self.currentOrders, out=self.effectiveInventoryOverTime[thisWeek])
+            if metrics is not None:
+                metrics.UpdateFromChain(self)
+        return
+
+    def PlotFanChart(self, history, traceLabel, titleText, yAxisTitle, **options):
+        # Percentile fan chart of one recorded (weeks, replications, tiers) series across the batch
+        # 'options' are passed on to plotting.plot_fan_chart (percentiles, maxPoints, show)
+        from .plotting import plot_fan_chart  # Imported lazily so simulation-only processes never load plotly
+
+        if history is None:
+            raise ValueError("Nothing to plot before Run has recorded the series")
+        return plot_fan_chart(history, titleText, yAxisTitle, traceLabel, **options)
+
+    def PlotOrders(self, **options):
+        # Fan chart of the orders placed by every actor
+        return self.PlotFanChart(self.ordersOverTime, 'Orders', '*Orders Placed Over Time*', 'Orders', **options)
+
+    def PlotEffectiveInventory(self, **options):
+        # Fan chart of the effective inventory of every actor
+        return self.PlotFanChart(self.effectiveInventoryOverTime, 'Inventory', '*Effective Inventory Over Time*',
+                                 'Effective Inventory', **options)
+
+    def PlotCosts(self, **options):
+        # Fan chart of the total costs incurred by every actor
+        return self.PlotFanChart(self.costsOverTime, 'Total Cost', '*Cost Incurred Over Time*', 'Cost ($)', **options)
@@ -0,0 +1,321 @@
+"""Throughput benchmarks with JSON baselines, regression gates and an exactness check of the fast engines.
+
+Run ``python -m bullwhip.benchmark --save baseline.json`` once, then
+``python -m bullwhip.benchmark --baseline baseline.json`` after a change; the run fails when a
+benchmark loses more than ``--threshold`` of its baseline throughput, when any vectorized path, the
+event-driven engine with fixed lead times or the steady-state extrapolation no longer reproduces the
+reference TakeTurn trajectories bit for bit, when the event-driven engine no longer reproduces
+NetworkSupplyChain on random multi-supplier networks, when a batched ordering policy no longer
+matches the object model ordering by it, or when a compact-precision run leaves its documented
+error bound.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .batch import BatchSupplyChain
+from .compact import (DRAWN_DEMAND_BYTES, ERROR_BOUND_WEEKS, FixedPointPrecision, Float32Precision,
+                      WorkingBytesPerReplication, run_compact_batch)
+from .config import DEFAULT_CONFIG
+from .demand import REPLICATION_BLOCK_SIZE, AR1Demand, NormalDemand, PoissonDemand
+from .events import EventDrivenSupplyChain
+from .network import NetworkSupplyChain, SupplyNetwork
+from .policies import (AnchorAndAdjustPolicy, GroupPolicies, OrderUpToPolicy, ReorderPointPolicy, SmoothedForecastPolicy,
+                       TierPolicies, attach_policy)
+from .simulation import continue_simulation, run_simulation, start_simulation
+from .snapshot import SimulationSnapshot
+from .statistics import METRIC_NAMES
+from .steadystate import run_steady_state
+
+# Layout version of the baseline files
+BASELINE_VERSION = 1
+
+# Default share of baseline throughput a benchmark may lose before the gate fails
+DEFAULT_THRESHOLD = 0.2
+
+def ObjectModelRun(config, numRuns):
+    # Play 'numRuns' quiet runs of the object model
+    def Run():
+        for _ in range(numRuns):
+            run_simulation(config)
+        return
+    return Run, numRuns * config.weeksToPlay
+
+def BatchRun(config, numReplications, weeksToPlay):
+    # Step a BatchSupplyChain without recording, so only the engine itself is timed
+    def Run():
+        chain = BatchSupplyChain(numReplications, config=config)
+        for thisWeek in range(weeksToPlay):
+            chain.TakeTurn(thisWeek)
+        return
+    return Run, numReplications * weeksToPlay
+
+def NetworkRun(network, config, numReplications, weeksToPlay):
+    # Step a NetworkSupplyChain without recording; throughput counts replication-weeks, not node-weeks
+    def Run():
+        chain = NetworkSupplyChain(network, numReplications, config=config)
+        for thisWeek in range(weeksToPlay):
+            chain.TakeTurn(thisWeek)
+        return
+    return Run, numReplications * weeksToPlay
+
+def Benchmarks(scale=1.0):
+    # {name: (run, replicationWeeks)} of every benchmark; 'scale' shrinks or grows the work of each one
+    def Scaled(amount):
+        return max(1, int(round(amount * scale)))
+
+    return {
+        'reference': ObjectModelRun(DEFAULT_CONFIG, Scaled(200)),
+        'longHorizon': ObjectModelRun(DEFAULT_CONFIG.Replace(weeksToPlay=Scaled(50000)), 1),
+        'longDelay': ObjectModelRun(DEFAULT_CONFIG.Replace(queueDelayWeeks=64, weeksToPlay=Scaled(2000)), 1),
+        'batchReference': BatchRun(DEFAULT_CONFIG, Scaled(10000), DEFAULT_CONFIG.weeksToPlay),
+        'batchLarge': BatchRun(DEFAULT_CONFIG, Scaled(200000), DEFAULT_CONFIG.weeksToPlay),
+        'batchLongHorizon': BatchRun(DEFAULT_CONFIG, 256, Scaled(20000)),
+        'batchLongDelay': BatchRun(DEFAULT_CONFIG.Replace(queueDelayWeeks=64), Scaled(1000), 2000),
+        'wideNetwork': NetworkRun(SupplyNetwork.Layered([256, 64, 16, 4, 1]), DEFAULT_CONFIG, Scaled(256), 200),
+    }
+
+def Measure(run, replicationWeeks, repeat=3):
+    # Best-of-'repeat' throughput and the peak traced memory of one extra, untimed run
+    tracemalloc.start()
+    run()
+    _, peakMemoryBytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = min(Timed(run) for _ in range(repeat))
+    return {
+        'replicationWeeks': replicationWeeks,
+        'seconds': seconds,
+        'replicationWeeksPerSecond': replicationWeeks / seconds,
+        'peakMemoryBytes': peakMemoryBytes,
+    }
+
+def Timed(run):
+    # Wall-clock seconds of one call
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+def run_benchmarks(names=None, scale=1.0, repeat=3):
+    # Measure the named benchmarks (all by default) and return them in the baseline layout
+    benchmarks = Benchmarks(scale)
+    results = {}
+    for name in names or benchmarks:
+        run, replicationWeeks = benchmarks[name]
+        results[name] = Measure(run, replicationWeeks, repeat)
+    return {
+        'version': BASELINE_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'scale': scale,
+        'benchmarks': results,
+    }
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    # Messages for every benchmark whose throughput fell below (1 - threshold) of its baseline
+    regressions = []
+    if baseline.get('scale') != results.get('scale'):
+        regressions.append(f"baseline was measured at scale {baseline.get('scale')}, not {results.get('scale')}")
+        return regressions
+    for name, measured in results['benchmarks'].items():
+        reference = baseline['benchmarks'].get(name)
+        if reference is None:
+            continue
+        ratio = measured['replicationWeeksPerSecond'] / reference['replicationWeeksPerSecond']
+        if ratio < 1.0 - threshold:
+            regressions.append(f"{name}: {ratio:.0%} of baseline throughput")
+    return regressions
+
+def ReferenceTrajectory(config, customerOrders=None):
+    # (weeks, tiers, metrics) history of the object model, the reference every fast path must match
+    return np.array(run_simulation(config, customerOrders=customerOrders).statistics.AsArray())
+
+def EngineTrajectories(chain):
+    # (weeks, replications, tiers, metrics) history recorded by a vectorized engine's Run
+    return np.stack((chain.costsOverTime, chain.ordersOverTime, chain.effectiveInventoryOverTime), axis=-1)
+
+def RandomLayeredNetwork(rng, maxLevels=5, maxWidth=4, maxLeadTimeWeeks=4):
+    # Layered network in which every node orders from a random subset of the level above, over links with
+    # random fixed lead times, so nodes share suppliers and receive from several of them
+    network = SupplyNetwork()
+    tiers = []
+    for level in range(rng.integers(2, maxLevels + 1)):
+        tiers.append([network.AddNode(f'Level {level} Node {i}', hasDemand=(level == 0))
+                      for i in range(rng.integers(1, maxWidth + 1))])
+    for lower, upper in zip(tiers, tiers[1:]):
+        for customer in lower:
+            for supplier in rng.choice(upper, size=rng.integers(1, len(upper) + 1), replace=False):
+                network.AddLink(int(supplier), customer, int(rng.integers(1, maxLeadTimeWeeks + 1)))
+        for supplier in upper:
+            if supplier not in network.linkSuppliers:
+                network.AddLink(supplier, int(rng.choice(lower)), int(rng.integers(1, maxLeadTimeWeeks + 1)))
+    return network
+
+def check_correctness(numReplications=4, seed=0, numNetworks=8):
+    # Messages for every fast path that differs from the reference TakeTurn trajectories in any bit, and
+    # for every random network on which the event-driven engine differs from NetworkSupplyChain
+    failures = []
+    configs = [DEFAULT_CONFIG, DEFAULT_CONFIG.Replace(queueDelayWeeks=1), DEFAULT_CONFIG.Replace(queueDelayWeeks=5),
+               DEFAULT_CONFIG.Replace(initialCurrentOrders=6.0, targetStock=9.5), DEFAULT_CONFIG.Replace(weeksToPlay=300),
+               DEFAULT_CONFIG.Replace(targetStock=20, weeksToPlay=4000)]
+    for config in configs:
+        demand = PoissonDemand().Generate(numReplications, config.weeksToPlay, seed=seed)
+        stepReference = ReferenceTrajectory(config)
+        drawnReferences = [ReferenceTrajectory(config, demand[r]) for r in range(numReplications)]
+        comparisons = []
+
+        # Vectorized four-tier engine, with drawn demand and with the default step pattern
+        batch = BatchSupplyChain(numReplications, demand, config)
+        batch.Run()
+        comparisons += [('batch', r, trajectory, drawnReferences[r])
+                        for r, trajectory in enumerate(EngineTrajectories(batch).swapaxes(0, 1))]
+        stepBatch = BatchSupplyChain(1, config=config)
+        stepBatch.Run()
+        comparisons.append(('batch', 'step demand', EngineTrajectories(stepBatch)[:, 0], stepReference))
+
+        # Network engine on the four-tier network
+        network = NetworkSupplyChain(SupplyNetwork.FourTier(), numReplications, demand, config)
+        network.Run()
+        comparisons += [('network', r, trajectory, drawnReferences[r])
+                        for r, trajectory in enumerate(EngineTrajectories(network).swapaxes(0, 1))]
+
+        # Event-driven engine on the four-tier network with fixed lead times, one replication at a time
+        for replication, customerOrders, reference in ([('step demand', None, stepReference)]
+                                                       + list(zip(range(numReplications), demand, drawnReferences))):
+            events = EventDrivenSupplyChain(SupplyNetwork.FourTier(), customerOrders, config)
+            events.Run(record=True)
+            comparisons.append(('events', replication, np.array(EngineTrajectories(events)), reference))
+
+        # Snapshot taken half way and forked
+        result = continue_simulation(start_simulation(config), untilWeek=config.weeksToPlay // 2)
+        forked = continue_simulation(SimulationSnapshot(result).Fork())
+        comparisons.append(('snapshot', 'step demand', forked.statistics.AsArray(), stepReference))
+
+        # Steady-state detection, extrapolating the cycle where the run repeats
+        steady = run_steady_state(config)[0]
+        comparisons.append(('steady state', 'step demand', steady.statistics.AsArray(), stepReference))
+
+        for path, replication, trajectory, reference in comparisons:
+            if not np.array_equal(trajectory, reference):
+                failures.append(f"{path} differs from TakeTurn for {config} in replication {replication}")
+
+    # Event-driven engine on random networks whose nodes have several suppliers and customers, where
+    # NetworkSupplyChain is the reference
+    rng = np.random.default_rng(seed)
+    config = DEFAULT_CONFIG.Replace(weeksToPlay=200)
+    for index in range(numNetworks):
+        network = RandomLayeredNetwork(rng)
+        demand = PoissonDemand().Generate(1, config.weeksToPlay, seed=seed + index)
+        reference = NetworkSupplyChain(network, 1, demand, config)
+        reference.Run()
+        events = EventDrivenSupplyChain(network, demand[0], config)
+        events.Run(record=True)
+        if not np.array_equal(np.array(EngineTrajectories(events)), EngineTrajectories(reference)[:, 0]):
+            failures.append(f"events differs from NetworkSupplyChain on random network {index}")
+    return failures
+
+def check_precision(numReplications=512, seed=0):
+    # Messages for every compact-precision run that leaves the documented error bound against float64,
+    # or whose results depend on how its replications were split into chunks
+    failures = []
+    precisions = [Float32Precision(), FixedPointPrecision()]
+    generators = [PoissonDemand(), NormalDemand(), AR1Demand()]
+    for queueDelayWeeks in (1, 2, 3, 5):
+        config = DEFAULT_CONFIG.Replace(queueDelayWeeks=queueDelayWeeks, weeksToPlay=ERROR_BOUND_WEEKS)
+        for generator in generators:
+            demand = generator.Generate(numReplications, config.weeksToPlay, seed)
+            reference = BatchSupplyChain(numReplications, demand, config)
+            reference.Run()
+            referenceSeries = (reference.costsOverTime, reference.ordersOverTime, reference.effectiveInventoryOverTime)
+            for precision in precisions:
+                # A budget of 100 replications and their demand block forces chunks that split demand blocks
+                memoryBudget = (100 * WorkingBytesPerReplication(config, precision)
+                                + REPLICATION_BLOCK_SIZE * config.weeksToPlay * DRAWN_DEMAND_BYTES)
+                chunked = run_compact_batch(numReplications, config, precision, generator, seed,
+                                            memoryBudget=memoryBudget)
+                whole = run_compact_batch(numReplications, config, precision, generator, seed)
+                label = f"{type(precision).__name__} with {generator} and queueDelayWeeks={queueDelayWeeks}"
+                if not np.array_equal(chunked.history, whole.history):
+                    failures.append(f"{label} depends on the chunk size")
+                for metric, series in enumerate(referenceSeries):
+                    if np.any(np.abs(whole.Series(metric) - series) > precision.ErrorBound(series)):
+                        failures.append(f"{label} leaves the error bound in {METRIC_NAMES[metric]}")
+    return failures
+
+def check_policies(numReplications=4, seed=0):
+    # Messages for every built-in ordering policy whose batch trajectories differ from the object model
+    # ordering by the same policy, whose object-model run changes when forked from a snapshot half way,
+    # or whose result depends on sharing a batch with other policies
+    failures = []
+    config = DEFAULT_CONFIG.Replace(weeksToPlay=200)
+    demand = PoissonDemand().Generate(numReplications, config.weeksToPlay, seed=seed)
+    makers = [AnchorAndAdjustPolicy, lambda: AnchorAndAdjustPolicy(0.3, 15.0, 0.2), OrderUpToPolicy,
+              ReorderPointPolicy, SmoothedForecastPolicy,
+              lambda: TierPolicies([OrderUpToPolicy(), SmoothedForecastPolicy(), ReorderPointPolicy(),
+                                    AnchorAndAdjustPolicy()])]
+    alone = []
+    for makePolicy in makers:
+        batch = BatchSupplyChain(numReplications, demand, config, policy=makePolicy())
+        batch.Run()
+        alone.append(EngineTrajectories(batch))
+        for replication in range(numReplications):
+            result = attach_policy(start_simulation(config, customerOrders=demand[replication]), makePolicy())
+            if not np.array_equal(alone[-1][:, replication], continue_simulation(result).statistics.AsArray()):
+                failures.append(f"{batch.policy} differs from the object model in replication {replication}")
+
+        # Forked half way, with the policy and what it remembers copied into the branch
+        result = attach_policy(start_simulation(config, customerOrders=demand[0]), makePolicy())
+        forked = continue_simulation(SimulationSnapshot(continue_simulation(result, config.weeksToPlay // 2)).Fork())
+        if not np.array_equal(alone[-1][:, 0], forked.statistics.AsArray()):
+            failures.append(f"{batch.policy} changes when forked from a snapshot")
+
+    grouped = BatchSupplyChain(len(makers) * numReplications, np.tile(demand, (len(makers), 1)), config,
+                               policy=GroupPolicies([makePolicy() for makePolicy in makers], numReplications))
+    grouped.Run()
+    if not np.array_equal(EngineTrajectories(grouped), np.concatenate(alone, axis=1)):
+        failures.append("GroupPolicies differs from running every policy in a batch of its own")
+    return failures
+
+def main(argv=None):
+    # Run the benchmarks, optionally save or gate them against a baseline, and check exactness
+    parser = argparse.ArgumentParser(description="Benchmark the bullwhip simulation engines.")
+    parser.add_argument("--only", nargs="+", choices=sorted(Benchmarks()), help="benchmarks to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the work of every benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark; the best one counts")
+    parser.add_argument("--save", help="write the results as a JSON baseline to this path")
+    parser.add_argument("--baseline", help="fail if throughput falls too far below this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="share of baseline throughput a benchmark may lose")
+    parser.add_argument("--skip-check", action="store_true",
+                        help="do not check the fast paths and policies for exactness or the compact error bound")
+    args = parser.parse_args(argv)
+
+    failures = [] if args.skip_check else check_correctness() + check_policies() + check_precision()
+    for failure in failures:
+        print("MISMATCH", failure)
+
+    results = run_benchmarks(args.only, args.scale, args.repeat)
+    for name, measured in results['benchmarks'].items():
+        print(f"{name:18} {measured['replicationWeeksPerSecond']:14,.0f} replication-weeks/s"
+              f"  {measured['peakMemoryBytes'] / 2**20:9.1f} MiB peak")
+
+    if args.save:
+        with open(args.save, 'w') as baselineFile:
+            json.dump(results, baselineFile, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baselineFile:
+            regressions = compare_to_baseline(results, json.load(baselineFile), args.threshold)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        failures += regressions
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Content-addressed on-disk cache of simulation results with least-recently-used eviction."""
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+
+from .config import DEFAULT_CONFIG, SimulationConfig
+from .simulation import run_simulation
+
+# Modules whose source decides the outcome of a run; editing any of them invalidates every entry
+MODEL_MODULES = ('settings.py', 'config.py', 'model.py', 'simulation.py', 'statistics.py', 'demand.py', 'cache.py')
+
+# Default size limit of a cache directory
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+@functools.lru_cache(maxsize=None)
+def ModelVersion():
+    # Hash of the source of every module in MODEL_MODULES, computed once per process
+    digest = hashlib.sha256()
+    packageDirectory = os.path.dirname(os.path.abspath(__file__))
+    for name in MODEL_MODULES:
+        with open(os.path.join(packageDirectory, name), 'rb') as source:
+            digest.update(name.encode() + b'\0' + source.read() + b'\0')
+    return digest.hexdigest()
+
+def CacheKey(config=DEFAULT_CONFIG, customerOrders=None, demandGenerator=None, seed=0):
+    # Stable hash of everything a run depends on: the model version, every config setting and the demand,
+    # given either as an explicit 'customerOrders' sequence or as a DemandGenerator and its seed
+    description = {'model': ModelVersion(), 'config': config.AsDict()}
+    if customerOrders is not None:
+        import numpy as np  # Imported lazily so the cache never loads NumPy for the default demand
+
+        description['customerOrders'] = hashlib.sha256(np.ascontiguousarray(customerOrders, dtype=float)).hexdigest()
+    if demandGenerator is not None:
+        description['demand'] = [type(demandGenerator).__qualname__, asdict(demandGenerator), seed]
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+@dataclass
+class CachedResult:
+    # A run read back from the cache: its config, the (weeks, tiers, metrics) history as a read-only
+    # memory-mapped array, and the summary row of SimulationResult.Summarize
+    config: SimulationConfig
+    history: object
+    summary: dict
+
+    def GetBeerReceived(self):
+        return self.summary['beerReceived']
+
+    def GetTotalCost(self):
+        return self.summary['totalCost']
+
+    def Summarize(self):
+        return dict(self.summary)
+
+class ResultCache:
+
+    def __init__(self, directory, maxBytes=DEFAULT_CACHE_BYTES):
+        # Cache of run results in 'directory', holding at most 'maxBytes' bytes
+        # Every entry is a <key>.npy history and a <key>.json summary; the summary's modification time
+        # is its last use, so the least recently used entries are evicted first
+        # The cache only holds a path, so it can be handed to worker processes and shared between them
+        self.directory = str(directory)
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        return
+
+    def Paths(self, key):
+        # History and summary file of one entry
+        base = os.path.join(self.directory, key)
+        return base + '.npy', base + '.json'
+
+    def Get(self, key, config=DEFAULT_CONFIG):
+        # CachedResult stored under 'key', or None when there is no such entry
+        import numpy as np
+
+        historyPath, summaryPath = self.Paths(key)
+        try:
+            with open(summaryPath) as summaryFile:
+                summary = json.load(summaryFile)
+            history = np.load(historyPath, mmap_mode='r') if config.weeksToPlay else np.load(historyPath)
+            os.utime(summaryPath)  # Mark the entry as most recently used
+        except (FileNotFoundError, ValueError):
+            self.misses += 1  # Missing, or evicted by another process while it was being read
+            return None
+        self.hits += 1
+        return CachedResult(config, history, summary)
+
+    def Put(self, key, result):
+        # Store a SimulationResult under 'key', evict whatever no longer fits and return the entry
+        import numpy as np
+
+        historyPath, summaryPath = self.Paths(key)
+        summary = result.Summarize()
+        # Write to temporary files and rename them, so concurrent readers never see a partial entry
+        self.WriteAtomically(historyPath, lambda file: np.save(file, result.statistics.AsArray()))
+        self.WriteAtomically(summaryPath, lambda file: file.write(json.dumps(summary, default=float).encode()))
+        self.Evict()
+        return CachedResult(result.config, np.asarray(result.statistics.AsArray()), summary)
+
+    def WriteAtomically(self, path, write):
+        # Call write(file) on a temporary file next to 'path', then move it into place
+        descriptor, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                write(file)
+            os.replace(temporaryPath, path)
+        except BaseException:
+            os.unlink(temporaryPath)
+            raise
+        return
+
+    def Run(self, config=DEFAULT_CONFIG, customerOrders=None, demandGenerator=None, seed=0):
+        # Cached equivalent of run_simulation: read the result back, or play the run and store it
+        # 'demandGenerator' and 'seed' draw the demand as replication 0 of DemandGenerator.Generate
+        key = CacheKey(config, customerOrders, demandGenerator, seed)
+        cached = self.Get(key, config)
+        if cached is not None:
+            return cached
+        if demandGenerator is not None:
+            customerOrders = demandGenerator.Generate(1, config.weeksToPlay, seed=seed)[0]
+        return self.Put(key, run_simulation(config, customerOrders=customerOrders))
+
+    def Entries(self):
+        # (last use, bytes, key) of every entry, least recently used first
+        entries = {}
+        with os.scandir(self.directory) as files:
+            for file in files:
+                key, extension = os.path.splitext(file.name)
+                if extension not in ('.npy', '.json'):
+                    continue
+                status = file.stat()
+                lastUse, size = entries.get(key, (0.0, 0))
+                if extension == '.json':
+                    lastUse = status.st_mtime
+                entries[key] = (lastUse, size + status.st_size)
+        return sorted((lastUse, size, key) for key, (lastUse, size) in entries.items())
+
+    def Evict(self):
+        # Delete least recently used entries until the cache fits in maxBytes
+        entries = self.Entries()
+        totalBytes = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if totalBytes <= self.maxBytes:
+                break
+            self.Remove(key)
+            totalBytes -= size
+        return
+
+    def Remove(self, key):
+        # Delete one entry; another process may have removed it already
+        for path in self.Paths(key):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return
+
+    def Clear(self):
+        # Remove every entry
+        for _, _, key in self.Entries():
+            self.Remove(key)
+        return
@@ -0,0 +1,30 @@
+"""Command-line entry point reproducing the original notebook run."""
+
+import argparse
+
+from .config import DEFAULT_CONFIG
+from .simulation import run_simulation
+
+def main(argv=None):
+    # Run the simulation, print the weekly log and final statistics, then plot the series
+    parser = argparse.ArgumentParser(description="Simulate the bullwhip effect in a four-tier beer supply chain.")
+    parser.add_argument("--weeks", type=int, default=DEFAULT_CONFIG.weeksToPlay, help="number of weeks to play")
+    parser.add_argument("--delay", type=int, default=DEFAULT_CONFIG.queueDelayWeeks, help="weeks of delay on every link")
+    parser.add_argument("--target-stock", type=float, default=DEFAULT_CONFIG.targetStock, help="target stock of every actor")
+    parser.add_argument("--quiet", action="store_true", help="do not print the weekly log")
+    parser.add_argument("--no-plot", action="store_true", help="do not open the plotly figures")
+    args = parser.parse_args(argv)
+
+    config = DEFAULT_CONFIG.Replace(weeksToPlay=args.weeks, queueDelayWeeks=args.delay, targetStock=args.target_stock)
+    result = run_simulation(config, verbose=not args.quiet)
+
+    # Output final results after simulation
+    print("\n--- Final Statistics ----")
+    print("Beer received by customer: {0}".format(result.GetBeerReceived()))
+
+    # Plot time-series data for orders, inventory, and costs over the weeks of simulation
+    if not args.no_plot:
+        result.statistics.PlotOrders()
+        result.statistics.PlotEffectiveInventory()
+        result.statistics.PlotCosts()
+    return 0
@@ -0,0 +1,188 @@
+"""Compact-precision batches: float32 state, float32 or int32 fixed-point history, run chunk by chunk
+within a memory budget.
+
+Error bound against float64: for horizons of up to ``ERROR_BOUND_WEEKS`` weeks, every recorded cost,
+order and effective inventory differs from the float64 ``BatchSupplyChain`` by at most
+``FLOAT32_RELATIVE_ERROR`` times the largest magnitude that series reached so far in that replication and
+tier (at least 1), plus half the fixed-point resolution. Past that horizon the anchor-and-adjust rule
+amplifies rounding like any other perturbation of an oscillating chain, so long compact runs agree with
+float64 in distribution, not path by path. ``bullwhip.benchmark`` checks the bound on every run.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .batch import NUMBER_OF_TIERS, BatchSupplyChain
+from .config import DEFAULT_CONFIG
+from .demand import REPLICATION_BLOCK_SIZE
+from .statistics import COST, EFFECTIVE_INVENTORY, METRIC_NAMES, ORDERS
+
+# Documented error bound of compact runs against float64, and the horizon it holds for
+FLOAT32_RELATIVE_ERROR = 1e-3
+ERROR_BOUND_WEEKS = 52
+
+# Default working memory of one chunk
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+# Vectors of one replication the engine allocates while a tier takes its turn
+TEMPORARIES_PER_REPLICATION = 8
+
+# Bytes per week of demand while a generator draws it: the sample, its float64 conversion and their concatenation
+DRAWN_DEMAND_BYTES = 24
+
+class CompactPrecision:
+    # Base class: the dtype the chain state runs in and the dtype history is stored in
+    # Subclasses implement Encode(values, out) and Decode(stored)
+    stateDtype = np.dtype(np.float32)
+    historyDtype = np.dtype(np.float32)
+    resolution = 0.0  # Step between two storable values, 0 for floating point
+
+    def ErrorBound(self, reference):
+        # Largest difference from the float64 'reference' series, a (weeks, replications, tiers) array,
+        # that the documented bound allows in every element
+        peak = np.maximum(np.maximum.accumulate(np.abs(reference), axis=0), 1.0)
+        return FLOAT32_RELATIVE_ERROR * peak + self.resolution / 2.0
+
+@dataclass(frozen=True)
+class Float32Precision(CompactPrecision):
+    # State and history in float32, half the memory of float64
+
+    def Encode(self, values, out):
+        out[...] = values
+        return
+
+    def Decode(self, stored):
+        return np.asarray(stored, dtype=np.float64)
+
+@dataclass(frozen=True)
+class FixedPointPrecision(CompactPrecision):
+    # History as int32 multiples of 2**-fractionBits, state in float32; values are rounded to the nearest
+    # multiple, and OverflowError is raised for any value beyond the int32 range
+    fractionBits: int = 8
+
+    historyDtype = np.dtype(np.int32)
+
+    def __post_init__(self):
+        if not 0 <= self.fractionBits <= 24:
+            raise ValueError(f"fractionBits must lie in 0 .. 24, got {self.fractionBits}")
+
+    @property
+    def resolution(self):
+        return 2.0 ** -self.fractionBits
+
+    def Encode(self, values, out):
+        scaled = np.rint(np.ldexp(values, self.fractionBits))
+        limits = np.iinfo(np.int32)
+        if scaled.size and (scaled.min() < limits.min or scaled.max() > limits.max):
+            raise OverflowError(f"value beyond the int32 range of {self.fractionBits} fraction bits; "
+                                f"use fewer fractionBits or Float32Precision")
+        out[...] = scaled
+        return
+
+    def Decode(self, stored):
+        return np.ldexp(np.asarray(stored, dtype=np.float64), -self.fractionBits)
+
+def WorkingBytesPerReplication(config, precision, weeksToPlay=None):
+    # Peak working memory of one replication while its chunk runs, the result history not included:
+    # chain state, queues (plus the copy taken to sum one of them), engine and recording temporaries, and
+    # its demand row, up to three times in float64 while it is drawn and once in the state dtype
+    if weeksToPlay is None:
+        weeksToPlay = config.weeksToPlay
+    stateValues = (7 * NUMBER_OF_TIERS + 1
+                   + 2 * NUMBER_OF_TIERS * config.queueDelayWeeks
+                   + TEMPORARIES_PER_REPLICATION + 3 * NUMBER_OF_TIERS)
+    demandBytes = DRAWN_DEMAND_BYTES + precision.stateDtype.itemsize
+    return stateValues * precision.stateDtype.itemsize + weeksToPlay * demandBytes
+
+def ChunkReplications(memoryBudget, config, precision, weeksToPlay=None):
+    # Largest number of replications whose working memory fits 'memoryBudget' bytes, rounded down to whole
+    # demand blocks when it holds at least one, so no block is drawn twice; smaller chunks still draw a
+    # whole block of demand, which is set aside first
+    if weeksToPlay is None:
+        weeksToPlay = config.weeksToPlay
+    perReplication = WorkingBytesPerReplication(config, precision, weeksToPlay)
+    chunkReplications = memoryBudget // perReplication
+    if chunkReplications >= REPLICATION_BLOCK_SIZE:
+        return int(chunkReplications - chunkReplications % REPLICATION_BLOCK_SIZE)
+
+    drawnBlockBytes = REPLICATION_BLOCK_SIZE * weeksToPlay * DRAWN_DEMAND_BYTES
+    chunkReplications = (memoryBudget - drawnBlockBytes) // (perReplication - weeksToPlay * DRAWN_DEMAND_BYTES)
+    if chunkReplications < 1:
+        raise ValueError(f"a memory budget of {memoryBudget} bytes does not hold one replication and its demand "
+                         f"block ({perReplication + drawnBlockBytes} bytes)")
+    return int(chunkReplications)
+
+class CompactBatchResult:
+
+    def __init__(self, config, numReplications, precision, keepHistory=True):
+        # Compact (weeks, replications, tiers) history of every metric, stored in precision.historyDtype,
+        # and the float64 total cost of every replication
+        self.config = config
+        self.numReplications = numReplications
+        self.precision = precision
+        shape = (config.weeksToPlay, numReplications, NUMBER_OF_TIERS)
+        self.history = np.empty((len(METRIC_NAMES),) + shape, precision.historyDtype) if keepHistory else None
+        self.totalCosts = np.empty(numReplications)
+        return
+
+    def StoredSeries(self, metric):
+        # (weeks, replications, tiers) series of one metric (COST, ORDERS or EFFECTIVE_INVENTORY) as stored
+        if self.history is None:
+            raise ValueError("The run was made with keepHistory=False")
+        return self.history[metric]
+
+    def Series(self, metric, replications=slice(None)):
+        # float64 (weeks, replications, tiers) series of one metric for the selected replications
+        return self.precision.Decode(self.StoredSeries(metric)[:, replications])
+
+    def MeanTrajectory(self, metric):
+        # (weeks, tiers) mean over all replications, accumulated in float64 without decoding the series
+        return self.precision.Decode(self.StoredSeries(metric).mean(axis=1, dtype=np.float64))
+
+    def PercentileTrajectory(self, metric, percentiles=(5, 50, 95)):
+        # (percentiles, weeks, tiers) percentiles over all replications
+        return self.precision.Decode(np.percentile(self.StoredSeries(metric), percentiles, axis=1))
+
+    def TotalCosts(self):
+        # (replications,) cost of the whole chain at the end of every replication
+        return self.totalCosts
+
+def run_compact_batch(numReplications, config=DEFAULT_CONFIG, precision=Float32Precision(), demandGenerator=None,
+                      seed=0, customerOrders=None, memoryBudget=DEFAULT_MEMORY_BUDGET, keepHistory=True):
+    # Simulate 'numReplications' replications in compact precision, as many at a time as 'memoryBudget'
+    # bytes of working memory allow, and return a CompactBatchResult
+    # Demand comes from 'demandGenerator' and 'seed', from a (replications, weeks) 'customerOrders' array such
+    # as a memory map, read one chunk at a time, or by default from the Customer step pattern
+    # With keepHistory=False only the total costs are kept, so memory no longer grows with the horizon
+    if demandGenerator is not None and customerOrders is not None:
+        raise ValueError("Pass either a demandGenerator or customerOrders, not both")
+    weeksToPlay = config.weeksToPlay
+    chunkReplications = ChunkReplications(memoryBudget, config, precision)
+
+    result = CompactBatchResult(config, numReplications, precision, keepHistory)
+    for first in range(0, numReplications, chunkReplications):
+        chunk = slice(first, min(first + chunkReplications, numReplications))
+        chunkOrders = None
+        if demandGenerator is not None:
+            chunkOrders = demandGenerator.Generate(chunk.stop - first, weeksToPlay, seed, first)
+        elif customerOrders is not None:
+            chunkOrders = customerOrders[chunk, :weeksToPlay]
+        RunCompactChunk(result, chunk, chunkOrders)
+    return result
+
+def RunCompactChunk(result, chunk, customerOrders):
+    # Simulate the replications in 'chunk' and record them into 'result'; the chain is freed on return,
+    # before the next chunk draws its demand
+    precision = result.precision
+    chain = BatchSupplyChain(chunk.stop - chunk.start, customerOrders, result.config, dtype=precision.stateDtype)
+    del customerOrders  # The chain holds its own compact copy
+
+    for thisWeek in range(result.config.weeksToPlay):
+        chain.TakeTurn(thisWeek)
+        if result.history is not None:
+            precision.Encode(chain.costsIncurred, result.history[COST, thisWeek, chunk])
+            precision.Encode(chain.lastOrderQuantity, result.history[ORDERS, thisWeek, chunk])
+            precision.Encode(chain.CalcEffectiveInventory(), result.history[EFFECTIVE_INVENTORY, thisWeek, chunk])
+    result.totalCosts[chunk] = chain.costsIncurred.sum(axis=1, dtype=np.float64)
+    return
@@ -0,0 +1,49 @@
+"""Immutable per-run configuration replacing the module-level settings."""
+
+from dataclasses import dataclass, fields, replace
+
+from .settings import (
+    BACKORDER_PENALTY_COST_PER_UNIT,
+    CUSTOMER_INITIAL_ORDERS,
+    CUSTOMER_SUBSEQUENT_ORDERS,
+    INITIAL_COST,
+    INITIAL_CURRENT_ORDERS,
+    INITIAL_STOCK,
+    QUEUE_DELAY_WEEKS,
+    STORAGE_COST_PER_UNIT,
+    TARGET_STOCK,
+    WEEKS_TO_PLAY,
+)
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    # Every setting of one run; the defaults are the values in bullwhip.settings
+    # Instances are frozen, so one config can be shared by all actors and sent to worker processes
+    storageCostPerUnit: float = STORAGE_COST_PER_UNIT                  # Cost for storing each unit of product
+    backorderPenaltyCostPerUnit: float = BACKORDER_PENALTY_COST_PER_UNIT  # Penalty for each unit in backorder
+    weeksToPlay: int = WEEKS_TO_PLAY                                   # Total simulation period in weeks
+    queueDelayWeeks: int = QUEUE_DELAY_WEEKS                           # Weeks between order and delivery on each link
+    initialStock: float = INITIAL_STOCK                                # Starting stock level for each actor
+    initialCost: float = INITIAL_COST                                  # Initial cost at the beginning of the simulation
+    initialCurrentOrders: float = INITIAL_CURRENT_ORDERS               # Initial orders at the start of the simulation
+    customerInitialOrders: float = CUSTOMER_INITIAL_ORDERS             # Customer order quantity in early weeks
+    customerSubsequentOrders: float = CUSTOMER_SUBSEQUENT_ORDERS       # Customer order quantity in later weeks
+    targetStock: float = TARGET_STOCK                                  # Desired stock level for every actor
+
+    def __post_init__(self):
+        # Every link needs at least one week of delay for its queue to hold an envelope
+        if self.queueDelayWeeks < 1:
+            raise ValueError(f"queueDelayWeeks must be at least 1, got {self.queueDelayWeeks}")
+        if self.weeksToPlay < 0:
+            raise ValueError(f"weeksToPlay must not be negative, got {self.weeksToPlay}")
+
+    def Replace(self, **changes):
+        # Return a copy of this config with the given settings changed
+        return replace(self, **changes)
+
+    def AsDict(self):
+        # Flat {setting: value} mapping, used for the columns of sweep result tables
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+# Configuration of the original notebook run
+DEFAULT_CONFIG = SimulationConfig()
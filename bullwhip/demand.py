@@ -0,0 +1,116 @@
+"""Customer demand generators producing whole (replications, weeks) matrices up front."""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .config import DEFAULT_CONFIG
+
+# Replications drawn from one random stream; block b uses the b-th SeedSequence child of the seed,
+# so any split of replications across workers reproduces exactly the same demand
+REPLICATION_BLOCK_SIZE = 256
+
+class DemandGenerator:
+    # Base class: subclasses implement Sample(rng, numReplications, weeksToPlay)
+
+    def Generate(self, numReplications, weeksToPlay, seed=0, firstReplication=0):
+        # Demand matrix of shape (numReplications, weeksToPlay) for replications
+        # firstReplication .. firstReplication + numReplications - 1 of the stream identified by 'seed'
+        firstBlock = firstReplication // REPLICATION_BLOCK_SIZE
+        lastBlock = (firstReplication + numReplications - 1) // REPLICATION_BLOCK_SIZE
+        blocks = [self.Sample(BlockGenerator(seed, block), REPLICATION_BLOCK_SIZE, weeksToPlay)
+                  for block in range(firstBlock, lastBlock + 1)]
+        demand = np.concatenate(blocks, axis=0) if blocks else np.empty((0, weeksToPlay))
+        start = firstReplication - firstBlock * REPLICATION_BLOCK_SIZE
+        return demand[start:start + numReplications]
+
+    def Sample(self, rng, numReplications, weeksToPlay):
+        raise NotImplementedError
+
+def BlockGenerator(seed, block):
+    # Random generator of one replication block, equal to the block-th child of SeedSequence(seed).spawn()
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+
+@dataclass(frozen=True)
+class StepDemand(DemandGenerator):
+    # Deterministic step from 'initialOrders' to 'subsequentOrders' after 'stepWeek' (Customer.CalculateOrder)
+    initialOrders: float = DEFAULT_CONFIG.customerInitialOrders
+    subsequentOrders: float = DEFAULT_CONFIG.customerSubsequentOrders
+    stepWeek: int = 5
+
+    @classmethod
+    def FromConfig(cls, config):
+        return cls(config.customerInitialOrders, config.customerSubsequentOrders)
+
+    def Sample(self, rng, numReplications, weeksToPlay):
+        weeks = np.arange(weeksToPlay)
+        pattern = np.where(weeks <= self.stepWeek, float(self.initialOrders), float(self.subsequentOrders))
+        return np.broadcast_to(pattern, (numReplications, weeksToPlay)).copy()
+
+@dataclass(frozen=True)
+class ShockDemand(DemandGenerator):
+    # Constant 'baseline' demand plus 'shockSize' extra units from 'shockWeek' for 'shockDuration' weeks
+    baseline: float = DEFAULT_CONFIG.customerInitialOrders
+    shockSize: float = 4.0
+    shockWeek: int = 6
+    shockDuration: int = 1
+
+    def Sample(self, rng, numReplications, weeksToPlay):
+        weeks = np.arange(weeksToPlay)
+        inShock = (weeks >= self.shockWeek) & (weeks < self.shockWeek + self.shockDuration)
+        pattern = float(self.baseline) + np.where(inShock, float(self.shockSize), 0.0)
+        return np.broadcast_to(pattern, (numReplications, weeksToPlay)).copy()
+
+@dataclass(frozen=True)
+class PoissonDemand(DemandGenerator):
+    # Independent Poisson counts with the given weekly mean
+    mean: float = DEFAULT_CONFIG.customerSubsequentOrders
+
+    def Sample(self, rng, numReplications, weeksToPlay):
+        return rng.poisson(self.mean, (numReplications, weeksToPlay)).astype(float)
+
+@dataclass(frozen=True)
+class NormalDemand(DemandGenerator):
+    # Independent normal demand, clipped at zero since customers never return beer
+    mean: float = DEFAULT_CONFIG.customerSubsequentOrders
+    std: float = 2.0
+
+    def Sample(self, rng, numReplications, weeksToPlay):
+        return np.maximum(rng.normal(self.mean, self.std, (numReplications, weeksToPlay)), 0.0)
+
+@dataclass(frozen=True)
+class AR1Demand(DemandGenerator):
+    # d[t] = mean + phi * (d[t-1] - mean) + noise, started from the stationary distribution and clipped at zero
+    mean: float = DEFAULT_CONFIG.customerSubsequentOrders
+    phi: float = 0.7
+    sigma: float = 1.5
+
+    def __post_init__(self):
+        if not -1.0 < self.phi < 1.0:
+            raise ValueError(f"AR(1) coefficient phi must lie in (-1, 1), got {self.phi}")
+
+    def Sample(self, rng, numReplications, weeksToPlay):
+        shocks = rng.normal(0.0, self.sigma, (numReplications, weeksToPlay))
+        deviation = np.empty((numReplications, weeksToPlay))
+        if weeksToPlay:
+            deviation[:, 0] = shocks[:, 0] / np.sqrt(1.0 - self.phi ** 2)
+        for week in range(1, weeksToPlay):
+            deviation[:, week] = self.phi * deviation[:, week - 1] + shocks[:, week]
+        return np.maximum(self.mean + deviation, 0.0)
+
+@dataclass(frozen=True)
+class SeasonalDemand(DemandGenerator):
+    # Sinusoidal season around 'mean' with optional normal noise, clipped at zero
+    mean: float = DEFAULT_CONFIG.customerSubsequentOrders
+    amplitude: float = 3.0
+    periodWeeks: float = 52.0
+    phaseWeeks: float = 0.0
+    noiseStd: float = 0.0
+
+    def Sample(self, rng, numReplications, weeksToPlay):
+        weeks = np.arange(weeksToPlay)
+        season = self.mean + self.amplitude * np.sin(2.0 * np.pi * (weeks + self.phaseWeeks) / self.periodWeeks)
+        demand = np.broadcast_to(season, (numReplications, weeksToPlay)).copy()
+        if self.noiseStd > 0:
+            demand += rng.normal(0.0, self.noiseStd, (numReplications, weeksToPlay))
+        return np.maximum(demand, 0.0)
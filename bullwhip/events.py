@@ -0,0 +1,343 @@
+"""Discrete-event engine for supply networks with per-link, optionally random lead times.
+
+Instead of stepping every node every week, the engine keeps the shipments and orders in transit as
+arrival events and only lets a node take its turn in a week where something reaches it, where it
+has customer demand, or where it is still working off a backlog or a stock gap. Quiet nodes are
+skipped, and so are weeks in which the whole network is quiet. With fixed lead times every turn
+follows NetworkSupplyChain step for step on any network, including the weekly cost accounting, and
+so TakeTurn on the four-tier chain.
+"""
+
+import heapq
+import random
+from dataclasses import dataclass
+
+from .config import DEFAULT_CONFIG
+
+# Kinds of arrival events
+DELIVERY, ORDER = 0, 1
+
+@dataclass(frozen=True)
+class FixedLeadTime:
+    # Every envelope takes 'weeks' weeks
+    weeks: int
+
+    def Sample(self, rng):
+        return self.weeks
+
+    def PrimedWeeks(self):
+        # Envelopes already in transit when the game starts, one arriving in each of these weeks
+        return self.weeks
+
+@dataclass(frozen=True)
+class UniformLeadTime:
+    # Every envelope independently takes between 'low' and 'high' weeks, inclusive
+    low: int
+    high: int
+
+    def __post_init__(self):
+        if not 1 <= self.low <= self.high:
+            raise ValueError(f"Uniform lead times need 1 <= low <= high, got {self.low} and {self.high}")
+
+    def Sample(self, rng):
+        return rng.randint(self.low, self.high)
+
+    def PrimedWeeks(self):
+        return round((self.low + self.high) / 2)
+
+@dataclass(frozen=True)
+class DiscreteLeadTime:
+    # Every envelope independently takes weeks[i] weeks with probability probabilities[i]
+    weeks: tuple
+    probabilities: tuple
+
+    def __post_init__(self):
+        if len(self.weeks) != len(self.probabilities) or min(self.weeks) < 1:
+            raise ValueError("Discrete lead times need one probability per lead time, and lead times of at least 1")
+
+    def Sample(self, rng):
+        return rng.choices(self.weeks, self.probabilities)[0]
+
+    def PrimedWeeks(self):
+        return round(sum(w * p for w, p in zip(self.weeks, self.probabilities)) / sum(self.probabilities))
+
+def AsLeadTime(leadTime, default):
+    # Lead time object for a link or production setting: None means 'default' weeks, an int fixed weeks
+    if leadTime is None:
+        leadTime = default
+    if isinstance(leadTime, int):
+        if leadTime < 1:
+            raise ValueError("Lead times and production delays must be at least one week")
+        return FixedLeadTime(leadTime)
+    return leadTime
+
+class EventDrivenSupplyChain:
+
+    def __init__(self, network, customerOrders=None, config=DEFAULT_CONFIG, seed=0):
+        # Event-driven engine for one replication of any acyclic SupplyNetwork
+        # Link lead times and node production delays may be ints or lead time objects (FixedLeadTime,
+        # UniformLeadTime, DiscreteLeadTime); a delivery takes one sampled lead time, and an order one
+        # sampled lead time minus a week, matching the queues of the lock-step engines
+        # 'customerOrders' is an optional weekly demand sequence shared by every demand node, or a
+        # {demand node: sequence} mapping; by default the Customer step pattern is used
+        self.network = network
+        self.config = config
+        self.rng = random.Random(seed)
+        numNodes = len(network.nodeNames)
+        self.numNodes = numNodes
+
+        # Nodes in the order they take their turn within a week: demand-facing level first
+        levels = network.Levels()
+        self.turnOrder = sorted(range(numNodes), key=lambda node: levels[node])
+        self.levels = levels
+        self.demandNodes = [node for node in range(numNodes) if network.nodeHasDemand[node]]
+        self.outgoingLinks = [[] for _ in range(numNodes)]
+        self.incomingLinks = [[] for _ in range(numNodes)]
+        for link, (supplier, customer) in enumerate(zip(network.linkSuppliers, network.linkCustomers)):
+            self.outgoingLinks[supplier].append(link)
+            self.incomingLinks[customer].append(link)
+        self.factoryNodes = [node for node in range(numNodes) if not self.incomingLinks[node]]
+
+        # Lead times and order split of every link, production delay of every factory
+        self.linkLeadTimes = [AsLeadTime(lead, config.queueDelayWeeks) for lead in network.linkLeadTimeWeeks]
+        self.productionDelays = {node: AsLeadTime(network.nodeProductionDelayWeeks[node], config.queueDelayWeeks)
+                                 for node in self.factoryNodes}
+        self.linkShares = [1.0 / len(self.incomingLinks[customer]) if share is None else float(share)
+                           for customer, share in zip(network.linkCustomers, network.linkShares)]
+
+        # Weekly demand of every demand node, or None for the step pattern
+        if customerOrders is None or isinstance(customerOrders, dict):
+            self.customerOrders = customerOrders
+        else:
+            self.customerOrders = dict.fromkeys(self.demandNodes, customerOrders)
+
+        # Node state
+        self.currentStock = [float(config.initialStock)] * numNodes
+        self.currentOrders = [float(config.initialCurrentOrders)] * numNodes
+        self.costsIncurred = [float(config.initialCost)] * numNodes
+        self.lastOrderQuantity = [0.0] * numNodes
+        self.costedWeeks = [0] * numNodes      # Weeks whose costs are already in costsIncurred
+        self.customerBeerReceived = dict.fromkeys(self.demandNodes, 0.0)
+        self.busyNodes = set()                 # Nodes whose backlog or stock gap makes them order next week
+
+        # Outstanding orders per link, used to share a short shipment between several customers
+        customersPerSupplier = [len(links) for links in self.outgoingLinks]
+        self.linkBacklog = [config.initialCurrentOrders / max(customersPerSupplier[supplier], 1)
+                            for supplier in network.linkSuppliers]
+
+        # Pending arrivals: week -> node -> [(kind, link, quantity)], and a heap of the weeks holding any
+        self.pending = {}
+        self.pendingWeeks = []
+        self.eventsProcessed = 0
+        self.turnsTaken = 0
+
+        # Envelopes already in transit at the start, one per week of the nominal lead time
+        initialEnvelope = float(config.customerInitialOrders)
+        for link, leadTime in enumerate(self.linkLeadTimes):
+            for week in range(leadTime.PrimedWeeks()):
+                self.Schedule(week, network.linkCustomers[link], DELIVERY, link, initialEnvelope)
+                self.Schedule(week, network.linkSuppliers[link], ORDER, link, initialEnvelope)
+        for node, leadTime in self.productionDelays.items():
+            for week in range(leadTime.PrimedWeeks()):
+                self.Schedule(week, node, DELIVERY, -1, initialEnvelope)
+
+        self.costsOverTime = None
+        self.ordersOverTime = None
+        self.effectiveInventoryOverTime = None
+        return
+
+    def Schedule(self, week, node, kind, link, quantity):
+        # Add an arrival event for 'node' in 'week'
+        nodes = self.pending.get(week)
+        if nodes is None:
+            nodes = self.pending[week] = {}
+            heapq.heappush(self.pendingWeeks, week)
+        nodes.setdefault(node, []).append((kind, link, quantity))
+        return
+
+    def CustomerOrder(self, node, weekNum):
+        # Demand at a demand node this week
+        if self.customerOrders is None:
+            if weekNum <= 5:
+                return float(self.config.customerInitialOrders)
+            return float(self.config.customerSubsequentOrders)
+        orders = self.customerOrders[node]
+        return float(orders[weekNum]) if weekNum < len(orders) else 0.0
+
+    def AccrueIdleCosts(self, node, untilWeek):
+        # Book the costs of the weeks 'node' sat idle before 'untilWeek'; its stock and orders did not change,
+        # so every such week costs the same, added one week at a time exactly as TakeTurn would
+        idleWeeks = untilWeek - self.costedWeeks[node]
+        if idleWeeks <= 0:
+            return
+        weeklyCost = (self.currentStock[node] * self.config.storageCostPerUnit
+                      + self.currentOrders[node] * self.config.backorderPenaltyCostPerUnit)
+        total = self.costsIncurred[node]
+        if weeklyCost == 0:
+            pass
+        elif (weeklyCost * 1024).is_integer() and (total * 1024).is_integer() and abs(total) + idleWeeks * abs(weeklyCost) < 2.0 ** 42:
+            total += idleWeeks * weeklyCost  # Every partial sum is exact here, so one product gives the same bits
+        else:
+            for _ in range(idleWeeks):
+                total += weeklyCost
+        self.costsIncurred[node] = total
+        self.lastOrderQuantity[node] = 0.0  # An idle node orders nothing
+        self.costedWeeks[node] = untilWeek
+        return
+
+    def TakeNodeTurn(self, node, weekNum, arrivals):
+        # The five TakeTurn phases of one node, driven by this week's arrival events
+        config = self.config
+        self.AccrueIdleCosts(node, weekNum)
+        self.turnsTaken += 1
+
+        # 1. and 2. Receive deliveries (or finished production) and orders
+        # Arrivals are added link by link, in the order NetworkSupplyChain adds them, so sums of several
+        # suppliers' deliveries or several customers' orders round the same way
+        for kind, link, quantity in sorted(arrivals):
+            self.eventsProcessed += 1
+            if quantity <= 0:
+                continue
+            if kind == DELIVERY:
+                self.currentStock[node] += quantity
+            else:
+                self.currentOrders[node] += quantity
+                self.linkBacklog[link] += quantity
+        if node in self.customerBeerReceived:
+            self.currentOrders[node] += self.CustomerOrder(node, weekNum)
+
+        # 3. Ship downstream, with the fixed delivery of 4 units per link during the first weeks
+        if weekNum <= 4:
+            for link in self.outgoingLinks[node]:
+                self.Ship(link, weekNum, 4.0)
+            if node in self.customerBeerReceived:
+                self.customerBeerReceived[node] += 4.0
+        else:
+            owed = self.currentOrders[node]
+            deliveryQuantity = self.CalcBeerToDeliver(node)
+            for link in self.outgoingLinks[node]:
+                # Share the shipment between customers in proportion to what each of them is owed
+                fraction = self.linkBacklog[link] / owed if owed > 0 else 0.0
+                shipped = fraction * deliveryQuantity
+                self.linkBacklog[link] -= shipped
+                self.Ship(link, weekNum, shipped)
+            if node in self.customerBeerReceived:
+                self.customerBeerReceived[node] += deliveryQuantity
+
+        # 4. Order from suppliers, or start production at factories
+        amountToOrder = self.CalcAmountToOrder(node, weekNum)
+        self.lastOrderQuantity[node] = amountToOrder
+        for link in self.incomingLinks[node]:
+            # In week 0 the order lines are still full of primed envelopes, so the order is lost as in the lock-step engines
+            if weekNum > 0 and amountToOrder * self.linkShares[link] > 0:
+                arrival = weekNum + self.linkLeadTimes[link].Sample(self.rng) - 1
+                self.Schedule(arrival, self.network.linkSuppliers[link], ORDER, link, amountToOrder * self.linkShares[link])
+        if node in self.productionDelays and amountToOrder > 0:
+            self.Schedule(weekNum + self.productionDelays[node].Sample(self.rng), node, DELIVERY, -1, amountToOrder)
+
+        # 5. Update the costs for the current turn
+        self.costsIncurred[node] += (self.currentStock[node] * config.storageCostPerUnit
+                                     + self.currentOrders[node] * config.backorderPenaltyCostPerUnit)
+        self.costedWeeks[node] = weekNum + 1
+
+        # A node with a backlog or below its target stock orders again next week even if nothing arrives
+        if self.currentOrders[node] > 0 or self.currentStock[node] < config.targetStock:
+            self.busyNodes.add(node)
+        else:
+            self.busyNodes.discard(node)
+        return
+
+    def Ship(self, link, weekNum, quantity):
+        # Send a delivery down 'link'; it arrives after one sampled lead time
+        if quantity > 0:
+            arrival = weekNum + self.linkLeadTimes[link].Sample(self.rng)
+            self.Schedule(arrival, self.network.linkCustomers[link], DELIVERY, link, quantity)
+        return
+
+    def CalcBeerToDeliver(self, node):
+        # SupplyChainActor.CalcBeerToDeliver for one node
+        stock = self.currentStock[node]
+        orders = self.currentOrders[node]
+        if stock >= orders:
+            deliveryQuantity = orders
+        elif stock > 0:
+            deliveryQuantity = stock
+        else:
+            deliveryQuantity = 0.0
+        self.currentStock[node] = stock - deliveryQuantity
+        self.currentOrders[node] = orders - deliveryQuantity
+        return deliveryQuantity
+
+    def CalcAmountToOrder(self, node, weekNum):
+        # "Anchor and maintain" rule of SupplyChainActor.CalcAmountToOrder
+        if weekNum <= 4:
+            return 4.0
+        amountToOrder = 0.5 * self.currentOrders[node]
+        if (self.config.targetStock - self.currentStock[node]) > 0:
+            amountToOrder += self.config.targetStock - self.currentStock[node]
+        return amountToOrder
+
+    def ActiveNodes(self, weekNum):
+        # Nodes that must take their turn this week, before any order placed during the week arrives
+        if weekNum <= 4:
+            return set(range(self.numNodes))
+        active = set(self.busyNodes)
+        active.update(self.pending.get(weekNum, ()))
+        active.update(node for node in self.demandNodes if self.CustomerOrder(node, weekNum) > 0)
+        return active
+
+    def TakeTurn(self, weekNum):
+        # Play one week: every active node takes its turn, demand-facing level first
+        # Orders with no transit time reach a supplier in the week they are placed, so it is activated then
+        active = self.ActiveNodes(weekNum)
+        for node in self.turnOrder:
+            arrivals = self.pending.get(weekNum, {}).pop(node, None)
+            if arrivals is not None or node in active:
+                self.TakeNodeTurn(node, weekNum, arrivals or ())
+        self.pending.pop(weekNum, None)
+        return
+
+    def NextActiveWeek(self, weekNum, weeksToPlay):
+        # First week after 'weekNum' in which any node has to act, or weeksToPlay if there is none
+        nextWeek = weekNum + 1
+        if nextWeek <= 4 or self.busyNodes:
+            return nextWeek
+        while self.pendingWeeks and self.pendingWeeks[0] < nextWeek:
+            heapq.heappop(self.pendingWeeks)
+        candidate = self.pendingWeeks[0] if self.pendingWeeks else weeksToPlay
+        for node in self.demandNodes:
+            for week in range(nextWeek, min(candidate, weeksToPlay)):
+                if self.CustomerOrder(node, week) > 0:
+                    candidate = week
+                    break
+        return min(candidate, weeksToPlay)
+
+    def CalcEffectiveInventory(self):
+        # Effective inventory of every node
+        return [stock - orders for stock, orders in zip(self.currentStock, self.currentOrders)]
+
+    def Run(self, weeksToPlay=None, record=False):
+        # Play 'weeksToPlay' weeks (config.weeksToPlay by default), skipping weeks in which nothing happens
+        # 'record' fills (weeks, nodes) lists of lists costsOverTime, ordersOverTime and
+        # effectiveInventoryOverTime like the lock-step engines, which visits every week again
+        if weeksToPlay is None:
+            weeksToPlay = self.config.weeksToPlay
+        if record:
+            self.costsOverTime, self.ordersOverTime, self.effectiveInventoryOverTime = [], [], []
+
+        weekNum = 0
+        while weekNum < weeksToPlay:
+            self.TakeTurn(weekNum)
+            nextWeek = self.NextActiveWeek(weekNum, weeksToPlay)
+            if record:
+                for week in range(weekNum, nextWeek):
+                    for node in range(self.numNodes):
+                        self.AccrueIdleCosts(node, week + 1)
+                    self.costsOverTime.append(list(self.costsIncurred))
+                    self.ordersOverTime.append(list(self.lastOrderQuantity))
+                    self.effectiveInventoryOverTime.append(self.CalcEffectiveInventory())
+            weekNum = nextWeek
+
+        for node in range(self.numNodes):
+            self.AccrueIdleCosts(node, weeksToPlay)
+        return
@@ -0,0 +1,141 @@
+"""Load test of the beer-game server: thousands of simulated players over localhost.
+
+Every simulated player answers each state it is sent after a random think time, uniform up to twice
+--think seconds, so the sessions' turns arrive spread out as people's would; --think 0 answers at once
+and makes the sessions move in lockstep, which measures throughput rather than latency. The turn
+latency is the server's: from the moment the last human of a session sends its order until the first
+human receives the state of the next week. Players share a few connections, as a front end
+multiplexing its users would.
+
+Run ``python -m bullwhip.loadtest --sessions 2000`` against an in-process server, or pass --port to load
+a server started separately with ``python -m bullwhip.server``.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from .server import DEFAULT_HOST, HUMAN, BeerGameServer, Receive, Send
+from .statistics import TIER_NAMES
+
+DEFAULT_SESSIONS = 2000
+DEFAULT_THINK_SECONDS = 0.5
+
+def PlayerOrder(state):
+    # Simulated player: cover the incoming order and half of the backlog
+    return state['incomingOrder'] + 0.5 * state['backlog']
+
+async def RunConnection(host, port, numSessions, humansPerSession, weeksToPlay, thinkSeconds, latencies, seed):
+    # Create 'numSessions' sessions over one connection and play all of their human seats to the end
+    loop = asyncio.get_running_loop()
+    generator = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 20)
+    humans = TIER_NAMES[:humansPerSession]
+    players = {tierName: HUMAN for tierName in humans}
+    for request in range(numSessions):
+        Send(writer, {'type': 'create', 'players': players, 'config': {'weeksToPlay': weeksToPlay},
+                      'request': request})
+    await writer.drain()
+
+    sessions = []
+    for _ in range(numSessions):
+        created = await Receive(reader)
+        if created['type'] == 'error':
+            raise RuntimeError(created['message'])
+        sessions.append(created['session'])
+    for session in sessions:
+        for tierName in humans:
+            Send(writer, {'type': 'join', 'session': session, 'tier': tierName})
+    await writer.drain()
+
+    # Every seat orders after thinking; the week's clock starts with the session's last order
+    ordersSent = dict.fromkeys(sessions, 0)
+    sentAt = {}
+
+    def Answer(session, tier, quantity):
+        Send(writer, {'type': 'order', 'session': session, 'tier': tier, 'quantity': quantity})
+        ordersSent[session] += 1
+        if ordersSent[session] == humansPerSession:
+            ordersSent[session] = 0
+            sentAt[session] = time.perf_counter()
+        return
+
+    unfinished = len(sessions)
+    while unfinished:
+        message = await Receive(reader)
+        kind = message['type']
+        session = message.get('session')
+        if kind in ('state', 'finished') and session in sentAt and message.get('tier', humans[0]) == humans[0]:
+            latencies.append(time.perf_counter() - sentAt.pop(session))
+        if kind == 'state':
+            answer = (session, message['tier'], PlayerOrder(message))
+            if thinkSeconds > 0:
+                loop.call_later(generator.uniform(0, 2 * thinkSeconds), Answer, *answer)
+            else:
+                Answer(*answer)
+                await writer.drain()
+        elif kind == 'finished':
+            unfinished -= 1
+        elif kind == 'error':
+            raise RuntimeError(message['message'])
+    writer.close()
+    return
+
+def Percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+async def run_load_test(numSessions=DEFAULT_SESSIONS, humansPerSession=1, numConnections=16, weeksToPlay=52,
+                        thinkSeconds=DEFAULT_THINK_SECONDS, host=DEFAULT_HOST, port=None, seed=0):
+    # Play 'numSessions' concurrent sessions with 'humansPerSession' simulated humans each over
+    # 'numConnections' connections and return a report of the turn latency
+    # Players think for 'thinkSeconds' on average before each order
+    # Without a 'port' the server runs in this process on a free port
+    server = None
+    if port is None:
+        server = await BeerGameServer().Serve(host, 0)
+        port = server.sockets[0].getsockname()[1]
+
+    latencies = []
+    started = time.perf_counter()
+    try:
+        shares = [numSessions // numConnections + (i < numSessions % numConnections) for i in range(numConnections)]
+        await asyncio.gather(*(RunConnection(host, port, share, humansPerSession, weeksToPlay, thinkSeconds,
+                                             latencies, seed + connection)
+                               for connection, share in enumerate(shares) if share))
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {'sessions': numSessions, 'humansPerSession': humansPerSession, 'connections': numConnections,
+            'turns': len(latencies), 'seconds': elapsed, 'turnsPerSecond': len(latencies) / elapsed,
+            'p50Ms': 1e3 * Percentile(latencies, 0.5), 'p95Ms': 1e3 * Percentile(latencies, 0.95),
+            'p99Ms': 1e3 * Percentile(latencies, 0.99), 'maxMs': 1e3 * latencies[-1]}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the beer-game server with simulated players.")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="concurrent sessions")
+    parser.add_argument("--humans", type=int, default=1, choices=range(1, len(TIER_NAMES) + 1),
+                        help="simulated humans per session, the other tiers are bots")
+    parser.add_argument("--connections", type=int, default=16, help="client connections sharing the players")
+    parser.add_argument("--weeks", type=int, default=52, help="weeks per session")
+    parser.add_argument("--think", type=float, default=DEFAULT_THINK_SECONDS,
+                        help="mean seconds a player thinks before ordering; 0 answers at once")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="server address")
+    parser.add_argument("--port", type=int, help="port of a running server; by default one runs in-process")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load_test(args.sessions, args.humans, args.connections, args.weeks, args.think,
+                                       args.host, args.port))
+    print(f"{report['sessions']} sessions x {report['humansPerSession']} humans over {report['connections']} "
+          f"connections: {report['turns']} turns in {report['seconds']:.2f} s ({report['turnsPerSecond']:,.0f}/s)")
+    print(f"Turn latency: p50 {report['p50Ms']:.2f} ms, p95 {report['p95Ms']:.2f} ms, "
+          f"p99 {report['p99Ms']:.2f} ms, max {report['maxMs']:.2f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
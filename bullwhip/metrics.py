@@ -0,0 +1,124 @@
+"""Online bullwhip metrics kept in constant memory, for single runs and batches alike."""
+
+from statistics import NormalDist
+
+import numpy as np
+
+from .statistics import TIER_NAMES
+
+class WelfordAccumulator:
+
+    def __init__(self, shape):
+        # Running mean and sum of squared deviations of a stream of equally shaped arrays
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        return
+
+    def Update(self, value):
+        # Welford's update: numerically stable and O(1) memory per tracked element
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        return
+
+    def Variance(self, ddof=1):
+        # Sample variance of everything seen so far (NaN until more than 'ddof' values were seen)
+        if self.count <= ddof:
+            return np.full_like(self.mean, np.nan)
+        return self.m2 / (self.count - ddof)
+
+class BullwhipMetrics:
+
+    def __init__(self, numReplications=1, tierNames=TIER_NAMES, warmupWeeks=0, initialBacklog=0.0):
+        # Per-replication, per-tier bullwhip metrics updated once a week:
+        #  - variance amplification: variance of the orders a tier places over the variance of customer demand
+        #  - fill rate: share of the units ordered from a tier that it shipped in the week they arrived
+        #  - peak backlog: largest outstanding order book a tier carried
+        # The first 'warmupWeeks' weeks are left out of the variances, e.g. to skip the fixed week <= 4 orders
+        self.tierNames = tuple(tierNames)
+        self.warmupWeeks = warmupWeeks
+        self.weeksSeen = 0
+        shape = (numReplications, len(self.tierNames))
+
+        self.demandMoments = WelfordAccumulator(numReplications)
+        self.orderMoments = WelfordAccumulator(shape)
+        self.unitsOrdered = np.zeros(shape)
+        self.unitsFilledOnTime = np.zeros(shape)
+        self.previousBacklog = np.full(shape, float(initialBacklog))
+        self.peakBacklog = np.full(shape, float(initialBacklog))
+        return
+
+    def Update(self, incomingOrders, shipped, ordersPlaced, backlog, customerDemand=None):
+        # Fold one week into the metrics; the first four arguments are (replications, tiers) arrays
+        # 'customerDemand' defaults to the orders received by the first tier
+        incomingOrders = np.asarray(incomingOrders, dtype=float)
+        backlog = np.asarray(backlog, dtype=float)
+        if customerDemand is None:
+            customerDemand = incomingOrders[:, 0]
+
+        if self.weeksSeen >= self.warmupWeeks:
+            self.demandMoments.Update(np.asarray(customerDemand, dtype=float))
+            self.orderMoments.Update(np.asarray(ordersPlaced, dtype=float))
+
+        # Shipments serve the oldest backlog first; whatever is left over filled this week's orders on time
+        filledOnTime = np.clip(np.asarray(shipped, dtype=float) - self.previousBacklog, 0.0, incomingOrders)
+        self.unitsOrdered += incomingOrders
+        self.unitsFilledOnTime += filledOnTime
+        np.maximum(self.peakBacklog, backlog, out=self.peakBacklog)
+        self.previousBacklog = backlog.copy()
+
+        self.weeksSeen += 1
+        return
+
+    def UpdateFromActors(self, actors):
+        # Update from the object model after every actor has taken its turn this week
+        self.Update([[actor.lastIncomingOrder for actor in actors]],
+                    [[actor.lastDeliveryQuantity for actor in actors]],
+                    [[actor.GetLastOrderQuantity() for actor in actors]],
+                    [[actor.currentOrders for actor in actors]])
+        return
+
+    def UpdateFromChain(self, chain):
+        # Update from a BatchSupplyChain or NetworkSupplyChain after its TakeTurn
+        # For networks, customer demand is the total over all demand nodes
+        demandNodes = getattr(chain, 'demandNodes', [0])
+        self.Update(chain.lastIncomingOrders, chain.lastDeliveryQuantity, chain.lastOrderQuantity,
+                    chain.currentOrders, chain.lastIncomingOrders[:, demandNodes].sum(axis=1))
+        return
+
+    def VarianceAmplification(self):
+        # (replications, tiers) ratio of order variance to customer demand variance
+        demandVariance = self.demandMoments.Variance()[:, None]
+        orderVariance = self.orderMoments.Variance()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(demandVariance > 0, orderVariance / demandVariance, np.nan)
+
+    def FillRate(self):
+        # (replications, tiers) share of ordered units shipped in the week they were ordered
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.unitsOrdered > 0, self.unitsFilledOnTime / self.unitsOrdered, np.nan)
+
+    def PeakBacklog(self):
+        # (replications, tiers) largest backlog seen
+        return self.peakBacklog.copy()
+
+    def Summary(self, confidence=0.95):
+        # pandas DataFrame with one row per tier: the mean of every metric across replications and
+        # its normal-approximation confidence interval
+        import pandas as pd  # Imported lazily so metric collection never loads pandas
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+        columns = {}
+        for name, values in (('varianceAmplification', self.VarianceAmplification()),
+                             ('fillRate', self.FillRate()),
+                             ('peakBacklog', self.PeakBacklog())):
+            count = np.sum(~np.isnan(values), axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = np.nanmean(values, axis=0)
+                halfWidth = z * np.nanstd(values, axis=0, ddof=1) / np.sqrt(count)
+            columns[name] = mean
+            columns[name + 'Low'] = mean - halfWidth
+            columns[name + 'High'] = mean + halfWidth
+        return pd.DataFrame(columns, index=pd.Index(self.tierNames, name='tier'))
@@ -0,0 +1,437 @@
+"""Object model of the beer game: customer, delay queues and the four supply chain actors."""
+
+from array import array
+
+from .config import DEFAULT_CONFIG
+
+# Customers
+
+# Define the Customer class to simulate customer behavior
+class Customer:
+    def __init__(self, config=DEFAULT_CONFIG, customerOrders=None):
+        # Initialize the total beer received by the customer
+        self.config = config  # SimulationConfig holding the ordering pattern
+        self.customerOrders = customerOrders  # Optional per-week demand, e.g. one row of a DemandGenerator matrix
+        self.totalBeerReceived = 0
+        return
+
+    def RecieveFromRetailer(self, amountReceived):
+        # Update the total amount of beer received based on supply from the retailer
+        self.totalBeerReceived += amountReceived
+        return
+
+    def CalculateOrder(self, weekNum):
+        # Calculate the customer order based on the week number
+        # Order amount changes after the initial weeks to reflect demand increase
+        if self.customerOrders is not None:
+            result = self.customerOrders[weekNum]
+        elif weekNum <= 5:
+            result = self.config.customerInitialOrders
+        else:
+            result = self.config.customerSubsequentOrders
+        return result
+
+    def GetBeerReceived(self):
+        # Retrieve the total amount of beer received by the customer
+        return self.totalBeerReceived
+
+# SupplyChainQueue
+
+# What SupplyChainQueue.PushEnvelope does with an envelope that arrives when the queue is full
+QUEUE_OVERFLOW_RAISE = 'raise'        # Raise OverflowError so no shipment is ever lost
+QUEUE_OVERFLOW_GROW = 'grow'          # Double the capacity and keep the envelope
+QUEUE_OVERFLOW_COALESCE = 'coalesce'  # Add the quantity to the newest envelope already in the queue
+QUEUE_OVERFLOW_DROP = 'drop'          # Discard the envelope and count it in droppedEnvelopes (original game)
+
+class SupplyChainQueue:
+
+    def __init__(self, queueLength, overflowPolicy=QUEUE_OVERFLOW_RAISE):
+        # Initialize the supply chain queue with a specified length
+        # 'queueLength' represents the maximum number of orders that can be held in the queue
+        # 'overflowPolicy' is one of the QUEUE_OVERFLOW_* settings above
+        if overflowPolicy not in (QUEUE_OVERFLOW_RAISE, QUEUE_OVERFLOW_GROW, QUEUE_OVERFLOW_COALESCE, QUEUE_OVERFLOW_DROP):
+            raise ValueError(f"Unknown queue overflow policy: {overflowPolicy!r}")
+        self.queueLength = queueLength
+        self.overflowPolicy = overflowPolicy
+        self.droppedEnvelopes = 0       # Number of envelopes discarded under QUEUE_OVERFLOW_DROP
+
+        # Preallocated circular buffer; every slot is mirrored at slot + queueLength so that the
+        # queued envelopes always form one contiguous run and PeekAll never has to copy
+        self.data = array('d', bytes(2 * max(queueLength, 1) * array('d').itemsize))
+        # Slots whose envelope was pushed as an int, so PopEnvelope hands back the type that was pushed and
+        # stock kept in whole ints stays int, as in the original list-based queue (and its verbose echo)
+        self.wholeEnvelopes = bytearray(max(queueLength, 1))
+        self.head = 0                   # Slot holding the oldest envelope
+        self.size = 0                   # Number of envelopes currently in the queue
+        return
+
+    def PushEnvelope(self, numberOfCasesToOrder):
+        # Place a new order in the queue in O(1)
+        # 'numberOfCasesToOrder' represents the quantity of product ordered
+        if self.size >= self.queueLength:  # Queue is full, apply the overflow policy
+            if self.overflowPolicy == QUEUE_OVERFLOW_GROW:
+                self.Grow()
+            elif self.overflowPolicy == QUEUE_OVERFLOW_COALESCE and self.size > 0:
+                newest = (self.head + self.size - 1) % self.queueLength
+                self.data[newest] += numberOfCasesToOrder
+                self.data[newest + self.queueLength] = self.data[newest]
+                self.wholeEnvelopes[newest] = self.wholeEnvelopes[newest] and type(numberOfCasesToOrder) is int
+                return True
+            elif self.overflowPolicy == QUEUE_OVERFLOW_DROP:
+                self.droppedEnvelopes += 1
+                return False
+            else:
+                raise OverflowError(f"SupplyChainQueue of length {self.queueLength} is full; "
+                                    f"cannot push {numberOfCasesToOrder} cases")
+
+        tail = (self.head + self.size) % self.queueLength
+        self.data[tail] = numberOfCasesToOrder
+        self.data[tail + self.queueLength] = numberOfCasesToOrder
+        self.wholeEnvelopes[tail] = type(numberOfCasesToOrder) is int
+        self.size += 1
+        return True  # The order was successfully added
+
+    def Grow(self):
+        # Double the capacity, keeping the queued envelopes in order
+        queued = self.PeekAll().tolist()
+        whole = bytes(self.wholeEnvelopes[(self.head + i) % self.queueLength] for i in range(self.size))
+        self.queueLength = max(1, 2 * self.queueLength)
+        self.data = array('d', bytes(2 * self.queueLength * array('d').itemsize))
+        self.data[0:len(queued)] = array('d', queued)
+        self.data[self.queueLength:self.queueLength + len(queued)] = array('d', queued)
+        self.wholeEnvelopes = bytearray(self.queueLength)
+        self.wholeEnvelopes[0:len(whole)] = whole
+        self.head = 0
+        return
+
+    def AdvanceQueue(self):
+        # Move the queue forward by removing the oldest order (FIFO - First In, First Out)
+        # This simulates the delay in processing orders over time
+        if self.size == 0:
+            raise IndexError("AdvanceQueue on an empty SupplyChainQueue")
+        self.head = (self.head + 1) % self.queueLength
+        self.size -= 1
+        return
+
+    def PopEnvelope(self):
+        # Retrieve the next order to be delivered from the front of the queue
+        if self.size >= 1:              # Check if there is at least one order in the queue
+            quantityDelivered = self.data[self.head]  # Get the first order in the queue
+            if self.wholeEnvelopes[self.head]:
+                quantityDelivered = int(quantityDelivered)
+            self.AdvanceQueue()                       # Remove it from the queue after delivery
+        else:
+            quantityDelivered = 0       # No orders to deliver if the queue is empty
+
+        return quantityDelivered        # Return the quantity to be delivered
+
+    def PeekAll(self):
+        # Zero-copy view of the queued envelopes, oldest first
+        # The view is only valid until the next push or pop
+        return memoryview(self.data)[self.head:self.head + self.size]
+
+    def PipelineInventory(self):
+        # Total quantity currently in transit through this queue
+        return sum(self.PeekAll())
+
+    def PrettyPrint(self):
+        # Print the current state of the queue, mainly for debugging purposes
+        print(self.PeekAll().tolist())
+        return
+
+# SupplyChainActor
+
+class SupplyChainActor:
+
+    def __init__(self, incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue,
+                 config=DEFAULT_CONFIG):
+        # Immutable SimulationConfig holding the costs, stock levels and target for this run
+        self.config = config
+
+        # Initialize stock, orders, and cost attributes
+        self.currentStock = config.initialStock              # Initial stock level for the actor
+        self.currentOrders = config.initialCurrentOrders     # Initial orders to be fulfilled
+        self.costsIncurred = config.initialCost              # Initial cost at the start of the simulation
+
+        # Set up queues for managing orders and deliveries
+        self.incomingOrdersQueue = incomingOrdersQueue   # Queue for orders from downstream actors
+        self.outgoingOrdersQueue = outgoingOrdersQueue   # Queue for orders to upstream actors
+        self.incomingDeliveriesQueue = incomingDeliveriesQueue  # Queue for deliveries from upstream
+        self.outgoingDeliveriesQueue = outgoingDeliveriesQueue  # Queue for deliveries to downstream
+
+        self.lastOrderQuantity = 0  # Store the quantity ordered in the last round for tracking purposes
+        self.lastIncomingOrder = 0  # Quantity ordered from this actor in the last round
+        self.lastDeliveryQuantity = 0  # Quantity shipped downstream in the last round
+        self.orderingPolicy = None  # Optional callable weekNum -> order quantity, see bullwhip.policies.attach_policy
+        return
+
+    def PlaceOutgoingDelivery(self, amountToDeliver):
+        # Place the calculated delivery quantity in the outgoing deliveries queue
+        self.outgoingDeliveriesQueue.PushEnvelope(amountToDeliver)
+        self.lastDeliveryQuantity = amountToDeliver
+        return
+
+    def CalcAmountToOrder(self, weekNum):
+        # Quantity to order (or, at the factory, to brew) this week, using an "anchor and maintain" strategy
+        # after an initial period; an attached orderingPolicy (see bullwhip.policies) replaces that strategy
+        if weekNum <= 4:
+            return 4  # Initial equilibrium order amount for the first few weeks
+        if self.orderingPolicy is not None:
+            return self.orderingPolicy(weekNum)
+
+        # After initial weeks, determine order based on current orders and stock levels
+        amountToOrder = 0.5 * self.currentOrders  # Order amount scales with outstanding orders
+
+        # Adjust order to reach target stock level
+        if (self.config.targetStock - self.currentStock) > 0:
+            amountToOrder += self.config.targetStock - self.currentStock
+        return amountToOrder
+
+    def PlaceOutgoingOrder(self, weekNum):
+        # Place an order based on the week number (see CalcAmountToOrder)
+        amountToOrder = self.CalcAmountToOrder(weekNum)
+
+        # Add the order to the outgoing orders queue
+        self.outgoingOrdersQueue.PushEnvelope(amountToOrder)
+        self.lastOrderQuantity = amountToOrder  # Track the last order quantity for reference
+        return
+
+    def ReceiveIncomingDelivery(self):
+        # Receive a delivery from upstream by popping the first item in the incoming deliveries queue
+        quantityReceived = self.incomingDeliveriesQueue.PopEnvelope()
+
+        # Add the received quantity to the current stock
+        if quantityReceived > 0:
+            self.currentStock += quantityReceived
+        return
+
+    def ReceiveIncomingOrders(self):
+        # Receive an order from downstream by popping the first item in the incoming orders queue
+        thisOrder = self.incomingOrdersQueue.PopEnvelope()
+
+        # Add the incoming order to the current orders to be fulfilled
+        if thisOrder > 0:
+            self.currentOrders += thisOrder
+        self.lastIncomingOrder = max(thisOrder, 0)
+        return
+
+    def CalcBeerToDeliver(self):
+        # Calculate the quantity of beer to deliver based on current stock and orders
+        deliveryQuantity = 0
+
+        # If current stock can fulfill all current orders, deliver the full amount
+        if self.currentStock >= self.currentOrders:
+            deliveryQuantity = self.currentOrders
+            self.currentStock -= deliveryQuantity    # Reduce stock by delivered quantity
+            self.currentOrders -= deliveryQuantity    # Reduce outstanding orders accordingly
+        # If stock is insufficient, deliver as much as possible and backorder the rest
+        elif self.currentStock > 0 and self.currentStock < self.currentOrders:
+            deliveryQuantity = self.currentStock      # Deliver all available stock
+            self.currentStock = 0                     # Stock becomes zero after delivery
+            self.currentOrders -= deliveryQuantity    # Reduce outstanding orders by delivered amount
+        return deliveryQuantity
+
+    def CalcCostForTurn(self):
+        # Calculate the costs for the current turn, including storage and backorder penalties
+        inventoryStorageCost = self.currentStock * self.config.storageCostPerUnit  # Cost for holding inventory
+        backorderPenaltyCost = self.currentOrders * self.config.backorderPenaltyCostPerUnit  # Cost for unfulfilled orders
+        costsThisTurn = inventoryStorageCost + backorderPenaltyCost       # Total cost for this turn
+        return costsThisTurn
+
+    def GetCostIncurred(self):
+        # Return the total costs incurred by this actor so far
+        return self.costsIncurred
+
+    def GetLastOrderQuantity(self):
+        # Return the quantity of the last order placed by this actor
+        return self.lastOrderQuantity
+
+    def CalcEffectiveInventory(self):
+        # Calculate effective inventory as the difference between stock and outstanding orders
+        # This helps determine if the actor is in surplus or backorder
+        return (self.currentStock - self.currentOrders)
+
+# Retailer
+
+class Retailer(SupplyChainActor):
+
+    def __init__(self, incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue, theCustomer,
+                 config=DEFAULT_CONFIG):
+        # Initialize the retailer with supply chain queues and a customer instance
+        # Inherit attributes and methods from the SupplyChainActor superclass
+        super().__init__(incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue, config)
+        self.customer = theCustomer  # Customer instance associated with the retailer
+        return
+
+    def ReceiveIncomingOrderFromCustomer(self, weekNum):
+        # Add the calculated customer order for the current week to the retailer's orders
+        # CalculateOrder method from Customer class is used to get the order amount
+        self.lastIncomingOrder = self.customer.CalculateOrder(weekNum)
+        self.currentOrders += self.lastIncomingOrder
+        return
+
+    def ShipOutgoingDeliveryToCustomer(self):
+        # Ship the calculated amount of beer to the customer by calling CalcBeerToDeliver
+        # RecieveFromRetailer method from Customer class is used to receive the quantity delivered
+        self.lastDeliveryQuantity = self.CalcBeerToDeliver()
+        self.customer.RecieveFromRetailer(self.lastDeliveryQuantity)
+        return
+
+    def TakeTurn(self, weekNum):
+        # Define the series of actions the retailer performs each turn (weekly):
+
+        # 1. Receive new delivery from the wholesaler
+        # This step also advances the delivery queue by removing the first order in line
+        self.ReceiveIncomingDelivery()
+
+        # 2. Receive new order from the customer
+        self.ReceiveIncomingOrderFromCustomer(weekNum)
+
+        # 3. Calculate and ship the required amount to the customer
+        # Directly call RecieveFromRetailer with a fixed delivery amount for the initial weeks
+        if weekNum <= 4:
+            self.lastDeliveryQuantity = 4  # Fixed delivery amount in the first weeks
+            self.customer.RecieveFromRetailer(4)
+        else:
+            self.ShipOutgoingDeliveryToCustomer()  # Dynamic delivery based on stock
+
+        # 4. Place an outgoing order to the wholesaler
+        self.PlaceOutgoingOrder(weekNum)
+
+        # 5. Update the retailer's costs for the current turn
+        self.costsIncurred += self.CalcCostForTurn()
+        return
+
+# Wholesaler
+
+class Wholesaler(SupplyChainActor):
+
+    def __init__(self, incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue,
+                 config=DEFAULT_CONFIG):
+        # Initialize the wholesaler with supply chain queues by inheriting from SupplyChainActor
+        super().__init__(incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue, config)
+        return
+
+    def TakeTurn(self, weekNum):
+        # Define the steps the wholesaler performs each turn (weekly):
+
+        # 1. Receive new delivery from the distributor
+        # This step also advances the delivery queue by removing the first order in line
+        self.ReceiveIncomingDelivery()
+
+        # 2. Receive new order from the retailer
+        # This step also advances the orders queue
+        self.ReceiveIncomingOrders()
+
+        # 3. Prepare and place the outgoing delivery to the retailer
+        # Initially, for the first few weeks, send a fixed amount of 4 units
+        if weekNum <= 4:
+            self.PlaceOutgoingDelivery(4)  # Fixed delivery amount in the first weeks
+        else:
+            # After the initial weeks, calculate the delivery based on current stock and orders
+            self.PlaceOutgoingDelivery(self.CalcBeerToDeliver())
+
+        # 4. Place an order to the upstream actor (such as a distributor)
+        self.PlaceOutgoingOrder(weekNum)
+
+        # 5. Update the wholesaler's costs for the current turn
+        self.costsIncurred += self.CalcCostForTurn()
+        return
+
+# Distributor
+
+class Distributor(SupplyChainActor):
+
+    def __init__(self, incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue,
+                 config=DEFAULT_CONFIG):
+        # Initialize the distributor with supply chain queues by inheriting from SupplyChainActor
+        super().__init__(incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue, config)
+        return
+
+    def TakeTurn(self, weekNum):
+        # Define the steps the distributor performs each turn (weekly):
+
+        # 1. Receive new delivery from the factory
+        # This also advances the delivery queue by removing the first item in line
+        self.ReceiveIncomingDelivery()
+
+        # 2. Receive new order from the wholesaler
+        # This also advances the orders queue by removing the first item in line
+        self.ReceiveIncomingOrders()
+
+        # 3. Prepare and place the outgoing delivery to the wholesaler
+        # Initially, for the first few weeks, send a fixed amount of 4 units
+        if weekNum <= 4:
+            self.PlaceOutgoingDelivery(4)  # Fixed delivery amount in the first weeks
+        else:
+            # After the initial weeks, calculate delivery based on current stock and orders
+            self.PlaceOutgoingDelivery(self.CalcBeerToDeliver())
+
+        # 4. Place an order to the upstream actor (e.g., factory) to replenish stock
+        self.PlaceOutgoingOrder(weekNum)
+
+        # 5. Update the distributor’s costs for the current turn
+        self.costsIncurred += self.CalcCostForTurn()
+        return
+
+# Factory
+
+class Factory(SupplyChainActor):
+
+    def __init__(self, incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue, productionDelayWeeks,
+                 config=DEFAULT_CONFIG):
+        # Initialize the factory with supply chain queues and a production delay queue
+        super().__init__(incomingOrdersQueue, outgoingOrdersQueue, incomingDeliveriesQueue, outgoingDeliveriesQueue, config)
+
+        # Initialize a queue to handle production delays (simulating brewing/production time)
+        self.BeerProductionDelayQueue = SupplyChainQueue(productionDelayWeeks)
+
+        # Assume the factory has initial production runs in progress for stability
+        # These initial production orders help prevent stockouts at the beginning
+        for i in range(0, productionDelayWeeks):
+            self.BeerProductionDelayQueue.PushEnvelope(config.customerInitialOrders)
+        return
+
+    def ProduceBeer(self, weekNum):
+        # Calculate the amount of beer to produce based on the week number, with the same rule the other
+        # actors order by (see CalcAmountToOrder)
+        amountToOrder = self.CalcAmountToOrder(weekNum)
+
+        # Add the production order to the production delay queue (simulates delayed production)
+        self.BeerProductionDelayQueue.PushEnvelope(amountToOrder)
+        self.lastOrderQuantity = amountToOrder  # Track the last production order quantity
+        return
+
+    def FinishProduction(self):
+        # Complete a production run and add the produced beer to the current stock
+        amountProduced = self.BeerProductionDelayQueue.PopEnvelope()
+
+        # Add completed production amount to stock if production is finished
+        if amountProduced > 0:
+            self.currentStock += amountProduced
+        return
+
+    def TakeTurn(self, weekNum):
+        # Define the steps the factory performs each turn (weekly):
+
+        # 1. Complete previous production runs (if any) and add to stock
+        self.FinishProduction()
+
+        # 2. Receive new orders from the distributor
+        # Advances the incoming orders queue by removing the first order
+        self.ReceiveIncomingOrders()
+
+        # 3. Prepare and place the outgoing delivery to the distributor
+        # Initially, send a fixed amount of 4 units in the first few weeks
+        if weekNum <= 4:
+            self.PlaceOutgoingDelivery(4)
+        else:
+            # After initial weeks, calculate delivery based on current stock and orders
+            self.PlaceOutgoingDelivery(self.CalcBeerToDeliver())
+
+        # 4. Initiate production to fulfill future demand
+        self.ProduceBeer(weekNum)
+
+        # 5. Calculate and update the factory’s costs for the current turn
+        self.costsIncurred += self.CalcCostForTurn()
+        return
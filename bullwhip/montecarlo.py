@@ -0,0 +1,153 @@
+"""Parallel Monte Carlo runs of the four-tier chain, recorded straight into shared memory."""
+
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .batch import NUMBER_OF_TIERS, BatchSupplyChain
+from .config import DEFAULT_CONFIG
+from .demand import REPLICATION_BLOCK_SIZE
+from .statistics import COST, EFFECTIVE_INVENTORY, METRIC_NAMES, ORDERS
+
+# Times the replications of a crashed worker are handed out again before the run gives up
+DEFAULT_RETRIES = 2
+
+def AttachSharedMemory(name):
+    # Open an existing block in a worker; pool workers share the resource tracker of the process that
+    # created the block, which stays responsible for unlinking it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # 'track' only exists from Python 3.13
+        return shared_memory.SharedMemory(name=name)
+
+def HistoryViews(buffer, shape):
+    # (costs, orders, effectiveInventory) views of a (metrics, weeks, replications, tiers) block
+    history = np.ndarray((len(METRIC_NAMES),) + shape, dtype=np.float64, buffer=buffer)
+    return history[COST], history[ORDERS], history[EFFECTIVE_INVENTORY]
+
+def _RunChunk(blockName, shape, config, demandGenerator, seed, firstReplication, numReplications):
+    # Worker entry point: simulate replications firstReplication .. + numReplications and write their
+    # trajectories into their slice of the shared block; nothing but the chunk bounds is sent back
+    block = AttachSharedMemory(blockName)
+    try:
+        chunk = slice(firstReplication, firstReplication + numReplications)
+        history = tuple(view[:, chunk] for view in HistoryViews(block.buf, shape))
+        customerOrders = None
+        if demandGenerator is not None:
+            customerOrders = demandGenerator.Generate(numReplications, shape[0], seed, firstReplication)
+        chain = BatchSupplyChain(numReplications, customerOrders, config)
+        chain.Run(shape[0], history=history)
+        del history, chain  # Release every view before the block is closed
+    finally:
+        block.close()
+    return firstReplication, numReplications
+
+class MonteCarloResult:
+
+    def __init__(self, config, numReplications):
+        # Trajectories of 'numReplications' replications in one shared memory block, laid out as
+        # (metrics, weeks, replications, tiers); the block is unlinked by Close or when the result is collected
+        self.config = config
+        self.numReplications = numReplications
+        self.shape = (config.weeksToPlay, numReplications, NUMBER_OF_TIERS)
+        size = max(len(METRIC_NAMES) * int(np.prod(self.shape)) * 8, 1)
+        self.block = shared_memory.SharedMemory(create=True, size=size)
+        self.finalizer = weakref.finalize(self, MonteCarloResult.Release, self.block)
+        self.costsOverTime, self.ordersOverTime, self.effectiveInventoryOverTime = HistoryViews(self.block.buf, self.shape)
+        return
+
+    @staticmethod
+    def Release(block):
+        # Remove the block's name first, so it is freed even while views of it are still alive
+        block.unlink()
+        try:
+            block.close()
+        except BufferError:
+            pass  # Views still exist; the mapping goes away with the last of them
+        return
+
+    def Close(self):
+        # Drop the views and free the shared memory block
+        self.costsOverTime = self.ordersOverTime = self.effectiveInventoryOverTime = None
+        self.finalizer()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.Close()
+        return False
+
+    def Series(self, metric):
+        # (weeks, replications, tiers) view of one metric (COST, ORDERS or EFFECTIVE_INVENTORY)
+        return (self.costsOverTime, self.ordersOverTime, self.effectiveInventoryOverTime)[metric]
+
+    def MeanTrajectory(self, metric):
+        # (weeks, tiers) mean over all replications, computed on the shared block without copying it
+        return self.Series(metric).mean(axis=1)
+
+    def PercentileTrajectory(self, metric, percentiles=(5, 50, 95)):
+        # (percentiles, weeks, tiers) percentiles over all replications
+        return np.percentile(self.Series(metric), percentiles, axis=1)
+
+    def TotalCosts(self):
+        # (replications,) cost of the whole chain at the end of every replication
+        if self.config.weeksToPlay == 0:
+            return np.full(self.numReplications, NUMBER_OF_TIERS * self.config.initialCost)
+        return self.costsOverTime[-1].sum(axis=1)
+
+def run_monte_carlo(numReplications, config=DEFAULT_CONFIG, demandGenerator=None, seed=0, maxWorkers=None,
+                    chunkReplications=None, retries=DEFAULT_RETRIES):
+    # Simulate 'numReplications' replications split over 'maxWorkers' processes (default: all cores; 1 runs
+    # in this process) and return a MonteCarloResult whose trajectories every worker wrote in place
+    # Demand comes from 'demandGenerator' and 'seed' (the Customer step pattern by default) and does not
+    # depend on how replications are split; the replications of a worker that dies are run again up to
+    # 'retries' times in a fresh pool before RuntimeError is raised
+    if numReplications < 0:
+        raise ValueError(f"numReplications must not be negative, got {numReplications}")
+    maxWorkers = maxWorkers or os.cpu_count() or 1
+    if chunkReplications is None:
+        # A few chunks per worker balance the load; whole demand blocks avoid drawing any block twice
+        chunkReplications = -(-numReplications // (maxWorkers * 4))
+        chunkReplications = max(REPLICATION_BLOCK_SIZE, -(-chunkReplications // REPLICATION_BLOCK_SIZE) * REPLICATION_BLOCK_SIZE)
+    chunks = [(first, min(chunkReplications, numReplications - first))
+              for first in range(0, numReplications, chunkReplications)]
+
+    result = MonteCarloResult(config, numReplications)
+    try:
+        if maxWorkers == 1:
+            for first, count in chunks:
+                _RunChunk(result.block.name, result.shape, config, demandGenerator, seed, first, count)
+            return result
+
+        for attempt in range(retries + 1):
+            chunks = RunChunksInPool(chunks, result, config, demandGenerator, seed, maxWorkers)
+            if not chunks:
+                return result
+        raise RuntimeError(f"{len(chunks)} chunks of replications failed after {retries} retries")
+    except BaseException:
+        result.Close()
+        raise
+
+def RunChunksInPool(chunks, result, config, demandGenerator, seed, maxWorkers):
+    # Run the chunks in a fresh process pool and return those that did not finish because a worker died
+    # Every chunk only writes its own replications, so running one again simply overwrites them
+    failed = []
+    if not chunks:
+        return failed  # Nothing to run, e.g. for zero replications
+    with ProcessPoolExecutor(max_workers=min(maxWorkers, len(chunks))) as executor:
+        futures = {executor.submit(_RunChunk, result.block.name, result.shape, config, demandGenerator, seed, first, count):
+                   (first, count) for first, count in chunks}
+        wait(futures)
+        for future, chunk in futures.items():
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                failed.append(chunk)
+            elif error is not None:
+                raise error  # An error in the model itself would only repeat, so it is not retried
+    return failed
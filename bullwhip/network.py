@@ -0,0 +1,344 @@
+"""Arbitrary supply networks stepped level by level with array-indexed adjacency."""
+
+import numpy as np
+
+from .config import DEFAULT_CONFIG
+
+class SupplyNetwork:
+
+    def __init__(self):
+        # Plain description of a supply network: nodes, and links along which goods flow downstream
+        # Nodes with customer demand play the retailer; nodes without a supplier brew their own beer
+        self.nodeNames = []
+        self.nodeHasDemand = []
+        self.nodeProductionDelayWeeks = []   # None means config.queueDelayWeeks
+        self.linkSuppliers = []
+        self.linkCustomers = []
+        self.linkLeadTimeWeeks = []          # None means config.queueDelayWeeks
+        self.linkShares = []                 # Fraction of the customer's orders sent up this link, None for an equal split
+        return
+
+    def AddNode(self, name, hasDemand=False, productionDelayWeeks=None):
+        # Add a node and return its index
+        self.nodeNames.append(name)
+        self.nodeHasDemand.append(hasDemand)
+        self.nodeProductionDelayWeeks.append(productionDelayWeeks)
+        return len(self.nodeNames) - 1
+
+    def NodeIndex(self, node):
+        # Accept either a node index or a node name
+        return node if isinstance(node, int) else self.nodeNames.index(node)
+
+    def AddLink(self, supplier, customer, leadTimeWeeks=None, share=None):
+        # Add a link carrying orders from 'customer' up to 'supplier' and deliveries back down
+        self.linkSuppliers.append(self.NodeIndex(supplier))
+        self.linkCustomers.append(self.NodeIndex(customer))
+        self.linkLeadTimeWeeks.append(leadTimeWeeks)
+        self.linkShares.append(share)
+        return len(self.linkSuppliers) - 1
+
+    def Levels(self):
+        # Longest distance of every node from customer demand; raises if the links form a cycle
+        # Every supplier sits above all of its customers, so the nodes of one level never trade with each other
+        numNodes = len(self.nodeNames)
+        levels = [0] * numNodes
+        pendingCustomers = [0] * numNodes
+        linksByCustomer = [[] for _ in range(numNodes)]
+        for link, (supplier, customer) in enumerate(zip(self.linkSuppliers, self.linkCustomers)):
+            pendingCustomers[supplier] += 1
+            linksByCustomer[customer].append(link)
+        ready = [node for node in range(numNodes) if pendingCustomers[node] == 0]
+
+        visited = 0
+        while ready:
+            node = ready.pop()
+            visited += 1
+            for link in linksByCustomer[node]:
+                supplier = self.linkSuppliers[link]
+                levels[supplier] = max(levels[supplier], levels[node] + 1)
+                pendingCustomers[supplier] -= 1
+                if pendingCustomers[supplier] == 0:
+                    ready.append(supplier)
+        if visited != numNodes:
+            raise ValueError("The supply network contains a cycle")
+        return levels
+
+    @classmethod
+    def FourTier(cls):
+        # The retailer -> wholesaler -> distributor -> factory chain of the original game
+        network = cls()
+        retailer = network.AddNode('Retailer', hasDemand=True)
+        wholesaler = network.AddNode('Wholesaler')
+        distributor = network.AddNode('Distributor')
+        factory = network.AddNode('Factory')
+        network.AddLink(wholesaler, retailer)
+        network.AddLink(distributor, wholesaler)
+        network.AddLink(factory, distributor)
+        return network
+
+    @classmethod
+    def Layered(cls, widths, leadTimeWeeks=None):
+        # Tiers of the given widths, demand-facing tier first; node i of a tier is supplied by node
+        # i * (upper width) // (this width) of the tier above, so wide tiers fan in onto narrow ones
+        network = cls()
+        tiers = []
+        for level, width in enumerate(widths):
+            tiers.append([network.AddNode(f'Tier {level} Node {i}', hasDemand=(level == 0)) for i in range(width)])
+        for lower, upper in zip(tiers, tiers[1:]):
+            for i, customer in enumerate(lower):
+                network.AddLink(upper[i * len(upper) // len(lower)], customer, leadTimeWeeks)
+        return network
+
+class BatchDelayLines:
+
+    def __init__(self, capacities, numReplications, initialEnvelope):
+        # A set of delay lines with individual capacities, each a ring buffer per replication
+        # Every line starts full of 'initialEnvelope', like the primed queues of the main game
+        self.capacities = np.asarray(capacities, dtype=np.int64)
+        numLines = len(self.capacities)
+        self.data = np.full((numReplications, numLines, max(int(self.capacities.max(initial=1)), 1)), float(initialEnvelope))
+        self.head = np.zeros(numLines, dtype=np.int64)
+        self.size = self.capacities.copy()
+        self.droppedEnvelopes = np.zeros(numLines, dtype=np.int64)
+        return
+
+    def PushEnvelopes(self, lines, quantities):
+        # Push one envelope onto each of 'lines'; full lines drop it, as SupplyChainQueue under QUEUE_OVERFLOW_DROP
+        hasRoom = self.size[lines] < self.capacities[lines]
+        if not hasRoom.all():
+            self.droppedEnvelopes[lines[~hasRoom]] += 1
+            lines = lines[hasRoom]
+            quantities = quantities[:, hasRoom]
+        tail = (self.head[lines] + self.size[lines]) % self.capacities[lines]
+        self.data[:, lines, tail] = quantities
+        self.size[lines] += 1
+        return
+
+    def PopEnvelopes(self, lines):
+        # Pop the front envelope of each of 'lines', or zero where a line is empty
+        quantities = self.data[:, lines, self.head[lines]]
+        isEmpty = self.size[lines] == 0
+        if isEmpty.any():
+            quantities[:, isEmpty] = 0.0
+            lines = lines[~isEmpty]
+        self.head[lines] = (self.head[lines] + 1) % self.capacities[lines]
+        self.size[lines] -= 1
+        return quantities
+
+class NetworkSupplyChain:
+
+    def __init__(self, network, numReplications=1, customerOrders=None, config=DEFAULT_CONFIG):
+        # Vectorized engine for any acyclic SupplyNetwork, with no Python object per node
+        # 'customerOrders' is an optional demand array of shape (replications, weeks) shared by every
+        # demand node, or (replications, weeks, demand nodes); by default the Customer pattern is used
+        self.network = network
+        self.numReplications = numReplications
+        self.config = config
+        self.customerOrders = None if customerOrders is None else np.asarray(customerOrders, dtype=float)
+
+        numNodes = len(network.nodeNames)
+        self.numNodes = numNodes
+        self.linkSuppliers = np.asarray(network.linkSuppliers, dtype=np.int64)
+        self.linkCustomers = np.asarray(network.linkCustomers, dtype=np.int64)
+        hasDemand = np.asarray(network.nodeHasDemand, dtype=bool)
+        hasSupplier = np.bincount(self.linkCustomers, minlength=numNodes) > 0
+        hasCustomer = np.bincount(self.linkSuppliers, minlength=numNodes) > 0
+        if (hasDemand & hasCustomer).any():
+            raise ValueError("A node with customer demand cannot also supply other nodes")
+        if (~hasDemand & ~hasCustomer).any():
+            raise ValueError("Every node needs either customer demand or a downstream customer")
+        self.demandNodes = np.flatnonzero(hasDemand)
+        self.factoryNodes = np.flatnonzero(~hasSupplier)
+
+        # Split of each customer's orders over its suppliers, equal unless the link says otherwise
+        suppliersPerCustomer = np.bincount(self.linkCustomers, minlength=numNodes)
+        self.linkShares = np.array([1.0 / suppliersPerCustomer[customer] if share is None else float(share)
+                                    for customer, share in zip(network.linkCustomers, network.linkShares)])
+
+        # Levels: demand nodes are level 0 and every supplier sits above all of its customers, so the
+        # nodes of one level never trade with each other and can take their turn in a single step
+        self.levels = self.AssignLevels()
+        self.levelPlans = [self.PlanLevel(np.flatnonzero(self.levels == level)) for level in range(self.levels.max() + 1)]
+
+        # Delay lines: one order line and one delivery line per link, one production line per factory
+        linkLeadTimes = [config.queueDelayWeeks if lead is None else lead for lead in network.linkLeadTimeWeeks]
+        productionDelays = [config.queueDelayWeeks if network.nodeProductionDelayWeeks[node] is None
+                            else network.nodeProductionDelayWeeks[node] for node in self.factoryNodes]
+        if min(linkLeadTimes + productionDelays, default=1) < 1:
+            raise ValueError("Lead times and production delays must be at least one week")
+        self.orderLines = BatchDelayLines(linkLeadTimes, numReplications, config.customerInitialOrders)
+        self.deliveryLines = BatchDelayLines(linkLeadTimes, numReplications, config.customerInitialOrders)
+        self.productionLines = BatchDelayLines(productionDelays, numReplications, config.customerInitialOrders)
+        self.productionLineOfNode = np.full(numNodes, -1, dtype=np.int64)
+        self.productionLineOfNode[self.factoryNodes] = np.arange(len(self.factoryNodes))
+        self.demandColumnOfNode = np.full(numNodes, -1, dtype=np.int64)
+        self.demandColumnOfNode[self.demandNodes] = np.arange(len(self.demandNodes))
+
+        # Node state, one column per node
+        shape = (numReplications, numNodes)
+        self.currentStock = np.full(shape, config.initialStock, dtype=float)
+        self.currentOrders = np.full(shape, config.initialCurrentOrders, dtype=float)
+        self.costsIncurred = np.full(shape, config.initialCost, dtype=float)
+        self.lastOrderQuantity = np.zeros(shape)
+        self.lastIncomingOrders = np.zeros(shape)     # Orders each node received this week
+        self.lastDeliveryQuantity = np.zeros(shape)   # Quantity each node shipped downstream this week
+        self.customerBeerReceived = np.zeros((numReplications, len(self.demandNodes)))
+
+        # Outstanding orders per link, used to share a short shipment between several customers
+        customersPerSupplier = np.bincount(self.linkSuppliers, minlength=numNodes)
+        self.linkBacklog = np.tile(config.initialCurrentOrders / np.maximum(customersPerSupplier[self.linkSuppliers], 1),
+                                   (numReplications, 1))
+
+        self.costsOverTime = None
+        self.ordersOverTime = None
+        self.effectiveInventoryOverTime = None
+        return
+
+    def AssignLevels(self):
+        # Level of every node as an array; raises if the links form a cycle
+        return np.asarray(self.network.Levels(), dtype=np.int64)
+
+    def PlanLevel(self, nodes):
+        # Precompute the index arrays one level needs every week
+        inLevel = np.zeros(self.numNodes, dtype=bool)
+        inLevel[nodes] = True
+        incomingLinks = np.flatnonzero(inLevel[self.linkCustomers])   # Links this level orders on and receives from
+        outgoingLinks = np.flatnonzero(inLevel[self.linkSuppliers])   # Links this level ships on and takes orders from
+        return {
+            'nodes': nodes,
+            'incomingLinks': incomingLinks,
+            'outgoingLinks': outgoingLinks,
+            'factories': nodes[np.isin(nodes, self.factoryNodes)],
+            'demandNodes': nodes[np.isin(nodes, self.demandNodes)],
+            # Customers each node ships to: its outgoing links, or the end customer at demand nodes
+            'shipmentsPerNode': np.bincount(self.linkSuppliers, minlength=self.numNodes)[nodes] + np.isin(nodes, self.demandNodes),
+        }
+
+    def CalculateCustomerOrder(self, weekNum, demandNodes):
+        # Demand of the given demand nodes this week, shaped (replications, nodes)
+        if self.customerOrders is None:
+            if weekNum <= 5:
+                return np.full((self.numReplications, len(demandNodes)), float(self.config.customerInitialOrders))
+            return np.full((self.numReplications, len(demandNodes)), float(self.config.customerSubsequentOrders))
+        if self.customerOrders.ndim == 2:
+            return np.repeat(self.customerOrders[:, weekNum, None], len(demandNodes), axis=1)
+        return self.customerOrders[:, weekNum, self.demandColumnOfNode[demandNodes]]
+
+    def TakeLevelTurn(self, plan, weekNum):
+        # The five TakeTurn phases for every node of one level and every replication at once
+        nodes = plan['nodes']
+        incomingLinks = plan['incomingLinks']
+        outgoingLinks = plan['outgoingLinks']
+        factories = plan['factories']
+        demandNodes = plan['demandNodes']
+
+        # 1. Receive deliveries from suppliers, or finish production at factories
+        if len(incomingLinks):
+            received = self.deliveryLines.PopEnvelopes(incomingLinks)
+            np.add.at(self.currentStock, (slice(None), self.linkCustomers[incomingLinks]), np.where(received > 0, received, 0.0))
+        if len(factories):
+            produced = self.productionLines.PopEnvelopes(self.productionLineOfNode[factories])
+            self.currentStock[:, factories] += np.where(produced > 0, produced, 0.0)
+
+        # 2. Receive orders from customers, or from the end customer at demand nodes
+        self.lastIncomingOrders[:, nodes] = 0.0
+        if len(demandNodes):
+            customerOrder = self.CalculateCustomerOrder(weekNum, demandNodes)
+            self.currentOrders[:, demandNodes] += customerOrder
+            self.lastIncomingOrders[:, demandNodes] = customerOrder
+        if len(outgoingLinks):
+            thisOrder = self.orderLines.PopEnvelopes(outgoingLinks)
+            thisOrder = np.where(thisOrder > 0, thisOrder, 0.0)
+            np.add.at(self.currentOrders, (slice(None), self.linkSuppliers[outgoingLinks]), thisOrder)
+            np.add.at(self.lastIncomingOrders, (slice(None), self.linkSuppliers[outgoingLinks]), thisOrder)
+            self.linkBacklog[:, outgoingLinks] += thisOrder
+
+        # 3. Ship downstream, with the fixed delivery of 4 units per link during the first weeks
+        if weekNum <= 4:
+            self.lastDeliveryQuantity[:, nodes] = 4.0 * plan['shipmentsPerNode']
+            if len(outgoingLinks):
+                self.deliveryLines.PushEnvelopes(outgoingLinks, np.full((self.numReplications, len(outgoingLinks)), 4.0))
+            if len(demandNodes):
+                self.customerBeerReceived[:, self.demandColumnOfNode[demandNodes]] += 4.0
+        else:
+            ordersBeforeShipping = self.currentOrders[:, nodes].copy()
+            deliveryQuantity = self.CalcBeerToDeliver(nodes)
+            self.lastDeliveryQuantity[:, nodes] = deliveryQuantity
+            if len(outgoingLinks):
+                # Share the shipment between customers in proportion to what each of them is owed
+                suppliers = np.searchsorted(nodes, self.linkSuppliers[outgoingLinks])
+                owed = ordersBeforeShipping[:, suppliers]
+                backlog = self.linkBacklog[:, outgoingLinks]
+                fraction = np.divide(backlog, owed, out=np.zeros_like(backlog), where=owed > 0)
+                shipped = fraction * deliveryQuantity[:, suppliers]
+                self.deliveryLines.PushEnvelopes(outgoingLinks, shipped)
+                self.linkBacklog[:, outgoingLinks] = backlog - shipped
+            if len(demandNodes):
+                self.customerBeerReceived[:, self.demandColumnOfNode[demandNodes]] += \
+                    deliveryQuantity[:, np.searchsorted(nodes, demandNodes)]
+
+        # 4. Order from suppliers, or start production at factories
+        amountToOrder = self.CalcAmountToOrder(nodes, weekNum)
+        self.lastOrderQuantity[:, nodes] = amountToOrder
+        if len(incomingLinks):
+            customers = np.searchsorted(nodes, self.linkCustomers[incomingLinks])
+            self.orderLines.PushEnvelopes(incomingLinks, amountToOrder[:, customers] * self.linkShares[incomingLinks])
+        if len(factories):
+            self.productionLines.PushEnvelopes(self.productionLineOfNode[factories],
+                                               amountToOrder[:, np.searchsorted(nodes, factories)])
+
+        # 5. Update the costs for the current turn
+        self.costsIncurred[:, nodes] += (self.currentStock[:, nodes] * self.config.storageCostPerUnit
+                                         + self.currentOrders[:, nodes] * self.config.backorderPenaltyCostPerUnit)
+        return
+
+    def CalcBeerToDeliver(self, nodes):
+        # Vectorized SupplyChainActor.CalcBeerToDeliver for a set of nodes across all replications
+        stock = self.currentStock[:, nodes]
+        orders = self.currentOrders[:, nodes]
+
+        fullDelivery = stock >= orders
+        partialDelivery = ~fullDelivery & (stock > 0)
+        deliveryQuantity = np.where(fullDelivery, orders, np.where(partialDelivery, stock, 0.0))
+
+        self.currentStock[:, nodes] = stock - deliveryQuantity
+        self.currentOrders[:, nodes] = orders - deliveryQuantity
+        return deliveryQuantity
+
+    def CalcAmountToOrder(self, nodes, weekNum):
+        # Vectorized "anchor and maintain" rule of SupplyChainActor.CalcAmountToOrder
+        if weekNum <= 4:
+            return np.full((self.numReplications, len(nodes)), 4.0)
+
+        amountToOrder = 0.5 * self.currentOrders[:, nodes]
+        stockGap = self.config.targetStock - self.currentStock[:, nodes]
+        return np.where(stockGap > 0, amountToOrder + stockGap, amountToOrder)
+
+    def TakeTurn(self, weekNum):
+        # Advance the whole network by one week, demand-facing level first
+        for plan in self.levelPlans:
+            self.TakeLevelTurn(plan, weekNum)
+        return
+
+    def CalcEffectiveInventory(self):
+        # Effective inventory of every node in every replication
+        return self.currentStock - self.currentOrders
+
+    def Run(self, weeksToPlay=None, metrics=None):
+        # Play 'weeksToPlay' weeks (config.weeksToPlay by default), recording (weeks, replications, nodes) series
+        # 'metrics' is an optional BullwhipMetrics updated after every week
+        if weeksToPlay is None:
+            weeksToPlay = self.config.weeksToPlay
+        shape = (weeksToPlay, self.numReplications, self.numNodes)
+        self.costsOverTime = np.empty(shape)
+        self.ordersOverTime = np.empty(shape)
+        self.effectiveInventoryOverTime = np.empty(shape)
+
+        for thisWeek in range(0, weeksToPlay):
+            self.TakeTurn(thisWeek)
+            self.costsOverTime[thisWeek] = self.costsIncurred
+            self.ordersOverTime[thisWeek] = self.lastOrderQuantity
+            self.effectiveInventoryOverTime[thisWeek] = self.CalcEffectiveInventory()
+            if metrics is not None:
+                metrics.UpdateFromChain(self)
+        return
@@ -0,0 +1,103 @@
+"""Tune the per-tier anchor-and-adjust ordering policy by batched cross-entropy search."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .batch import NUMBER_OF_TIERS, BatchSupplyChain
+from .config import DEFAULT_CONFIG
+from .demand import StepDemand
+
+# Policy parameters tuned for every tier, in the order of the last axis of a candidate array
+POLICY_PARAMETERS = ('backlogWeight', 'targetStock', 'pipelineWeight')
+
+# Default search box for each policy parameter
+DEFAULT_BOUNDS = {
+    'backlogWeight': (0.0, 1.5),
+    'targetStock': (0.0, 60.0),
+    'pipelineWeight': (0.0, 1.0),
+}
+
+@dataclass
+class PolicyOptimizationResult:
+    # Best policy found, as a {parameter: per-tier array} mapping, and how the search went
+    bestPolicy: dict
+    bestCost: float
+    bestCostPerGeneration: list = field(default_factory=list)
+    meanCostPerGeneration: list = field(default_factory=list)
+
+def EvaluatePolicies(candidates, demand, config=DEFAULT_CONFIG):
+    # Mean total chain cost of every candidate, shape (candidates,), from ONE batched simulation
+    # 'candidates' has shape (candidates, tiers, len(POLICY_PARAMETERS)); every candidate plays the
+    # same demand rows (common random numbers), so cost differences come from the policy alone
+    candidates = np.asarray(candidates, dtype=float)
+    numCandidates = candidates.shape[0]
+    numScenarios = demand.shape[0]
+
+    # Replication r plays candidate r // numScenarios against demand row r % numScenarios
+    perReplication = np.repeat(candidates, numScenarios, axis=0)
+    chain = BatchSupplyChain(numCandidates * numScenarios, np.tile(demand, (numCandidates, 1)), config,
+                             backlogWeight=perReplication[:, :, 0],
+                             targetStock=perReplication[:, :, 1],
+                             pipelineWeight=perReplication[:, :, 2])
+    for thisWeek in range(0, demand.shape[1]):
+        chain.TakeTurn(thisWeek)
+    return chain.costsIncurred.sum(axis=1).reshape(numCandidates, numScenarios).mean(axis=1)
+
+def EvaluatePoliciesInParallel(candidates, demand, config, executor, numChunks):
+    # Split the candidates into 'numChunks' batched simulations on the executor (or in-process without one)
+    if executor is None or numChunks <= 1:
+        return EvaluatePolicies(candidates, demand, config)
+    chunks = np.array_split(candidates, numChunks)
+    futures = [executor.submit(EvaluatePolicies, chunk, demand, config) for chunk in chunks if len(chunk)]
+    return np.concatenate([future.result() for future in futures])
+
+def optimize_policy(config=DEFAULT_CONFIG, demandGenerator=None, numScenarios=64, populationSize=64,
+                    generations=25, eliteFraction=0.2, tunePipeline=True, bounds=None, seed=0, maxWorkers=1):
+    # Cross-entropy search over per-tier (backlogWeight, targetStock, pipelineWeight) minimizing mean
+    # total chain cost over 'numScenarios' demand scenarios drawn once from 'demandGenerator'
+    # Each generation is scored as batched simulations split over 'maxWorkers' processes
+    bounds = {**DEFAULT_BOUNDS, **(bounds or {})}
+    low = np.array([bounds[name][0] for name in POLICY_PARAMETERS])
+    high = np.array([bounds[name][1] for name in POLICY_PARAMETERS])
+    if not tunePipeline:
+        low[2] = high[2] = 0.0
+
+    demandGenerator = demandGenerator or StepDemand.FromConfig(config)
+    demand = demandGenerator.Generate(numScenarios, config.weeksToPlay, seed=seed)
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1 << 20,)))
+
+    # Start from the hard-coded policy of the original game
+    shape = (NUMBER_OF_TIERS, len(POLICY_PARAMETERS))
+    mean = np.broadcast_to(np.clip([0.5, config.targetStock, 0.0], low, high), shape).copy()
+    std = np.broadcast_to((high - low) / 4.0, shape).copy()
+    numElite = max(2, int(round(eliteFraction * populationSize)))
+
+    result = PolicyOptimizationResult(bestPolicy={}, bestCost=np.inf)
+    bestCandidate = mean.copy()
+    maxWorkers = maxWorkers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=maxWorkers) if maxWorkers > 1 else None
+    try:
+        for generation in range(generations):
+            candidates = np.clip(mean + std * rng.standard_normal((populationSize,) + shape), low, high)
+            candidates[0] = mean  # Always re-score the current mean so the search never loses it
+            costs = EvaluatePoliciesInParallel(candidates, demand, config, executor, maxWorkers)
+
+            order = np.argsort(costs)
+            elite = candidates[order[:numElite]]
+            mean = elite.mean(axis=0)
+            std = elite.std(axis=0) + 1e-6 * (high - low)
+
+            if costs[order[0]] < result.bestCost:
+                result.bestCost = float(costs[order[0]])
+                bestCandidate = candidates[order[0]].copy()
+            result.bestCostPerGeneration.append(result.bestCost)
+            result.meanCostPerGeneration.append(float(costs.mean()))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    result.bestPolicy = {name: bestCandidate[:, i] for i, name in enumerate(POLICY_PARAMETERS)}
+    return result
@@ -0,0 +1,102 @@
+"""Plot building blocks that stay responsive for very long runs and large Monte Carlo batches."""
+
+import numpy as np
+import plotly.graph_objects as go
+
+from .statistics import TIER_COLOURS, TIER_NAMES
+
+# Most points drawn per trace; longer series are downsampled with LTTB (None draws every point)
+DEFAULT_MAX_POINTS = 2000
+
+# Traces with more points than this are drawn with WebGL (go.Scattergl) instead of SVG; it sits below
+# DEFAULT_MAX_POINTS, so a long series downsampled to the default budget is still drawn with WebGL
+WEBGL_THRESHOLD = 1000
+
+# Traces with more points than this are drawn as lines only, without a marker per week
+MARKER_THRESHOLD = 200
+
+# Percentiles drawn by fan charts: symmetric pairs form the bands, the middle one is the line
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+def LargestTriangleThreeBuckets(values, maxPoints):
+    # Indices of at most 'maxPoints' points of a uniformly spaced series chosen by Largest-Triangle-Three-Buckets:
+    # the first and last points are kept, and every bucket in between keeps the point forming the largest
+    # triangle with the previously kept point and the mean of the next bucket, which preserves peaks and troughs
+    values = np.asarray(values, dtype=float)
+    numPoints = len(values)
+    if maxPoints is None or numPoints <= maxPoints or maxPoints < 3:
+        return np.arange(numPoints)
+
+    edges = np.linspace(1, numPoints - 1, maxPoints - 1).astype(np.int64)  # maxPoints - 2 interior buckets
+    edges = np.append(edges, numPoints)  # The last point forms the bucket after the last interior one
+    indices = np.empty(maxPoints, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = numPoints - 1
+
+    kept = 0
+    for bucket in range(maxPoints - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        nextStart, nextEnd = edges[bucket + 1], edges[bucket + 2]
+        nextX = (nextStart + nextEnd - 1) / 2.0
+        nextY = values[nextStart:nextEnd].mean()
+        candidates = np.arange(start, end)
+        area = np.abs((kept - nextX) * (values[start:end] - values[kept]) - (kept - candidates) * (nextY - values[kept]))
+        kept = start + int(np.argmax(area))
+        indices[bucket + 1] = kept
+    return indices
+
+def Transparent(colour, alpha):
+    # 'rgb(r,g,b)' as 'rgba(r,g,b,alpha)'
+    return colour.replace('rgb(', 'rgba(').replace(')', f',{alpha})')
+
+def ScatterType(numPoints):
+    # SVG traces below WEBGL_THRESHOLD points, WebGL above
+    return go.Scattergl if numPoints > WEBGL_THRESHOLD else go.Scatter
+
+def LineTrace(values, name, colour, maxPoints=DEFAULT_MAX_POINTS):
+    # One series against its week numbers, downsampled to 'maxPoints'
+    indices = LargestTriangleThreeBuckets(values, maxPoints)
+    mode = 'lines+markers' if len(indices) <= MARKER_THRESHOLD else 'lines'
+    return ScatterType(len(indices))(x=indices, y=np.asarray(values)[indices], mode=mode, name=name,
+                                     marker=dict(size=5), marker_color=colour)
+
+def FanTraces(samples, name, colour, percentiles=DEFAULT_PERCENTILES, maxPoints=DEFAULT_MAX_POINTS):
+    # Percentile bands and median line of a (weeks, replications) ensemble
+    # Every band uses the weeks that LTTB keeps for the middle percentile, so the bands stay aligned
+    bands = np.percentile(samples, percentiles, axis=1)
+    middle = len(percentiles) // 2
+    indices = LargestTriangleThreeBuckets(bands[middle], maxPoints)
+    Scatter = ScatterType(len(indices))
+
+    traces = []
+    for band in range(middle):
+        low, high = bands[band][indices], bands[-1 - band][indices]
+        label = f'{name} {percentiles[band]}-{percentiles[-1 - band]}%'
+        traces.append(Scatter(x=indices, y=high, mode='lines', line=dict(width=0), legendgroup=label,
+                              showlegend=False, hoverinfo='skip'))
+        traces.append(Scatter(x=indices, y=low, mode='lines', line=dict(width=0), fill='tonexty',
+                              fillcolor=Transparent(colour, 0.15 + 0.15 * band), legendgroup=label, name=label))
+    traces.append(Scatter(x=indices, y=bands[middle][indices], mode='lines', name=f'{name} {percentiles[middle]}%',
+                          line=dict(color=colour)))
+    return traces
+
+def FinishFigure(fig, titleText, yAxisTitle, numWeeks):
+    # Layout shared by every plot of the package
+    fig.update_layout(title_text=titleText, xaxis_title='Weeks', yaxis_title=yAxisTitle,
+                      paper_bgcolor='rgba(0,0,0,0)', height=580)
+    fig.update_xaxes(range=[0, numWeeks])
+    return fig
+
+def plot_fan_chart(series, titleText, yAxisTitle, traceLabel='', names=TIER_NAMES, colours=TIER_COLOURS,
+                   percentiles=DEFAULT_PERCENTILES, maxPoints=DEFAULT_MAX_POINTS, show=True):
+    # Percentile fan chart of a (weeks, replications, series) batch history, one fan per series,
+    # e.g. BatchSupplyChain.ordersOverTime; returns the figure
+    series = np.asarray(series)
+    fig = go.Figure()
+    for column, name in enumerate(names):
+        fig.add_traces(FanTraces(series[:, :, column], f'{name} {traceLabel}'.strip(), colours[column % len(colours)],
+                                 percentiles, maxPoints))
+    FinishFigure(fig, titleText, yAxisTitle, series.shape[0])
+    if show:
+        fig.show()
+    return fig
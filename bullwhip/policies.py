@@ -0,0 +1,293 @@
+"""Vectorized ordering policies shared by the batch engine and the object model.
+
+A policy is called once per tier and week with a PolicyState: (replications,) views of that tier's
+stock, backlog, incoming orders and supply line in every replication. It returns the quantities the tier
+orders (or, at the factory, starts brewing) in all of them at once, so a batch of any size costs one
+Python call per tier and week. The fixed start-up orders of weeks 0 to 4 are part of the game and come
+before any policy.
+
+TierPolicies gives every tier its own policy. GroupPolicies runs a different policy on each block of
+replications, so many policies can be compared in one batch; compare_policies does this against common
+demand.
+"""
+
+import copy
+from dataclasses import dataclass
+
+import numpy as np
+
+from .config import DEFAULT_CONFIG
+from .demand import PoissonDemand
+from .snapshot import Actors
+
+class PolicyState:
+
+    def __init__(self, tier, stock, backlog, incomingOrders, supplyLine):
+        # What a policy sees of one tier when it orders, as (replications,) views: its stock, its backlog
+        # of unfilled orders, the orders it received this week and its supply line (goods ordered but not
+        # yet received, including the supplier's backlog of them)
+        # 'supplyLine' is an array or a function computing it, only called if a policy reads it
+        self.tier = tier
+        self.stock = stock
+        self.backlog = backlog
+        self.incomingOrders = incomingOrders
+        self.supplyLineSource = supplyLine
+        return
+
+    @property
+    def supplyLine(self):
+        if callable(self.supplyLineSource):
+            self.supplyLineSource = self.supplyLineSource()
+        return self.supplyLineSource
+
+    @property
+    def inventoryPosition(self):
+        # Stock minus backlog plus supply line
+        return self.stock - self.backlog + self.supplyLine
+
+    def Rows(self, rows):
+        # The same state restricted to a slice of replications, still as views
+        return PolicyState(self.tier, self.stock[rows], self.backlog[rows], self.incomingOrders[rows],
+                           lambda: self.supplyLine[rows])
+
+class OrderingPolicy:
+    # Base class: subclasses implement Order(state), returning the (replications,) quantities tier
+    # state.tier orders this week
+    # The engine calls Prepare(config, primedSupplyLine) before the first week, with the (replications,
+    # tiers) supply line right after the queues were primed; policies broadcast their parameters to that
+    # shape and dtype there and reset anything they remember
+
+    def Prepare(self, config, primedSupplyLine):
+        return
+
+    def Order(self, state):
+        raise NotImplementedError
+
+def PerTier(value, default, primedSupplyLine):
+    # 'value' (or 'default' when it is None) broadcast to the (replications, tiers) shape and dtype of the batch
+    value = default if value is None else value
+    return np.broadcast_to(np.asarray(value, dtype=primedSupplyLine.dtype), primedSupplyLine.shape)
+
+@dataclass
+class AnchorAndAdjustPolicy(OrderingPolicy):
+    # The game's rule: backlogWeight times the backlog, plus the gap to targetStock when below it, plus
+    # pipelineWeight times the gap between targetPipeline and the supply line, never negative once that
+    # correction is used; targetStock defaults to config.targetStock and targetPipeline to the primed
+    # supply line; every parameter broadcasts to (replications, tiers)
+    backlogWeight: object = 0.5
+    targetStock: object = None
+    pipelineWeight: object = 0.0
+    targetPipeline: object = None
+
+    def Prepare(self, config, primedSupplyLine):
+        self.backlogWeights = PerTier(self.backlogWeight, None, primedSupplyLine)
+        self.targetStocks = PerTier(self.targetStock, config.targetStock, primedSupplyLine)
+        self.pipelineWeights = PerTier(self.pipelineWeight, None, primedSupplyLine)
+        self.targetPipelines = PerTier(self.targetPipeline, primedSupplyLine, primedSupplyLine)
+        self.usesPipeline = bool(np.any(self.pipelineWeights != 0))
+        return
+
+    def Order(self, state):
+        tier = state.tier
+        amountToOrder = self.backlogWeights[:, tier] * state.backlog
+        stockGap = self.targetStocks[:, tier] - state.stock
+        amountToOrder += np.fmax(stockGap, 0.0)  # The gap only counts below target; cheaper than np.where
+
+        # Optional supply-line correction, never turning the order negative
+        if self.usesPipeline:
+            pipelineGap = self.targetPipelines[:, tier] - state.supplyLine
+            amountToOrder = np.maximum(amountToOrder + self.pipelineWeights[:, tier] * pipelineGap, 0.0)
+        return amountToOrder
+
+@dataclass
+class OrderUpToPolicy(OrderingPolicy):
+    # Base-stock policy: order whatever lifts the inventory position back to orderUpToLevel, which
+    # defaults to config.targetStock on top of the primed supply line
+    orderUpToLevel: object = None
+
+    def Prepare(self, config, primedSupplyLine):
+        self.levels = PerTier(self.orderUpToLevel, config.targetStock + primedSupplyLine, primedSupplyLine)
+        return
+
+    def Order(self, state):
+        return np.maximum(self.levels[:, state.tier] - state.inventoryPosition, 0.0)
+
+@dataclass
+class ReorderPointPolicy(OrderingPolicy):
+    # (s, S) policy: once the inventory position falls to reorderPoint s, order up to orderUpToLevel S,
+    # otherwise order nothing; S defaults as for OrderUpToPolicy and s to one week of demand below it
+    reorderPoint: object = None
+    orderUpToLevel: object = None
+
+    def Prepare(self, config, primedSupplyLine):
+        self.levels = PerTier(self.orderUpToLevel, config.targetStock + primedSupplyLine, primedSupplyLine)
+        self.reorderPoints = PerTier(self.reorderPoint, self.levels - config.customerSubsequentOrders,
+                                     primedSupplyLine)
+        return
+
+    def Order(self, state):
+        tier = state.tier
+        position = state.inventoryPosition
+        return np.where(position <= self.reorderPoints[:, tier],
+                        np.maximum(self.levels[:, tier] - position, 0.0), 0.0)
+
+@dataclass
+class SmoothedForecastPolicy(OrderingPolicy):
+    # Orders the exponentially smoothed forecast of incoming orders, plus stockWeight times the gap
+    # between targetStock and the net stock (stock minus backlog), plus pipelineWeight times the gap
+    # between the desired and the actual supply line; the desired supply line is the primed one scaled
+    # by forecast over the initial customer orders; the forecast starts at initialForecast
+    # (config.customerInitialOrders by default) and follows the orders received from week 5 on
+    smoothing: object = 0.25
+    stockWeight: object = 0.5
+    pipelineWeight: object = 0.25
+    targetStock: object = None
+    initialForecast: object = None
+
+    def Prepare(self, config, primedSupplyLine):
+        self.smoothings = PerTier(self.smoothing, None, primedSupplyLine)
+        self.stockWeights = PerTier(self.stockWeight, None, primedSupplyLine)
+        self.pipelineWeights = PerTier(self.pipelineWeight, None, primedSupplyLine)
+        self.targetStocks = PerTier(self.targetStock, config.targetStock, primedSupplyLine)
+        self.forecast = PerTier(self.initialForecast, config.customerInitialOrders, primedSupplyLine).copy()  # Kept between weeks
+        self.primedSupplyLine = primedSupplyLine
+        self.primedDemand = config.customerInitialOrders
+        return
+
+    def Order(self, state):
+        tier = state.tier
+        forecast = self.forecast[:, tier]
+        forecast += self.smoothings[:, tier] * (state.incomingOrders - forecast)
+
+        desiredSupplyLine = self.primedSupplyLine[:, tier]
+        if self.primedDemand:
+            desiredSupplyLine = desiredSupplyLine * (forecast / self.primedDemand)
+        amountToOrder = (forecast + self.stockWeights[:, tier] * (self.targetStocks[:, tier] - (state.stock - state.backlog))
+                         + self.pipelineWeights[:, tier] * (desiredSupplyLine - state.supplyLine))
+        return np.maximum(amountToOrder, 0.0)
+
+class TierPolicies(OrderingPolicy):
+
+    def __init__(self, policies):
+        # One policy per tier, in TIER_NAMES order; use distinct instances for policies that remember
+        # anything between weeks, such as SmoothedForecastPolicy
+        self.policies = tuple(policies)
+        return
+
+    def __repr__(self):
+        return f"TierPolicies({list(self.policies)!r})"
+
+    def Prepare(self, config, primedSupplyLine):
+        if len(self.policies) != primedSupplyLine.shape[1]:
+            raise ValueError(f"{len(self.policies)} policies given for {primedSupplyLine.shape[1]} tiers")
+        for policy in self.policies:
+            policy.Prepare(config, primedSupplyLine)
+        return
+
+    def Order(self, state):
+        return self.policies[state.tier].Order(state)
+
+class GroupPolicies(OrderingPolicy):
+
+    def __init__(self, policies, groupSize):
+        # policies[g] orders for replications g * groupSize .. (g + 1) * groupSize - 1, so a batch of
+        # len(policies) * groupSize replications compares them all; each policy needs its own instance
+        self.policies = tuple(policies)
+        self.groupSize = groupSize
+        return
+
+    def __repr__(self):
+        return f"GroupPolicies({list(self.policies)!r}, groupSize={self.groupSize})"
+
+    def Groups(self):
+        return [slice(g * self.groupSize, (g + 1) * self.groupSize) for g in range(len(self.policies))]
+
+    def Prepare(self, config, primedSupplyLine):
+        if len(self.policies) * self.groupSize != primedSupplyLine.shape[0]:
+            raise ValueError(f"{len(self.policies)} groups of {self.groupSize} replications do not match "
+                             f"a batch of {primedSupplyLine.shape[0]}")
+        for policy, rows in zip(self.policies, self.Groups()):
+            policy.Prepare(config, primedSupplyLine[rows])
+        return
+
+    def Order(self, state):
+        amountToOrder = np.empty(len(state.stock), dtype=state.stock.dtype)
+        for policy, rows in zip(self.policies, self.Groups()):
+            amountToOrder[rows] = policy.Order(state.Rows(rows))
+        return amountToOrder
+
+def ObjectSupplyLine(result, tier):
+    # Supply line of one actor of a SimulationResult, as BatchSupplyChain.CalcSupplyLine computes it
+    actors = Actors(result)
+    if tier == len(actors) - 1:
+        return actors[tier].BeerProductionDelayQueue.PipelineInventory()
+    actor = actors[tier]
+    return (actor.outgoingOrdersQueue.PipelineInventory() + actors[tier + 1].currentOrders
+            + actor.incomingDeliveriesQueue.PipelineInventory())
+
+class ActorPolicy:
+
+    def __init__(self, result, tier, policy):
+        # Callable an object-model actor orders with: it shows 'policy' the actor as a batch of one
+        self.result = result
+        self.tier = tier
+        self.policy = policy
+        return
+
+    def __call__(self, weekNum):
+        actor = Actors(self.result)[self.tier]
+        state = PolicyState(self.tier, np.array([actor.currentStock], dtype=float),
+                            np.array([actor.currentOrders], dtype=float),
+                            np.array([actor.lastIncomingOrder], dtype=float),
+                            lambda: np.array([ObjectSupplyLine(self.result, self.tier)], dtype=float))
+        return float(self.policy.Order(state)[0])
+
+    def Rebind(self, result, memo):
+        # Copy of this callable ordering for the same tier of 'result', with a copy of the policy and
+        # everything it remembers; pass one 'memo' for all actors so a policy they share stays shared
+        return ActorPolicy(result, self.tier, copy.deepcopy(self.policy, memo))
+
+def attach_policy(result, policy, tiers=None):
+    # Let the actors of a SimulationResult from start_simulation order by 'policy' from week 5 on: those
+    # of the given 'tiers' (indices in TIER_NAMES order), or all of them; attach before the first week,
+    # since the policy is prepared with the primed supply line
+    actors = Actors(result)
+    primedSupplyLine = np.array([[ObjectSupplyLine(result, tier) for tier in range(len(actors))]], dtype=float)
+    policy.Prepare(result.config, primedSupplyLine)
+    for tier in range(len(actors)) if tiers is None else tiers:
+        actors[tier].orderingPolicy = ActorPolicy(result, tier, policy)
+    return result
+
+def compare_policies(policies, config=DEFAULT_CONFIG, demandGenerator=PoissonDemand(), numScenarios=256, seed=0,
+                     warmupWeeks=5):
+    # Play every policy in 'policies' (a {name: policy} mapping or a sequence) against the same
+    # 'numScenarios' demand scenarios in ONE batch, and return a pandas DataFrame with a row per policy:
+    # the mean total chain cost and, per tier, the mean cost, variance amplification and fill rate
+    import pandas as pd  # Imported lazily so simulations never load pandas
+
+    from .batch import BatchSupplyChain  # Imported here, since the batch engine builds on this module
+    from .metrics import BullwhipMetrics
+    from .statistics import TIER_NAMES
+
+    if not isinstance(policies, dict):
+        policies = {f'{index}: {type(policy).__name__}': policy for index, policy in enumerate(policies)}
+    demand = demandGenerator.Generate(numScenarios, config.weeksToPlay, seed)
+    numPolicies = len(policies)
+
+    chain = BatchSupplyChain(numPolicies * numScenarios, np.tile(demand, (numPolicies, 1)), config,
+                             policy=GroupPolicies(policies.values(), numScenarios))
+    metrics = BullwhipMetrics(chain.numReplications, warmupWeeks=warmupWeeks)
+    for thisWeek in range(config.weeksToPlay):
+        chain.TakeTurn(thisWeek)
+        metrics.UpdateFromChain(chain)
+
+    def PerPolicy(values):
+        return np.nanmean(values.reshape(numPolicies, numScenarios, -1), axis=1)
+
+    columns = {'totalCost': PerPolicy(chain.costsIncurred.sum(axis=1))[:, 0]}
+    for name, values in (('cost', chain.costsIncurred), ('varianceAmplification', metrics.VarianceAmplification()),
+                         ('fillRate', metrics.FillRate())):
+        perPolicy = PerPolicy(values)
+        for tier, tierName in enumerate(TIER_NAMES):
+            columns[f'{tierName}.{name}'] = perPolicy[:, tier]
+    return pd.DataFrame(columns, index=pd.Index(list(policies), name='policy'))
@@ -0,0 +1,176 @@
+"""Per-phase, per-tier profiling of the object model, attached to one run at a time.
+
+Nothing in the model refers to the profiler: ``PhaseProfiler.Attach`` shadows the phase methods of
+the actors and queues of one run with timed wrappers and ``Detach`` removes them again, so runs
+without a profiler execute exactly the code they always did.
+"""
+
+import json
+import time
+
+from .snapshot import Actors, Queues
+from .statistics import TIER_NAMES
+
+# The five phases of every TakeTurn
+RECEIVE_DELIVERY = 'receiveDelivery'
+RECEIVE_ORDERS = 'receiveOrders'
+SHIP = 'ship'
+ORDER = 'order'
+COST = 'cost'
+PHASE_NAMES = (RECEIVE_DELIVERY, RECEIVE_ORDERS, SHIP, ORDER, COST)
+
+# Actor methods making up each phase; the factory finishes production and brews instead of receiving and ordering
+PHASE_OF_METHOD = {
+    'ReceiveIncomingDelivery': RECEIVE_DELIVERY,
+    'FinishProduction': RECEIVE_DELIVERY,
+    'ReceiveIncomingOrders': RECEIVE_ORDERS,
+    'ReceiveIncomingOrderFromCustomer': RECEIVE_ORDERS,
+    'CalcBeerToDeliver': SHIP,
+    'PlaceOutgoingDelivery': SHIP,
+    'ShipOutgoingDeliveryToCustomer': SHIP,
+    'PlaceOutgoingOrder': ORDER,
+    'ProduceBeer': ORDER,
+    'CalcCostForTurn': COST,
+}
+
+# Name of every queue returned by snapshot.Queues, in the same order
+QUEUE_NAMES = ('Retailer orders', 'Retailer deliveries', 'Wholesaler orders', 'Wholesaler deliveries',
+               'Distributor orders', 'Distributor deliveries', 'Factory production')
+
+class PhaseProfiler:
+
+    def __init__(self, recordTrace=False):
+        # Timers for every (tier, phase) and every whole turn, stockout counts per tier, and push, pop
+        # and overflow counts per queue; 'recordTrace' also keeps one event per call for WriteChromeTrace
+        # Phase calls count timed method calls, e.g. shipping is CalcBeerToDeliver then PlaceOutgoingDelivery
+        self.recordTrace = recordTrace
+        self.phaseCalls = {(tier, phase): 0 for tier in TIER_NAMES for phase in PHASE_NAMES}
+        self.phaseNanoseconds = dict.fromkeys(self.phaseCalls, 0)
+        self.turnNanoseconds = dict.fromkeys(TIER_NAMES, 0)
+        self.stockouts = dict.fromkeys(TIER_NAMES, 0)   # Deliveries that left orders unfilled
+        self.queueCounters = {name: {'pushes': 0, 'pops': 0, 'overflows': 0} for name in QUEUE_NAMES}
+        self.traceEvents = []   # (name, tier index, start ns, duration ns, week) of every timed call
+        self.inPhase = False    # Set while a phase runs, so phase methods calling each other are timed once
+        self.currentWeek = -1
+        self.origin = time.perf_counter_ns()
+        self.shadowed = []      # Objects whose methods are currently wrapped, with the attribute names
+        return
+
+    def Attach(self, result):
+        # Wrap the phase methods of every actor and queue of 'result' (from start_simulation)
+        for tier, actor in enumerate(Actors(result)):
+            self.Shadow(actor, 'TakeTurn', self.TimedTurn(actor.TakeTurn, tier))
+            for methodName, phase in PHASE_OF_METHOD.items():
+                if hasattr(actor, methodName):
+                    self.Shadow(actor, methodName, self.TimedPhase(getattr(actor, methodName), actor, tier, phase))
+        for name, queue in zip(QUEUE_NAMES, Queues(result)):
+            self.Shadow(queue, 'PushEnvelope', self.CountedPush(queue.PushEnvelope, queue, self.queueCounters[name]))
+            self.Shadow(queue, 'PopEnvelope', self.CountedPop(queue.PopEnvelope, self.queueCounters[name]))
+        return self
+
+    def Detach(self):
+        # Remove every wrapper, restoring the class methods
+        for target, methodName in self.shadowed:
+            del target.__dict__[methodName]
+        self.shadowed = []
+        return
+
+    def Shadow(self, target, methodName, wrapper):
+        # Install 'wrapper' as an instance attribute hiding the class method of the same name
+        setattr(target, methodName, wrapper)
+        self.shadowed.append((target, methodName))
+        return
+
+    def TimedTurn(self, method, tier):
+        # Wrapper timing a whole TakeTurn and remembering the week for the phase events inside it
+        tierName = TIER_NAMES[tier]
+
+        def Wrapper(weekNum):
+            self.currentWeek = weekNum
+            start = time.perf_counter_ns()
+            method(weekNum)
+            duration = time.perf_counter_ns() - start
+            self.turnNanoseconds[tierName] += duration
+            if self.recordTrace:
+                self.traceEvents.append(('TakeTurn', tier, start, duration, weekNum))
+            return
+        return Wrapper
+
+    def TimedPhase(self, method, actor, tier, phase):
+        # Wrapper timing one phase method; a call made from inside another phase is not timed again
+        key = (TIER_NAMES[tier], phase)
+        countsStockouts = method.__name__ == 'CalcBeerToDeliver'
+
+        def Wrapper(*args):
+            if self.inPhase:
+                returned = method(*args)
+            else:
+                self.inPhase = True
+                start = time.perf_counter_ns()
+                try:
+                    returned = method(*args)
+                finally:
+                    self.inPhase = False
+                duration = time.perf_counter_ns() - start
+                self.phaseCalls[key] += 1
+                self.phaseNanoseconds[key] += duration
+                if self.recordTrace:
+                    self.traceEvents.append((phase, tier, start, duration, self.currentWeek))
+            if countsStockouts and actor.currentOrders > 0:
+                self.stockouts[key[0]] += 1  # Stock ran out before every order was filled
+            return returned
+        return Wrapper
+
+    @staticmethod
+    def CountedPush(method, queue, counters):
+        # Wrapper counting pushes, and pushes arriving at a full queue
+        def Wrapper(numberOfCasesToOrder):
+            counters['pushes'] += 1
+            if queue.size >= queue.queueLength:
+                counters['overflows'] += 1
+            return method(numberOfCasesToOrder)
+        return Wrapper
+
+    @staticmethod
+    def CountedPop(method, counters):
+        # Wrapper counting pops
+        def Wrapper():
+            counters['pops'] += 1
+            return method()
+        return Wrapper
+
+    def Report(self):
+        # Structured report: per tier, the time and calls of every phase, the whole turn and the stockouts,
+        # and the counters of every queue
+        tiers = {}
+        for tierName in TIER_NAMES:
+            phases = {phase: {'calls': self.phaseCalls[tierName, phase],
+                              'seconds': self.phaseNanoseconds[tierName, phase] / 1e9} for phase in PHASE_NAMES}
+            tiers[tierName] = {'phases': phases, 'turnSeconds': self.turnNanoseconds[tierName] / 1e9,
+                               'stockouts': self.stockouts[tierName]}
+        return {'tiers': tiers, 'queues': {name: dict(counters) for name, counters in self.queueCounters.items()}}
+
+    def AsDataFrame(self):
+        # pandas DataFrame with one row per (tier, phase): calls, total seconds and the share of the tier's turn time
+        import pandas as pd  # Imported lazily so profiling never loads pandas
+
+        rows = []
+        for (tierName, phase), calls in self.phaseCalls.items():
+            seconds = self.phaseNanoseconds[tierName, phase] / 1e9
+            turnSeconds = self.turnNanoseconds[tierName] / 1e9
+            rows.append({'tier': tierName, 'phase': phase, 'calls': calls, 'seconds': seconds,
+                         'shareOfTurn': seconds / turnSeconds if turnSeconds else float('nan')})
+        return pd.DataFrame.from_records(rows).set_index(['tier', 'phase'])
+
+    def WriteChromeTrace(self, path):
+        # Write the recorded events in the Chrome trace event format (chrome://tracing, Perfetto), one track per tier
+        if not self.recordTrace:
+            raise ValueError("PhaseProfiler was created without recordTrace=True")
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': tier, 'args': {'name': tierName}}
+                  for tier, tierName in enumerate(TIER_NAMES)]
+        for name, tier, start, duration, week in self.traceEvents:
+            events.append({'name': name, 'cat': TIER_NAMES[tier], 'ph': 'X', 'pid': 0, 'tid': tier,
+                           'ts': (start - self.origin) / 1e3, 'dur': duration / 1e3, 'args': {'week': week}})
+        with open(path, 'w') as traceFile:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, traceFile)
+        return
@@ -0,0 +1,246 @@
+"""Local and global sensitivity of chain cost and bullwhip amplification, from one batched simulation.
+
+Every design point (the baseline, the finite-difference perturbations, the Morris trajectories and
+the Sobol samples) becomes a block of replications of the same BatchSupplyChain, and every block
+plays the same demand rows (common random numbers), so differences between points come from the
+parameters alone. Points only need separate batches when their queueDelayWeeks differ, because the
+queue length is shared by all replications of a batch.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .batch import FACTORY, NUMBER_OF_TIERS, BatchSupplyChain
+from .config import DEFAULT_CONFIG
+from .demand import PoissonDemand
+from .metrics import BullwhipMetrics
+from .statistics import TIER_NAMES
+
+# Outputs reported for every design point: mean total chain cost, and the mean ratio of the factory's
+# order variance to the customer demand variance (the amplification over the whole chain)
+OUTPUT_NAMES = ('totalCost', 'amplification')
+
+# Settings that are given per tier to BatchSupplyChain
+TIER_SETTINGS = ('storageCostPerUnit', 'backorderPenaltyCostPerUnit', 'targetStock', 'backlogWeight', 'pipelineWeight')
+
+# Ordering policy values of the original game that are not part of SimulationConfig
+POLICY_DEFAULTS = {'backlogWeight': 0.5, 'pipelineWeight': 0.0}
+
+@dataclass(frozen=True)
+class SensitivityParameter:
+    # One input of the analysis: a TIER_SETTINGS entry or 'queueDelayWeeks', varied over [low, high]
+    # 'tier' restricts a per-tier setting to one actor; None changes it for every actor at once
+    setting: str
+    low: float
+    high: float
+    tier: int = None
+
+    def __post_init__(self):
+        if self.setting not in TIER_SETTINGS and self.setting != 'queueDelayWeeks':
+            raise ValueError(f"Unknown sensitivity setting {self.setting!r}")
+        if not self.low < self.high:
+            raise ValueError(f"{self.name} needs low < high, got {self.low} and {self.high}")
+
+    @property
+    def name(self):
+        return self.setting if self.tier is None else f'{self.setting}[{TIER_NAMES[self.tier]}]'
+
+    @property
+    def integer(self):
+        # Queue delays are whole weeks, so sampled values are rounded
+        return self.setting == 'queueDelayWeeks'
+
+    def FromUnit(self, unit):
+        # Parameter values of points in [0, 1]
+        values = self.low + np.asarray(unit, dtype=float) * (self.high - self.low)
+        return np.rint(values) if self.integer else values
+
+    def ToUnit(self, values):
+        return (np.asarray(values, dtype=float) - self.low) / (self.high - self.low)
+
+# The cost rates and delay of the whole chain, and the ordering policy of every actor: 15 parameters
+DEFAULT_PARAMETERS = (
+    SensitivityParameter('storageCostPerUnit', 0.25, 1.0),
+    SensitivityParameter('backorderPenaltyCostPerUnit', 0.5, 2.0),
+    SensitivityParameter('queueDelayWeeks', 1, 4),
+    *(SensitivityParameter('targetStock', 0.0, 24.0, tier) for tier in range(NUMBER_OF_TIERS)),
+    *(SensitivityParameter('backlogWeight', 0.0, 1.0, tier) for tier in range(NUMBER_OF_TIERS)),
+    *(SensitivityParameter('pipelineWeight', 0.0, 1.0, tier) for tier in range(NUMBER_OF_TIERS)),
+)
+
+@dataclass
+class SensitivityResult:
+    # Outputs at the baseline, one DataFrame per method with a row per parameter (None if not run),
+    # and the number of design points simulated together
+    baseline: dict
+    local: object = None
+    morris: object = None
+    sobol: object = None
+    numPoints: int = 0
+
+def BaselineValue(setting, config):
+    # Value of a setting in the original game
+    if setting in POLICY_DEFAULTS:
+        return POLICY_DEFAULTS[setting]
+    return float(getattr(config, setting))
+
+def EvaluateDesign(points, parameters, demand, config=DEFAULT_CONFIG, warmupWeeks=5):
+    # {output: (points,) array} for a (points, parameters) array of parameter values; point p plays
+    # every demand row, and settings that are not parameters keep their baseline value
+    # The first 'warmupWeeks' weeks, with their fixed orders, are left out of the amplification
+    points = np.asarray(points, dtype=float)
+    numPoints = points.shape[0]
+    numScenarios, weeksToPlay = demand.shape
+
+    settings = {setting: np.full((numPoints, NUMBER_OF_TIERS), BaselineValue(setting, config))
+                for setting in TIER_SETTINGS}
+    delays = np.full(numPoints, config.queueDelayWeeks)
+    for column, parameter in enumerate(parameters):
+        if parameter.setting == 'queueDelayWeeks':
+            delays = np.rint(points[:, column]).astype(int)
+        elif parameter.tier is None:
+            settings[parameter.setting][:] = points[:, column, None]
+        else:
+            settings[parameter.setting][:, parameter.tier] = points[:, column]
+
+    outputs = {name: np.empty(numPoints) for name in OUTPUT_NAMES}
+    for delay in np.unique(delays):
+        # Replication r of this batch plays point group[r // numScenarios] against demand row r % numScenarios
+        group = np.flatnonzero(delays == delay)
+        perReplication = {setting: np.repeat(values[group], numScenarios, axis=0) for setting, values in settings.items()}
+        chain = BatchSupplyChain(len(group) * numScenarios, np.tile(demand, (len(group), 1)),
+                                 config.Replace(queueDelayWeeks=int(delay)), **perReplication)
+        metrics = BullwhipMetrics(chain.numReplications, warmupWeeks=warmupWeeks)
+        for thisWeek in range(0, weeksToPlay):
+            chain.TakeTurn(thisWeek)
+            metrics.UpdateFromChain(chain)
+
+        outputs['totalCost'][group] = chain.costsIncurred.sum(axis=1).reshape(len(group), numScenarios).mean(axis=1)
+        amplification = metrics.VarianceAmplification()[:, FACTORY].reshape(len(group), numScenarios)
+        with np.errstate(invalid='ignore'):
+            outputs['amplification'][group] = np.nanmean(amplification, axis=1)
+    return outputs
+
+def LocalDesign(parameters, config, relativeStep):
+    # Central differences around the baseline, one-sided at a bound: (2 * parameters, parameters) points
+    # and the parameter step of every pair; delays move by one whole week
+    baseline = np.array([BaselineValue(parameter.setting, config) for parameter in parameters])
+    points = np.tile(baseline, (2 * len(parameters), 1))
+    for column, parameter in enumerate(parameters):
+        step = 1.0 if parameter.integer else relativeStep * (parameter.high - parameter.low)
+        points[2 * column, column] = min(baseline[column] + step, max(parameter.high, baseline[column]))
+        points[2 * column + 1, column] = max(baseline[column] - step, min(parameter.low, baseline[column]))
+    steps = points[0::2].diagonal() - points[1::2].diagonal()
+    return points, steps
+
+def MorrisDesign(parameters, numTrajectories, numLevels, rng):
+    # Morris one-at-a-time trajectories in the unit cube: (trajectories, parameters + 1, parameters) points
+    # Every trajectory starts on the level grid and moves each parameter once, in random order, by
+    # delta = numLevels / (2 * (numLevels - 1)), upwards unless that leaves the cube
+    numParameters = len(parameters)
+    delta = numLevels / (2.0 * (numLevels - 1))
+    trajectories = np.empty((numTrajectories, numParameters + 1, numParameters))
+    for trajectory in trajectories:
+        trajectory[0] = rng.integers(0, numLevels, numParameters) / (numLevels - 1)
+        for step, column in enumerate(rng.permutation(numParameters)):
+            trajectory[step + 1] = trajectory[step]
+            upwards = trajectory[step, column] + delta <= 1.0
+            trajectory[step + 1, column] += delta if upwards else -delta
+    return trajectories
+
+def MorrisIndices(parameters, unitTrajectories, outputs):
+    # mu, mu* and sigma of the elementary effects of every parameter, per unit of its range
+    # Effects are measured on the values actually played, so a rounded delay that did not move is skipped
+    numTrajectories, numSteps, numParameters = unitTrajectories.shape
+    played = np.stack([parameter.ToUnit(parameter.FromUnit(unitTrajectories[:, :, column]))
+                       for column, parameter in enumerate(parameters)], axis=-1)
+    rows = {}
+    for name, values in outputs.items():
+        values = values.reshape(numTrajectories, numSteps)
+        effects = np.full((numTrajectories, numParameters), np.nan)
+        for step in range(numSteps - 1):
+            moves = played[:, step + 1] - played[:, step]
+            column = np.argmax(unitTrajectories[:, step + 1] != unitTrajectories[:, step], axis=1)
+            move = moves[np.arange(numTrajectories), column]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                effect = np.where(move != 0, (values[:, step + 1] - values[:, step]) / move, np.nan)
+            effects[np.arange(numTrajectories), column] = effect
+        with np.errstate(invalid='ignore'):
+            rows[name + 'Mu'] = np.nanmean(effects, axis=0)
+            rows[name + 'MuStar'] = np.nanmean(np.abs(effects), axis=0)
+            rows[name + 'Sigma'] = np.nanstd(effects, axis=0, ddof=1)
+    return rows
+
+def SobolDesign(numParameters, numSamples, rng):
+    # Saltelli design in the unit cube: matrices A and B, then A with column i taken from B for every i,
+    # stacked as (numSamples * (numParameters + 2), numParameters) points
+    a = rng.random((numSamples, numParameters))
+    b = rng.random((numSamples, numParameters))
+    mixed = np.repeat(a[None], numParameters, axis=0)
+    for column in range(numParameters):
+        mixed[column, :, column] = b[:, column]
+    return np.concatenate([a, b, mixed.reshape(-1, numParameters)])
+
+def SobolIndices(numParameters, numSamples, outputs):
+    # First-order (Saltelli 2010) and total (Jansen) Sobol indices of every parameter
+    rows = {}
+    for name, values in outputs.items():
+        fA, fB = values[:numSamples], values[numSamples:2 * numSamples]
+        fMixed = values[2 * numSamples:].reshape(numParameters, numSamples)
+        variance = np.var(np.concatenate([fA, fB]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rows[name + 'FirstOrder'] = np.mean(fB * (fMixed - fA), axis=1) / variance
+            rows[name + 'Total'] = 0.5 * np.mean((fA - fMixed) ** 2, axis=1) / variance
+    return rows
+
+def run_sensitivity(config=DEFAULT_CONFIG, parameters=DEFAULT_PARAMETERS, demandGenerator=None, numScenarios=32,
+                    relativeStep=0.05, numTrajectories=16, numLevels=4, sobolSamples=0, warmupWeeks=5, seed=0):
+    # Local derivatives and elasticities at the baseline, Morris screening indices over the parameter box
+    # ('numTrajectories' > 0) and Sobol indices ('sobolSamples' > 0), all simulated as one batched design
+    # Each point averages over 'numScenarios' demand rows drawn once from 'demandGenerator' (Poisson by default)
+    import pandas as pd  # Imported lazily so design evaluation never loads pandas
+
+    parameters = tuple(parameters)
+    names = pd.Index([parameter.name for parameter in parameters], name='parameter')
+    numParameters = len(parameters)
+    demandGenerator = demandGenerator or PoissonDemand(config.customerSubsequentOrders)
+    demand = demandGenerator.Generate(numScenarios, config.weeksToPlay, seed=seed)
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1 << 20,)))
+
+    # Every design, in parameter values, stacked into one batch
+    baseline = np.array([BaselineValue(parameter.setting, config) for parameter in parameters])
+    localPoints, steps = LocalDesign(parameters, config, relativeStep)
+    morrisUnit = MorrisDesign(parameters, numTrajectories, numLevels, rng) if numTrajectories else None
+    sobolUnit = SobolDesign(numParameters, sobolSamples, rng) if sobolSamples else None
+    designs = [baseline[None], localPoints]
+    for unit in (morrisUnit, sobolUnit):
+        if unit is not None:
+            unit = unit.reshape(-1, numParameters)
+            designs.append(np.stack([parameter.FromUnit(unit[:, column]) for column, parameter in enumerate(parameters)],
+                                    axis=1))
+    points = np.concatenate(designs)
+    outputs = EvaluateDesign(points, parameters, demand, config, warmupWeeks)
+
+    # Split the outputs back into the designs
+    bounds = np.cumsum([len(design) for design in designs])
+    split = {name: np.split(values, bounds[:-1]) for name, values in outputs.items()}
+    result = SensitivityResult(baseline={name: float(parts[0][0]) for name, parts in split.items()}, numPoints=len(points))
+
+    local = {'value': baseline, 'step': steps}
+    for name, parts in split.items():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            derivative = (parts[1][0::2] - parts[1][1::2]) / steps
+            local[name + 'Derivative'] = derivative
+            local[name + 'Elasticity'] = np.where(baseline != 0, derivative * baseline / result.baseline[name], np.nan)
+    result.local = pd.DataFrame(local, index=names)
+
+    nextDesign = 2
+    if morrisUnit is not None:
+        morrisOutputs = {name: parts[nextDesign] for name, parts in split.items()}
+        result.morris = pd.DataFrame(MorrisIndices(parameters, morrisUnit, morrisOutputs), index=names)
+        nextDesign += 1
+    if sobolUnit is not None:
+        sobolOutputs = {name: parts[nextDesign] for name, parts in split.items()}
+        result.sobol = pd.DataFrame(SobolIndices(numParameters, sobolSamples, sobolOutputs), index=names)
+    return result
@@ -0,0 +1,376 @@
+"""Asyncio server hosting many interactive beer-game sessions in one process.
+
+Every session is a SimulationResult played one week at a time with continue_simulation. Each tier is
+played either by a human over the network or by a bot ordering policy (see BOT_POLICIES). Human actors
+order, through SupplyChainActor.orderingPolicy, whatever their player submitted. A week is played as
+soon as every human in the session has submitted, so sessions cost nothing while they wait. Players
+order for the coming week from the state at the end of the last one. The fixed start-up weeks 0 to 4
+are played when the session is created.
+
+The protocol is one JSON object per line over TCP:
+
+    {"type": "create", "players": {"Retailer": "human", "Factory": "orderUpTo"}, "config": {"weeksToPlay": 52}}
+        -> {"type": "created", "session": 7, "humans": ["Retailer"]}
+    {"type": "join", "session": 7, "tier": "Retailer"}
+        -> {"type": "state", "session": 7, "tier": "Retailer", "week": 5, ...}
+    {"type": "order", "session": 7, "tier": "Retailer", "quantity": 8}
+        -> {"type": "submitted", ...} while other humans still have to order; once the week is played,
+           every seated human gets a "state", or "finished" after the last week
+
+Tiers left out of "players" are played by the anchorAndAdjust bot. Any request may carry a "request"
+field, which is echoed in its reply, and failed requests are answered with {"type": "error", "message": ...}.
+One connection can hold any number of seats and orders only for its own. A session is dropped once
+its last seated player disconnects, or its creator does before anyone joined.
+
+Run ``python -m bullwhip.server`` to serve, ``python -m bullwhip.server --play Retailer`` for a text
+client against a running server, and ``python -m bullwhip.loadtest`` to measure turn latency under load.
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import math
+import sys
+from dataclasses import fields
+from functools import partial
+
+from .config import DEFAULT_CONFIG
+from .policies import OrderUpToPolicy, ReorderPointPolicy, SmoothedForecastPolicy, attach_policy
+from .simulation import continue_simulation, start_simulation
+from .snapshot import Actors
+from .statistics import TIER_NAMES
+
+# Default address of the server
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Weeks played when a session is created: the start-up orders of weeks 0 to 4 ignore any player
+STARTUP_WEEKS = 5
+
+# A tier played over the network
+HUMAN = 'human'
+
+# Bots a tier can be played by; anchorAndAdjust is the actors' own rule
+BOT_POLICIES = {
+    'anchorAndAdjust': None,
+    'orderUpTo': OrderUpToPolicy,
+    'reorderPoint': ReorderPointPolicy,
+    'smoothedForecast': SmoothedForecastPolicy,
+}
+DEFAULT_BOT = 'anchorAndAdjust'
+
+# Sessions created between two freezes of the garbage collector's view of the live sessions
+FREEZE_EVERY_SESSIONS = 256
+
+def ParseConfig(base, changes):
+    # Copy of 'base' with the settings a client sent, each converted to the type of its field, so a bad value is
+    # rejected when the session is created rather than in whichever week first reads it
+    if not isinstance(changes, dict):
+        raise ValueError(f"config must be a JSON object, got {changes!r}")
+    types = {field.name: field.type for field in fields(base)}
+    converted = {}
+    for name, value in changes.items():
+        if name not in types:
+            raise ValueError(f"Invalid config: unknown setting {name!r}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"Invalid config: {name} must be a finite number, got {value!r}")
+        if types[name] is int and value != int(value):
+            raise ValueError(f"Invalid config: {name} must be a whole number, got {value!r}")
+        converted[name] = types[name](value)
+    return base.Replace(**converted)
+
+def CheckQuantity(quantity):
+    # A human's order: a finite non-negative number
+    if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or not math.isfinite(quantity) \
+            or quantity < 0:
+        raise ValueError(f"An order must be a non-negative number, got {quantity!r}")
+    return quantity
+
+class GameSession:
+
+    def __init__(self, sessionId, config=DEFAULT_CONFIG, players=None):
+        # One game: 'players' maps tier names to HUMAN or a BOT_POLICIES name, by default a human retailer
+        # against bots; tiers left out are played by the DEFAULT_BOT
+        players = {TIER_NAMES[0]: HUMAN} if players is None else dict(players)
+        for tierName, player in players.items():
+            if tierName not in TIER_NAMES:
+                raise ValueError(f"Unknown tier {tierName!r}; expected one of {', '.join(TIER_NAMES)}")
+            if player != HUMAN and player not in BOT_POLICIES:
+                raise ValueError(f"Unknown player {player!r} for {tierName}; expected {HUMAN!r} or one of "
+                                 f"{', '.join(BOT_POLICIES)}")
+        if config.weeksToPlay <= STARTUP_WEEKS:
+            raise ValueError(f"weeksToPlay must exceed the {STARTUP_WEEKS} start-up weeks, got {config.weeksToPlay}")
+
+        self.sessionId = sessionId
+        self.result = start_simulation(config)
+        self.humanTiers = tuple(tier for tier, tierName in enumerate(TIER_NAMES) if players.get(tierName) == HUMAN)
+        if not self.humanTiers:
+            raise ValueError("A session needs at least one human player")
+        for tier, actor in enumerate(Actors(self.result)):
+            player = players.get(TIER_NAMES[tier], DEFAULT_BOT)
+            if player == HUMAN:
+                actor.orderingPolicy = partial(self.SubmittedOrder, tier)
+            elif BOT_POLICIES[player] is not None:
+                attach_policy(self.result, BOT_POLICIES[player](), tiers=[tier])
+
+        self.submittedOrders = {}       # Tier -> order submitted for the coming week
+        self.seats = {}                 # Tier -> stream writer of the player seated there
+        continue_simulation(self.result, STARTUP_WEEKS)
+        return
+
+    @property
+    def finished(self):
+        return self.result.weeksPlayed >= self.result.config.weeksToPlay
+
+    def SubmittedOrder(self, tier, weekNum):
+        # orderingPolicy of a human actor
+        return self.submittedOrders[tier]
+
+    def Submit(self, tier, quantity):
+        # Record a human's order for the coming week and play the week once every human has ordered;
+        # returns True when the week was played
+        # Everything is checked before the week starts, so a rejected order leaves the session as it was
+        CheckQuantity(quantity)
+        if self.finished:
+            raise ValueError(f"Session {self.sessionId} is finished")
+        if tier not in self.humanTiers:
+            raise ValueError(f"{TIER_NAMES[tier]} is played by a bot in session {self.sessionId}")
+        self.submittedOrders[tier] = quantity
+        if len(self.submittedOrders) < len(self.humanTiers):
+            return False
+        continue_simulation(self.result, self.result.weeksPlayed + 1)
+        self.submittedOrders.clear()
+        return True
+
+    def Close(self):
+        # Break the session <-> actor reference cycles of the ordering policies, so a dropped session is
+        # freed at once, also after BeerGameServer has frozen it out of the garbage collector's reach
+        for actor in Actors(self.result):
+            actor.orderingPolicy = None
+        return
+
+    def View(self, tier):
+        # What the player of 'tier' sees before ordering for the coming week
+        actor = Actors(self.result)[tier]
+        return {'type': 'state', 'session': self.sessionId, 'tier': TIER_NAMES[tier],
+                'week': self.result.weeksPlayed, 'weeksToPlay': self.result.config.weeksToPlay,
+                'stock': actor.currentStock, 'backlog': actor.currentOrders,
+                'effectiveInventory': actor.CalcEffectiveInventory(), 'incomingOrder': actor.lastIncomingOrder,
+                'shipped': actor.lastDeliveryQuantity, 'lastOrder': actor.lastOrderQuantity,
+                'cost': actor.costsIncurred}
+
+    def Summary(self):
+        # Outcome of a finished session
+        return {'type': 'finished', 'session': self.sessionId, 'weeksPlayed': self.result.weeksPlayed,
+                'totalCost': self.result.GetTotalCost(), 'beerReceived': self.result.GetBeerReceived(),
+                'costs': {tierName: actor.costsIncurred for tierName, actor in zip(TIER_NAMES, Actors(self.result))}}
+
+def Send(writer, message):
+    # Queue one message on a connection; the caller drains
+    writer.write(json.dumps(message).encode() + b'\n')
+    return
+
+async def Receive(reader):
+    # Next message from a connection
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("The connection was closed")
+    return json.loads(line)
+
+def TierIndex(tierName):
+    if tierName not in TIER_NAMES:
+        raise ValueError(f"Unknown tier {tierName!r}; expected one of {', '.join(TIER_NAMES)}")
+    return TIER_NAMES.index(tierName)
+
+class BeerGameServer:
+
+    def __init__(self, config=DEFAULT_CONFIG):
+        # Sessions hosted by this process; 'config' is the base of every session's settings
+        self.config = config
+        self.sessions = {}
+        self.sessionIds = itertools.count(1)
+        self.sessionsSinceFreeze = 0
+        return
+
+    async def Serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        # Start listening and return the asyncio server; port 0 picks a free port
+        return await asyncio.start_server(self.HandleConnection, host, port)
+
+    async def HandleConnection(self, reader, writer):
+        # Answer one connection's requests until it closes, then free its seats
+        seats = set()  # (session, tier) pairs seated over this connection, and (session, None) for those it created
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = {}
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        message = {}
+                        raise ValueError("Every message must be a JSON object")
+                    reply = self.Handle(message, writer, seats)
+                except KeyError as error:
+                    reply = {'type': 'error', 'message': f"Missing field {error}"}
+                except (ValueError, TypeError) as error:
+                    reply = {'type': 'error', 'message': str(error)}
+                if reply is not None:
+                    if 'request' in message:
+                        reply['request'] = message['request']
+                    Send(writer, reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.Disconnect(seats)
+            writer.close()
+        return
+
+    def Handle(self, message, writer, seats):
+        # Reply to one request, or None when the reply is the state pushed to every seat
+        kind = message.get('type')
+        if kind == 'create':
+            return self.Create(message, seats)
+        if kind == 'join':
+            return self.Join(message, writer, seats)
+        if kind == 'order':
+            return self.Order(message, seats)
+        raise ValueError(f"Unknown message type {kind!r}")
+
+    def Create(self, message, seats):
+        config = ParseConfig(self.config, message.get('config', {}))
+        session = GameSession(next(self.sessionIds), config, message.get('players'))
+        self.sessions[session.sessionId] = session
+        seats.add((session.sessionId, None))
+
+        # A full collection walks every live session and stalls all of them for tens of milliseconds once
+        # thousands are hosted; sessions are freed by reference counting (see GameSession.Close), so the
+        # collector is kept to the objects created since the last freeze
+        self.sessionsSinceFreeze += 1
+        if self.sessionsSinceFreeze >= FREEZE_EVERY_SESSIONS:
+            gc.collect()
+            gc.freeze()
+            self.sessionsSinceFreeze = 0
+        return {'type': 'created', 'session': session.sessionId,
+                'humans': [TIER_NAMES[tier] for tier in session.humanTiers]}
+
+    def Seat(self, message):
+        # (session, tier) a join or order message refers to
+        session = self.sessions.get(message['session'])
+        if session is None:
+            raise ValueError(f"No session {message['session']!r}")
+        return session, TierIndex(message['tier'])
+
+    def Join(self, message, writer, seats):
+        session, tier = self.Seat(message)
+        if tier not in session.humanTiers:
+            raise ValueError(f"{TIER_NAMES[tier]} is played by a bot in session {session.sessionId}")
+        if session.seats.get(tier, writer) is not writer:
+            raise ValueError(f"{TIER_NAMES[tier]} is already taken in session {session.sessionId}")
+        session.seats[tier] = writer
+        seats.add((session.sessionId, tier))
+        return session.View(tier)
+
+    def Order(self, message, seats):
+        session, tier = self.Seat(message)
+        if (session.sessionId, tier) not in seats:
+            raise ValueError(f"Join {TIER_NAMES[tier]} in session {session.sessionId} before ordering for it")
+        if not session.Submit(tier, message['quantity']):
+            return {'type': 'submitted', 'session': session.sessionId, 'tier': TIER_NAMES[tier],
+                    'week': session.result.weeksPlayed}
+
+        # The week was played: every seated human gets their new state, or the outcome
+        if session.finished:
+            self.Drop(session.sessionId)
+            summary = session.Summary()
+            for seatWriter in set(session.seats.values()):
+                Send(seatWriter, summary)
+        else:
+            for seatTier, seatWriter in session.seats.items():
+                Send(seatWriter, session.View(seatTier))
+        return None
+
+    def Disconnect(self, seats):
+        # Free the seats of a closed connection and drop its sessions nobody is seated at any more
+        for sessionId, tier in seats:
+            session = self.sessions.get(sessionId)
+            if session is None:
+                continue
+            session.seats.pop(tier, None)
+            if not session.seats:
+                self.Drop(sessionId)
+        return
+
+    def Drop(self, sessionId):
+        self.sessions.pop(sessionId).Close()
+        return
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, config=DEFAULT_CONFIG):
+    # Serve beer-game sessions until cancelled
+    server = await BeerGameServer(config).Serve(host, port)
+    async with server:
+        await server.serve_forever()
+
+async def play(tierName=TIER_NAMES[0], host=DEFAULT_HOST, port=DEFAULT_PORT, players=None, config=None):
+    # Text client: create a session with a human 'tierName', join it and read the orders from stdin
+    reader, writer = await asyncio.open_connection(host, port)
+    loop = asyncio.get_running_loop()
+    players = {tierName: HUMAN} if players is None else players
+    request = {'type': 'create', 'players': players}
+    if config:
+        request['config'] = config
+    Send(writer, request)
+    created = await Receive(reader)
+    if created['type'] == 'error':
+        print(created['message'])
+        return created
+    Send(writer, {'type': 'join', 'session': created['session'], 'tier': tierName})
+
+    while True:
+        message = await Receive(reader)
+        if message['type'] == 'finished':
+            print(f"Finished after {message['weeksPlayed']} weeks: total cost {message['totalCost']:,.2f}, "
+                  f"your cost {message['costs'][tierName]:,.2f}")
+            writer.close()
+            return message
+        if message['type'] == 'error':
+            print(message['message'])
+        elif message['type'] == 'state':
+            print(f"Week {message['week']}: stock {message['stock']}, backlog {message['backlog']}, "
+                  f"incoming order {message['incomingOrder']}, shipped {message['shipped']}, cost {message['cost']:,.2f}")
+        else:
+            continue
+        answer = await loop.run_in_executor(None, input, "Order: ")
+        try:
+            quantity = float(answer)
+        except ValueError:
+            quantity = answer  # Let the server explain what is wrong with it
+        Send(writer, {'type': 'order', 'session': created['session'], 'tier': tierName, 'quantity': quantity})
+        await writer.drain()
+
+def main(argv=None):
+    # Serve sessions, or play one against a running server
+    parser = argparse.ArgumentParser(description="Host interactive beer-game sessions over TCP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on or connect to")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument("--play", metavar="TIER", choices=TIER_NAMES,
+                        help="play this tier against bots on a running server instead of serving")
+    parser.add_argument("--weeks", type=int, help="weeks of the played session")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.play:
+            asyncio.run(play(args.play, args.host, args.port,
+                             config=None if args.weeks is None else {'weeksToPlay': args.weeks}))
+        else:
+            print(f"Serving beer-game sessions on {args.host}:{args.port}")
+            asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
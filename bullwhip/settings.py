@@ -0,0 +1,23 @@
+"""Default settings of the beer-game supply chain."""
+
+# Define cost per unit for storage and backorder penalties
+STORAGE_COST_PER_UNIT = 0.5        # Cost incurred for storing each unit of product
+BACKORDER_PENALTY_COST_PER_UNIT = 1 # Cost penalty for each unit in backorder (unfulfilled orders)
+
+# Define the number of weeks for the simulation
+WEEKS_TO_PLAY = 41                 # Total simulation period in weeks
+
+# Set delay in supply chain (in weeks)
+QUEUE_DELAY_WEEKS = 2              # Delay time in weeks between order and delivery in supply chain
+
+# Initial values for various stock-related metrics
+INITIAL_STOCK = 12                 # Starting stock level for each actor
+INITIAL_COST = 0                   # Initial cost at the beginning of the simulation
+INITIAL_CURRENT_ORDERS = 0         # Initial orders at the start of the simulation
+
+# Customer ordering pattern settings
+CUSTOMER_INITIAL_ORDERS = 5        # Initial order quantity for customers in early weeks
+CUSTOMER_SUBSEQUENT_ORDERS = 9     # Increased order quantity for customers in subsequent weeks
+
+# Target stock level for supply chain actors
+TARGET_STOCK = 12                  # Desired stock level to balance demand and minimize costs
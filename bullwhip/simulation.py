@@ -0,0 +1,145 @@
+"""Side-effect-free entry point that wires up the four-tier chain and plays it."""
+
+from dataclasses import dataclass
+
+from .config import DEFAULT_CONFIG, SimulationConfig
+from .model import (
+    QUEUE_OVERFLOW_DROP,
+    QUEUE_OVERFLOW_RAISE,
+    Customer,
+    Distributor,
+    Factory,
+    Retailer,
+    SupplyChainQueue,
+    Wholesaler,
+)
+from .statistics import SupplyChainStatistics
+
+@dataclass
+class SimulationResult:
+    # Everything a caller needs after a run: the recorded series and the final state of every actor
+    config: SimulationConfig
+    statistics: SupplyChainStatistics
+    customer: Customer
+    retailer: Retailer
+    wholesaler: Wholesaler
+    distributor: Distributor
+    factory: Factory
+    weeksPlayed: int = 0    # Weeks already played; continue_simulation picks up from here
+
+    def GetBeerReceived(self):
+        # Total amount of beer the customer received over the run
+        return self.customer.GetBeerReceived()
+
+    def GetTotalCost(self):
+        # Costs incurred by the whole chain over the run
+        return sum(actor.GetCostIncurred() for actor in (self.retailer, self.wholesaler, self.distributor, self.factory))
+
+    def Summarize(self):
+        # One flat row describing the run: its settings followed by the final outcome of every actor
+        row = self.config.AsDict()
+        for name, actor in (('retailer', self.retailer), ('wholesaler', self.wholesaler),
+                            ('distributor', self.distributor), ('factory', self.factory)):
+            row[name + 'Cost'] = actor.GetCostIncurred()
+            row[name + 'EffectiveInventory'] = actor.CalcEffectiveInventory()
+        row['totalCost'] = self.GetTotalCost()
+        row['beerReceived'] = self.GetBeerReceived()
+        return row
+
+def start_simulation(config=DEFAULT_CONFIG, verbose=False, statistics=None, customerOrders=None):
+    # Wire up the four-tier chain described by 'config' without playing any week
+    # Arguments are as for run_simulation; play it with continue_simulation
+    queueDelayWeeks = config.queueDelayWeeks
+
+    # Initialize queues between each actor in the supply chain
+    # Top and bottom queues simulate order (top) and delivery (bottom) flows between actors
+    # In week 0 each actor orders before its upstream partner has emptied the full order queue, so that
+    # first order is discarded as in the original game; QUEUE_OVERFLOW_DROP keeps that behaviour explicit
+    # Every later week the upstream partner pops an order before the next one is pushed, so no other order is
+    # dropped; delivery queues are always popped first and raise rather than lose a shipment
+    wholesalerRetailerTopQueue = SupplyChainQueue(queueDelayWeeks, QUEUE_OVERFLOW_DROP)
+    wholesalerRetailerBottomQueue = SupplyChainQueue(queueDelayWeeks, QUEUE_OVERFLOW_RAISE)
+
+    distributorWholesalerTopQueue = SupplyChainQueue(queueDelayWeeks, QUEUE_OVERFLOW_DROP)
+    distributorWholesalerBottomQueue = SupplyChainQueue(queueDelayWeeks, QUEUE_OVERFLOW_RAISE)
+
+    factoryDistributorTopQueue = SupplyChainQueue(queueDelayWeeks, QUEUE_OVERFLOW_DROP)
+    factoryDistributorBottomQueue = SupplyChainQueue(queueDelayWeeks, QUEUE_OVERFLOW_RAISE)
+
+    # Populate queues with initial orders to stabilize early weeks of the game
+    # Each actor's order and delivery queues are filled with one envelope of customerInitialOrders per week of delay
+    for i in range(0, queueDelayWeeks):
+        wholesalerRetailerTopQueue.PushEnvelope(config.customerInitialOrders)
+        wholesalerRetailerBottomQueue.PushEnvelope(config.customerInitialOrders)
+        distributorWholesalerTopQueue.PushEnvelope(config.customerInitialOrders)
+        distributorWholesalerBottomQueue.PushEnvelope(config.customerInitialOrders)
+        factoryDistributorTopQueue.PushEnvelope(config.customerInitialOrders)
+        factoryDistributorBottomQueue.PushEnvelope(config.customerInitialOrders)
+
+    # Instantiate the customer
+    theCustomer = Customer(config, customerOrders)
+
+    # Create Retailer, connected to the customer and wholesaler via queues
+    myRetailer = Retailer(None, wholesalerRetailerTopQueue, wholesalerRetailerBottomQueue, None, theCustomer, config)
+
+    # Create Wholesaler, connected to the retailer and distributor via queues
+    myWholesaler = Wholesaler(wholesalerRetailerTopQueue, distributorWholesalerTopQueue,
+                              distributorWholesalerBottomQueue, wholesalerRetailerBottomQueue, config)
+
+    # Create Distributor, connected to the wholesaler and factory via queues
+    myDistributor = Distributor(distributorWholesalerTopQueue, factoryDistributorTopQueue,
+                                factoryDistributorBottomQueue, distributorWholesalerBottomQueue, config)
+
+    # Create Factory, connected to the distributor via queues, with a production delay
+    myFactory = Factory(factoryDistributorTopQueue, None, None, factoryDistributorBottomQueue, queueDelayWeeks, config)
+
+    # Initialize an object to track and record statistics across the simulation
+    myStats = statistics if statistics is not None else SupplyChainStatistics(verbose, config.weeksToPlay)
+
+    return SimulationResult(config, myStats, theCustomer, myRetailer, myWholesaler, myDistributor, myFactory)
+
+def continue_simulation(result, untilWeek=None, verbose=False, metrics=None):
+    # Play the weeks from result.weeksPlayed up to 'untilWeek' (config.weeksToPlay by default) in place
+    # Stopping early and continuing later plays exactly the same weeks as one uninterrupted run
+    config = result.config
+    actors = (result.retailer, result.wholesaler, result.distributor, result.factory)
+    if untilWeek is None:
+        untilWeek = config.weeksToPlay
+
+    # Simulation loop: Iterate over each week
+    for thisWeek in range(result.weeksPlayed, untilWeek):
+
+        if verbose:
+            print("\n", "-" * 49)
+            print(f" Week {thisWeek}") # Print current week number
+            print("-" * 49)
+
+        # Each actor takes its turn in order: receive, ship, order or produce, and update costs
+        for actor in actors:
+            actor.TakeTurn(thisWeek)
+
+        # Record costs, orders and effective inventory of all four actors in one call
+        result.statistics.RecordWeek(actors)
+        if metrics is not None:
+            metrics.UpdateFromActors(actors)
+        result.weeksPlayed = thisWeek + 1
+
+    return result
+
+def run_simulation(config=DEFAULT_CONFIG, verbose=False, statistics=None, customerOrders=None, metrics=None,
+                   profiler=None):
+    # Play the beer game described by 'config' and return the recorded statistics
+    # Nothing is printed unless 'verbose' is set, so the function is safe to call from worker processes
+    # 'statistics' replaces the in-memory recorder, e.g. with a StreamingStatistics sink for long horizons
+    # 'customerOrders' is an optional per-week demand sequence replacing the Customer step pattern
+    # 'metrics' is an optional BullwhipMetrics updated after every week
+    # 'profiler' is an optional PhaseProfiler timing every phase of this run only
+    result = start_simulation(config, verbose, statistics, customerOrders)
+    if profiler is None:
+        return continue_simulation(result, verbose=verbose, metrics=metrics)
+
+    profiler.Attach(result)
+    try:
+        return continue_simulation(result, verbose=verbose, metrics=metrics)
+    finally:
+        profiler.Detach()
@@ -0,0 +1,170 @@
+"""Multi-SKU runs: every SKU's own demand history through the four-tier chain, read from a memory-mapped
+(SKU, week) matrix chunk by chunk and reduced to one summary row per SKU.
+
+Run ``python -m bullwhip.sku demand.npy summary.npy`` to summarize a whole demand file.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from .batch import NUMBER_OF_TIERS, BatchSupplyChain
+from .config import DEFAULT_CONFIG
+from .metrics import BullwhipMetrics
+from .statistics import TIER_NAMES
+from .streaming import ARROW_EXTENSIONS
+
+# Default working memory of one chunk of SKUs
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+# Weeks with the fixed start-up orders, left out of the variance amplification
+DEFAULT_WARMUP_WEEKS = 5
+
+# Summary of every tier, next to the SKU index and the cost of the whole chain
+TIER_SUMMARIES = ('cost', 'varianceAmplification', 'fillRate', 'peakBacklog')
+
+def SummaryDtype():
+    # Structured dtype of one SKU's summary row
+    fields = [('sku', np.int64), ('totalCost', np.float64)]
+    fields += [(f'{tierName}.{summary}', np.float64) for tierName in TIER_NAMES for summary in TIER_SUMMARIES]
+    return np.dtype(fields)
+
+class ArrowDemandMatrix:
+
+    def __init__(self, path):
+        # (SKU, week) demand in an Arrow IPC file with one row per SKU and one column per week; the file is
+        # memory-mapped and only the rows of one chunk are gathered into an array at a time
+        import pyarrow as pa  # Optional dependency, only needed for Arrow input
+
+        self.table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        self.shape = (self.table.num_rows, self.table.num_columns)
+        return
+
+    def __getitem__(self, rows):
+        # float64 (SKUs, weeks) demand of a slice of SKUs
+        chunk = self.table.slice(rows.start, rows.stop - rows.start)
+        if not chunk.num_columns:
+            return np.empty((chunk.num_rows, 0))
+        return np.stack([column.to_numpy().astype(np.float64, copy=False) for column in chunk.columns], axis=1)
+
+def open_demand_matrix(path):
+    # Lazily open a (SKU, week) demand matrix: .npy files are memory-mapped read-only, .arrow/.feather
+    # files are read as ArrowDemandMatrix; either way pages are only read from disk when a chunk touches them
+    path = str(path)
+    if path.endswith(ARROW_EXTENSIONS):
+        return ArrowDemandMatrix(path)
+    demand = np.load(path, mmap_mode='r')
+    if demand.ndim != 2:
+        raise ValueError(f"{path} holds a {demand.ndim}-dimensional array, expected (SKU, week)")
+    return demand
+
+def WorkingBytesPerSku(config, weeksToPlay):
+    # Peak working memory of one SKU while its chunk runs: float64 chain state, queues and temporaries,
+    # the bullwhip metrics and their temporaries, and its demand row gathered from the file
+    stateValues = 7 * NUMBER_OF_TIERS + 1 + 2 * NUMBER_OF_TIERS * config.queueDelayWeeks + 8
+    metricValues = 12 * NUMBER_OF_TIERS + 2
+    return 8 * (stateValues + metricValues + weeksToPlay)
+
+def ChunkSkus(memoryBudget, config, weeksToPlay):
+    # Number of SKUs whose working memory fits 'memoryBudget' bytes
+    perSku = WorkingBytesPerSku(config, weeksToPlay)
+    if memoryBudget < perSku:
+        raise ValueError(f"a memory budget of {memoryBudget} bytes does not hold one SKU ({perSku} bytes)")
+    return int(memoryBudget // perSku)
+
+def SummarizeChunk(demand, firstSku, config, warmupWeeks):
+    # Summary rows of the SKUs in a (SKUs, weeks) demand chunk, the first one being SKU 'firstSku'
+    numSkus, weeksToPlay = demand.shape
+    chain = BatchSupplyChain(numSkus, demand, config)
+    metrics = BullwhipMetrics(numSkus, warmupWeeks=warmupWeeks)
+    for thisWeek in range(weeksToPlay):
+        chain.TakeTurn(thisWeek)
+        metrics.UpdateFromChain(chain)
+
+    rows = np.empty(numSkus, dtype=SummaryDtype())
+    rows['sku'] = np.arange(firstSku, firstSku + numSkus)
+    rows['totalCost'] = chain.costsIncurred.sum(axis=1)
+    perTier = {'cost': chain.costsIncurred, 'varianceAmplification': metrics.VarianceAmplification(),
+               'fillRate': metrics.FillRate(), 'peakBacklog': metrics.PeakBacklog()}
+    for tier, tierName in enumerate(TIER_NAMES):
+        for summary in TIER_SUMMARIES:
+            rows[f'{tierName}.{summary}'] = perTier[summary][:, tier]
+    return rows
+
+def run_sku_batch(demand, outputPath=None, config=DEFAULT_CONFIG, memoryBudget=DEFAULT_MEMORY_BUDGET,
+                  chunkSkus=None, warmupWeeks=DEFAULT_WARMUP_WEEKS):
+    # Play every row of a (SKU, week) 'demand' matrix through its own four-tier chain and return one summary
+    # row per SKU as a structured array (see SummaryDtype)
+    # 'demand' is a path opened with open_demand_matrix, or any array sliceable by rows such as a memory map;
+    # every SKU plays all weeks of the matrix, and 'chunkSkus' SKUs (by default as many as 'memoryBudget'
+    # bytes of working memory allow) are simulated at a time
+    # With an 'outputPath' the rows are written chunk by chunk: to a memory-mapped .npy file that is also
+    # returned, or as Arrow IPC record batches for a path ending in .arrow/.feather (needs pyarrow)
+    if isinstance(demand, (str, bytes)) or hasattr(demand, '__fspath__'):
+        demand = open_demand_matrix(demand)
+    numSkus, weeksToPlay = demand.shape
+    config = config.Replace(weeksToPlay=weeksToPlay)
+    if chunkSkus is None:
+        chunkSkus = ChunkSkus(memoryBudget, config, weeksToPlay)
+
+    outputPath = None if outputPath is None else str(outputPath)
+    arrowWriter = None
+    if outputPath is not None and not outputPath.endswith(ARROW_EXTENSIONS):
+        summary = np.lib.format.open_memmap(outputPath, mode='w+', dtype=SummaryDtype(), shape=(numSkus,))
+    else:
+        summary = np.empty(numSkus, dtype=SummaryDtype())
+        if outputPath is not None:
+            import pyarrow as pa  # Optional dependency, only needed for Arrow output
+
+            schema = pa.schema([(name, pa.from_numpy_dtype(summary.dtype[name])) for name in summary.dtype.names])
+            arrowFile = pa.OSFile(outputPath, 'wb')
+            arrowWriter = pa.ipc.new_file(arrowFile, schema)
+
+    try:
+        for first in range(0, numSkus, chunkSkus):
+            chunk = slice(first, min(first + chunkSkus, numSkus))
+            rows = SummarizeChunk(demand[chunk], first, config, warmupWeeks)
+            summary[chunk] = rows
+            if arrowWriter is not None:
+                arrowWriter.write_batch(pa.RecordBatch.from_arrays([pa.array(rows[name]) for name in rows.dtype.names],
+                                                                   schema=schema))
+    finally:
+        if arrowWriter is not None:
+            arrowWriter.close()
+            arrowFile.close()
+    if isinstance(summary, np.memmap):
+        summary.flush()
+    return summary
+
+def load_sku_summary(path):
+    # pandas DataFrame of a summary written by run_sku_batch, indexed by SKU
+    import pandas as pd  # Imported lazily so SKU runs never load pandas
+
+    path = str(path)
+    if path.endswith(ARROW_EXTENSIONS):
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all().to_pandas()
+    else:
+        table = pd.DataFrame(np.load(path))
+    return table.set_index('sku')
+
+def main(argv=None):
+    # Summarize every SKU of a demand file
+    parser = argparse.ArgumentParser(description="Play every SKU of a (SKU, week) demand matrix through the chain.")
+    parser.add_argument("demand", help="(SKU, week) demand matrix as .npy, or .arrow/.feather with a column per week")
+    parser.add_argument("output", help="per-SKU summary, written as .npy or .arrow/.feather")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET >> 20,
+                        help="working memory of one chunk of SKUs in MiB")
+    parser.add_argument("--warmup-weeks", type=int, default=DEFAULT_WARMUP_WEEKS,
+                        help="weeks left out of the variance amplification")
+    args = parser.parse_args(argv)
+
+    summary = run_sku_batch(args.demand, args.output, memoryBudget=args.memory_budget << 20,
+                            warmupWeeks=args.warmup_weeks)
+    print(f"{len(summary):,} SKUs, mean total cost {summary['totalCost'].mean():,.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
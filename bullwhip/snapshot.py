@@ -0,0 +1,114 @@
+"""Snapshots of a running simulation, forked into any number of cheap what-if branches."""
+
+from array import array
+
+from .simulation import continue_simulation, start_simulation
+from .statistics import METRIC_NAMES, TIER_NAMES, SupplyChainStatistics
+
+# Attributes that make up the state of an actor and of a queue between two weeks
+ACTOR_STATE = ('currentStock', 'currentOrders', 'costsIncurred', 'lastOrderQuantity', 'lastIncomingOrder',
+               'lastDeliveryQuantity', 'config')
+QUEUE_STATE = ('queueLength', 'overflowPolicy', 'droppedEnvelopes', 'head', 'size')
+
+def Actors(result):
+    # The four actors of a run, in TIER_NAMES order
+    return (result.retailer, result.wholesaler, result.distributor, result.factory)
+
+def Queues(result):
+    # Every queue of a run: orders and deliveries between each pair of actors, then the factory's production
+    return (result.retailer.outgoingOrdersQueue, result.retailer.incomingDeliveriesQueue,
+            result.wholesaler.outgoingOrdersQueue, result.wholesaler.incomingDeliveriesQueue,
+            result.distributor.outgoingOrdersQueue, result.distributor.incomingDeliveriesQueue,
+            result.factory.BeerProductionDelayQueue)
+
+class BranchStatistics(SupplyChainStatistics):
+
+    def __init__(self, prefix, prefixWeeks, verbose=False, weeksToPlay=0):
+        # Statistics of a forked branch: the weeks before the fork are read from 'prefix', an immutable
+        # buffer shared by every branch of the same snapshot, and only the branch's own weeks are stored
+        # 'weeksToPlay' is the total length of the run, prefix included
+        super().__init__(verbose, max(weeksToPlay - prefixWeeks, 0))
+        self.prefix = prefix
+        self.prefixWeeks = prefixWeeks
+        self.weeksRecorded = prefixWeeks
+        return
+
+    def ReserveWeek(self):
+        # Offset of the next week in this branch's own buffer, growing it when it is full
+        if (self.weeksRecorded - self.prefixWeeks + 1) * self.rowLength > len(self.data):
+            self.Grow()
+        return (self.weeksRecorded - self.prefixWeeks) * self.rowLength
+
+    def AsArray(self):
+        # NumPy array of all recorded weeks with shape (weeks, tiers, metrics)
+        # Unlike the base class this is a copy, since the prefix and the branch live in separate buffers
+        import numpy as np  # Imported lazily so recording never loads NumPy
+
+        shared = np.frombuffer(self.prefix, dtype=np.float64)
+        own = np.frombuffer(self.data, dtype=np.float64, count=(self.weeksRecorded - self.prefixWeeks) * self.rowLength)
+        return np.concatenate((shared, own)).reshape(self.weeksRecorded, len(TIER_NAMES), len(METRIC_NAMES))
+
+def CopyPolicies(policies, result):
+    # Copies of the actors' ordering policies, with everything they remember such as a smoothed forecast,
+    # ordering for the actors of 'result'; only policies attached with policies.attach_policy can be
+    # copied, since any other callable may hold on to the run it was made for
+    memo = {}  # One memo for all actors, so a policy they share stays shared
+    copies = []
+    for tierName, policy in zip(TIER_NAMES, policies):
+        if policy is not None and not hasattr(policy, 'Rebind'):
+            raise ValueError(f"The ordering policy of the {tierName} cannot be copied into a snapshot: {policy!r}")
+        copies.append(None if policy is None else policy.Rebind(result, memo))
+    return tuple(copies)
+
+class SimulationSnapshot:
+
+    def __init__(self, result):
+        # Frozen copy of the complete state of 'result' after result.weeksPlayed weeks: every actor's
+        # stock, orders, costs and ordering policy, the contents of every queue including the factory's
+        # production queue, the customer, and the statistics recorded so far
+        # The snapshot is never modified, so any number of branches can be forked from it
+        self.config = result.config
+        self.weeksPlayed = result.weeksPlayed
+        self.verbose = result.statistics.verbose
+        self.customerOrders = result.customer.customerOrders
+        self.beerReceived = result.customer.totalBeerReceived
+        self.actorStates = tuple({name: getattr(actor, name) for name in ACTOR_STATE} for actor in Actors(result))
+        self.orderingPolicies = CopyPolicies([actor.orderingPolicy for actor in Actors(result)], None)
+        self.queueStates = tuple(({name: getattr(queue, name) for name in QUEUE_STATE}, array('d', queue.data),
+                                  bytes(queue.wholeEnvelopes)) for queue in Queues(result))
+
+        # Statistics prefix, stored once and read by every branch
+        self.statistics = result.statistics.AsArray().tobytes()
+        return
+
+    def Fork(self, customerOrders=None, verbose=None):
+        # A new SimulationResult at week self.weeksPlayed that can be modified and played on with
+        # continue_simulation, independently of the snapshot and of every other branch
+        # 'customerOrders' optionally replaces the demand sequence (indexed by week, as in run_simulation)
+        verbose = self.verbose if verbose is None else verbose
+        statistics = BranchStatistics(self.statistics, self.weeksPlayed, verbose, self.config.weeksToPlay)
+        branch = start_simulation(self.config, verbose, statistics,
+                                  self.customerOrders if customerOrders is None else customerOrders)
+        branch.weeksPlayed = self.weeksPlayed
+        branch.customer.totalBeerReceived = self.beerReceived
+        for actor, state in zip(Actors(branch), self.actorStates):
+            actor.__dict__.update(state)
+        for actor, orderingPolicy in zip(Actors(branch), CopyPolicies(self.orderingPolicies, branch)):
+            actor.orderingPolicy = orderingPolicy
+        for queue, (state, data, wholeEnvelopes) in zip(Queues(branch), self.queueStates):
+            queue.__dict__.update(state)
+            queue.data = array('d', data)  # Each branch gets its own copy of the few envelopes in flight
+            queue.wholeEnvelopes = bytearray(wholeEnvelopes)
+        return branch
+
+    def Branch(self, numBranches, prepare=None, untilWeek=None):
+        # Fork 'numBranches' branches and play each of them to 'untilWeek' (the end of the run by default)
+        # 'prepare(index, branch)' is called on every fresh branch before it is played, e.g. to change
+        # the distributor's policy; only the weeks after the snapshot are simulated
+        branches = []
+        for index in range(numBranches):
+            branch = self.Fork()
+            if prepare is not None:
+                prepare(index, branch)
+            branches.append(continue_simulation(branch, untilWeek))
+        return branches
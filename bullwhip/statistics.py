@@ -0,0 +1,121 @@
+"""Weekly time series recorded from a simulation run, and their plots."""
+
+from array import array
+
+# Layout of the recorded history: one row per week, one block per actor, one column per metric
+TIER_NAMES = ('Retailer', 'Wholesaler', 'Distributor', 'Factory')
+METRIC_NAMES = ('cost', 'orders', 'effectiveInventory')
+COST, ORDERS, EFFECTIVE_INVENTORY = 0, 1, 2
+
+# Plot colour of each actor
+TIER_COLOURS = ('rgb(215,48,39)', 'rgb(255,186,0)', 'rgb(126,2,114)', 'rgb(69,117,180)')
+
+class SupplyChainStatistics:
+
+    def __init__(self, verbose=False, weeksToPlay=0):
+        # Columnar recorder holding a (weeks, tiers, metrics) block of doubles
+        # 'weeksToPlay' preallocates the history so a run of known length never reallocates
+        # 'verbose' echoes every recorded value to stdout, as the original script did
+        self.verbose = verbose
+        self.weeksRecorded = 0
+        self.rowLength = len(TIER_NAMES) * len(METRIC_NAMES)  # Values recorded per week
+        self.data = array('d', bytes(max(weeksToPlay, 1) * self.rowLength * array('d').itemsize))
+        return
+
+    def RecordWeek(self, actors):
+        # Record cost, last order and effective inventory of every actor, in TIER_NAMES order, for one week
+        offset = self.ReserveWeek()
+        for tierName, actor in zip(TIER_NAMES, actors):
+            cost = actor.GetCostIncurred()
+            orders = actor.GetLastOrderQuantity()
+            effectiveInventory = actor.CalcEffectiveInventory()
+            self.data[offset + COST] = cost
+            self.data[offset + ORDERS] = orders
+            self.data[offset + EFFECTIVE_INVENTORY] = effectiveInventory
+            offset += len(METRIC_NAMES)
+
+            if self.verbose:
+                print(tierName, 'Cost:', cost)
+                print(tierName, 'Order:', orders)
+                print(tierName, 'Effective Inventory:', effectiveInventory)
+
+        self.weeksRecorded += 1
+        return
+
+    def RecordWeeks(self, block):
+        # Record weeks computed elsewhere, a (weeks, tiers, metrics) array, as RecordWeek would one at a time
+        # Nothing is echoed, even when verbose
+        import numpy as np  # Imported lazily so recording never loads NumPy
+
+        rows = memoryview(np.ascontiguousarray(block, dtype=np.float64).reshape(-1))
+        for start in range(0, len(rows), self.rowLength):
+            offset = self.ReserveWeek()
+            memoryview(self.data)[offset:offset + self.rowLength] = rows[start:start + self.rowLength]
+            self.weeksRecorded += 1
+        return
+
+    def ReserveWeek(self):
+        # Offset in self.data where the next week is written, growing the history when it is full
+        if (self.weeksRecorded + 1) * self.rowLength > len(self.data):
+            self.Grow()
+        return self.weeksRecorded * self.rowLength
+
+    def Grow(self):
+        # Double the preallocated history; a new buffer keeps earlier AsArray views valid
+        recorded = self.data
+        self.data = array('d', bytes(2 * len(recorded) * array('d').itemsize))
+        self.data[0:len(recorded)] = recorded
+        return
+
+    def AsArray(self):
+        # Zero-copy NumPy view of the recorded weeks with shape (weeks, tiers, metrics)
+        # The view stays valid, but stops following new weeks once the history has to grow
+        import numpy as np  # Imported lazily so recording never loads NumPy
+
+        recorded = np.frombuffer(self.data, dtype=np.float64, count=self.weeksRecorded * self.rowLength)
+        return recorded.reshape(self.weeksRecorded, len(TIER_NAMES), len(METRIC_NAMES))
+
+    def AsDataFrame(self):
+        # Zero-copy pandas view with one row per week and a (tier, metric) column for every series
+        import pandas as pd  # Imported lazily so recording never loads pandas
+
+        columns = pd.MultiIndex.from_product([TIER_NAMES, METRIC_NAMES], names=['tier', 'metric'])
+        frame = pd.DataFrame(self.AsArray().reshape(self.weeksRecorded, self.rowLength), columns=columns, copy=False)
+        frame.index.name = 'week'
+        return frame
+
+    def GetSeries(self, tierName, metric):
+        # One recorded series, e.g. GetSeries('Factory', ORDERS), as a NumPy view
+        return self.AsArray()[:, TIER_NAMES.index(tierName), metric]
+
+    # Plotting methods to visualize orders, inventory, and costs over time for each actor
+    def PlotMetric(self, metric, traceLabel, titleText, yAxisTitle, maxPoints=None, show=True):
+        # Create a plot with one line per actor for one recorded metric and return the figure
+        # Series longer than 'maxPoints' (plotting.DEFAULT_MAX_POINTS by default) are downsampled with
+        # LTTB and very long ones drawn with WebGL, so million-week runs stay responsive
+        import plotly.graph_objects as go  # Imported lazily so simulation-only processes never load plotly
+
+        from .plotting import DEFAULT_MAX_POINTS, FinishFigure, LineTrace
+
+        history = self.AsArray()
+        fig = go.Figure()
+        for tier, tierName in enumerate(TIER_NAMES):
+            fig.add_trace(LineTrace(history[:, tier, metric], f'{tierName} {traceLabel}', TIER_COLOURS[tier],
+                                    DEFAULT_MAX_POINTS if maxPoints is None else maxPoints))
+        FinishFigure(fig, titleText, yAxisTitle, self.weeksRecorded)
+        if show:
+            fig.show()
+        return fig
+
+    def PlotOrders(self, **options):
+        # Create a plot to visualize orders placed over time by each actor
+        return self.PlotMetric(ORDERS, 'Orders', '*Orders Placed Over Time*', 'Orders', **options)
+
+    def PlotEffectiveInventory(self, **options):
+        # Create a plot to visualize effective inventory over time for each actor
+        return self.PlotMetric(EFFECTIVE_INVENTORY, 'Inventory', '*Effective Inventory Over Time*', 'Effective Inventory',
+                               **options)
+
+    def PlotCosts(self, **options):
+        # Create a plot to visualize total costs incurred over time by each actor
+        return self.PlotMetric(COST, 'Total Cost', '*Cost Incurred Over Time*', 'Cost ($)', **options)
@@ -0,0 +1,256 @@
+"""Early stopping of long deterministic runs once the chain settles into a fixed point or a repeating cycle.
+
+With the Customer step pattern every week after the fifth is played by the same rules, so the state of
+the chain after a week (every actor's stock, orders and last flows, and the envelopes in every queue)
+decides all later weeks. Once a state repeats, the run is periodic from there on. run_steady_state then
+plays on only to the point of the cycle the horizon ends in and fills in the whole cycles left in
+closed form. Costs grow by the same amounts every cycle and are accumulated as TakeTurn would, so an
+exact repeat gives the same statistics, costs and final state as a full run, bit for bit. Runs that
+never repeat, such as the chaotic default game, are played to the end; the search gives up after
+DEFAULT_SEARCH_PERIODS times maxPeriod weeks without a repeat, so those runs cost about as much as
+run_simulation.
+
+With a tolerance, a state that stays within that many cases of the state one period earlier for a whole
+period also counts as a repeat, so chains that only converge stop as well; the extrapolated weeks are
+then an approximation.
+"""
+
+from array import array
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from .config import DEFAULT_CONFIG
+from .simulation import continue_simulation, start_simulation
+from .snapshot import Actors, Queues
+from .statistics import COST, EFFECTIVE_INVENTORY, METRIC_NAMES, ORDERS, TIER_NAMES
+
+# Weeks played after which the rules no longer depend on the week: the actors' start-up orders end
+# after week 4 and the customer's initial orders after week 5
+STEADY_RULES_WEEK = 6
+
+# Longest cycle looked for, in weeks
+DEFAULT_MAX_PERIOD = 1024
+
+# Multiples of maxPeriod weeks searched for a repeat before the rest of a run is played without looking
+DEFAULT_SEARCH_PERIODS = 4
+
+# Weeks of extrapolated statistics computed and recorded at a time
+EXTRAPOLATION_BLOCK_WEEKS = 65536
+
+# Actor attributes that make up the chain state besides the queue contents; costs only accumulate
+# and are left out
+CHAIN_STATE = ('currentStock', 'currentOrders', 'lastOrderQuantity', 'lastIncomingOrder', 'lastDeliveryQuantity')
+
+@dataclass
+class SteadyStateReport:
+    # Where a run became periodic; detectionWeek is None when no state repeated before the horizon
+    weeksToPlay: int
+    maxPeriod: int
+    tolerance: float = 0.0
+    searchWeeks: int = None     # Weeks after STEADY_RULES_WEEK searched for a repeat before giving up
+    detectionWeek: int = None   # Weeks played when the repeat was seen
+    period: int = 0             # Weeks per cycle, 1 for a fixed point
+    deviation: float = 0.0      # Largest difference between repeated states, 0 for an exact repeat
+    weeksSimulated: int = 0     # Weeks played by TakeTurn; the rest were extrapolated
+
+    @property
+    def detected(self):
+        return self.detectionWeek is not None
+
+    @property
+    def cycleStart(self):
+        # Weeks played when the cycle was first entered, as far as the detection can tell
+        return None if self.detectionWeek is None else self.detectionWeek - self.period
+
+    @property
+    def exact(self):
+        # True when the extrapolated weeks are exactly those of a full run
+        return self.deviation == 0.0
+
+    def Describe(self):
+        # One line for logs and reports
+        if not self.detected:
+            return (f"No state repeated within {self.maxPeriod} weeks in the {self.searchWeeks:,} weeks searched; "
+                    f"all {self.weeksToPlay:,} weeks were simulated")
+        kind = "fixed point" if self.period == 1 else f"cycle of {self.period} weeks"
+        match = "exact repeat" if self.exact else f"repeat within {self.deviation:g} cases"
+        return (f"{kind.capitalize()} from week {self.cycleStart}, detected at week {self.detectionWeek} "
+                f"({match}); {self.weeksToPlay - self.weeksSimulated:,} of {self.weeksToPlay:,} weeks "
+                f"extrapolated")
+
+def ChainState(result):
+    # Everything the weeks after result.weeksPlayed depend on, as one array('d'): the CHAIN_STATE of every
+    # actor, the number of envelopes in every queue, then the envelopes themselves, oldest first
+    queues = Queues(result)
+    state = array('d', [getattr(actor, name) for actor in Actors(result) for name in CHAIN_STATE])
+    state.extend(queue.size for queue in queues)
+    for queue in queues:
+        state.extend(queue.PeekAll())
+    return state
+
+def WeekRecord(result):
+    # What the week just played added and recorded: every actor's cost for the turn, the beer the
+    # customer received, then every actor's order and effective inventory
+    actors = Actors(result)
+    return ([actor.CalcCostForTurn() for actor in actors] + [result.retailer.lastDeliveryQuantity]
+            + [actor.GetLastOrderQuantity() for actor in actors]
+            + [actor.CalcEffectiveInventory() for actor in actors])
+
+class CycleDetector:
+
+    def __init__(self, tolerance=0.0, maxPeriod=DEFAULT_MAX_PERIOD):
+        # Finds the shortest period after which the chain state repeats, looking back 'maxPeriod' weeks
+        # Exact repeats are found by hashing; with a 'tolerance' every state is compared to each of the
+        # last 'maxPeriod' states instead, and a period counts once it has matched for a whole period
+        if maxPeriod < 1:
+            raise ValueError(f"maxPeriod must be at least 1, got {maxPeriod}")
+        if tolerance < 0:
+            raise ValueError(f"tolerance must not be negative, got {tolerance}")
+        self.tolerance = tolerance
+        self.maxPeriod = maxPeriod
+        self.seen = {}                  # Exact: state bytes -> weeks played
+        self.order = deque()            # Exact: states in self.seen, oldest first
+        self.window = None              # Tolerance: ring buffer of the last maxPeriod states
+        self.stored = 0                 # Tolerance: states in the window
+        return
+
+    def Update(self, weeksPlayed, state):
+        # (period, deviation) if 'state' repeats an earlier one, otherwise None
+        if self.tolerance == 0:
+            return self.UpdateExact(weeksPlayed, state.tobytes())
+        return self.UpdateWithinTolerance(np.frombuffer(state, dtype=np.float64))
+
+    def UpdateExact(self, weeksPlayed, key):
+        earlier = self.seen.get(key)
+        if earlier is not None:
+            return weeksPlayed - earlier, 0.0
+        self.seen[key] = weeksPlayed
+        self.order.append(key)
+        if len(self.order) > self.maxPeriod:
+            del self.seen[self.order.popleft()]
+        return None
+
+    def UpdateWithinTolerance(self, state):
+        if self.window is None or self.window.shape[1] != len(state):
+            # Queue sizes only change in the first week, but a changed layout never matches anyway
+            self.window = np.empty((self.maxPeriod, len(state)))
+            self.matchedWeeks = np.zeros(self.maxPeriod, dtype=np.int64)
+            self.matchDeviation = np.zeros(self.maxPeriod)
+            self.stored = 0
+
+        # Distance to the state 1, 2, ... weeks ago, and how many weeks in a row each lag has matched;
+        # only states whose retailer stock is close enough are compared in full
+        lags = np.arange(1, min(self.stored, self.maxPeriod) + 1)
+        slotDistance = np.full(len(lags), np.inf)
+        close = np.flatnonzero(np.abs(self.window[:len(lags), 0] - state[0]) <= self.tolerance)
+        slotDistance[close] = np.abs(self.window[close] - state).max(axis=1, initial=0.0)
+        distance = slotDistance[(self.stored - lags) % self.maxPeriod]
+        matched = distance <= self.tolerance
+        self.matchedWeeks[:len(lags)] = np.where(matched, self.matchedWeeks[:len(lags)] + 1, 0)
+        self.matchDeviation[:len(lags)] = np.where(matched, np.maximum(self.matchDeviation[:len(lags)], distance), 0.0)
+        self.window[self.stored % self.maxPeriod] = state
+        self.stored += 1
+
+        # An exact repeat needs no confirmation; a close one must hold for a whole period
+        found = np.flatnonzero((distance == 0) | (self.matchedWeeks[:len(lags)] >= lags))
+        if not len(found):
+            return None
+        period = int(lags[found[0]])
+        return period, float(self.matchDeviation[found[0]])
+
+def ExactlySummable(totals, increments, weeks):
+    # True when adding 'weeks' weeks of 'increments' to 'totals' keeps every partial sum exact, so one
+    # product per total gives the same bits as adding week by week (see EventDrivenSupplyChain.AccrueIdleCosts)
+    totals = np.asarray(totals, dtype=np.float64)
+    increments = np.asarray(increments, dtype=np.float64)
+    return bool(np.all(np.mod(totals * 1024, 1) == 0) and np.all(np.mod(increments * 1024, 1) == 0)
+                and np.all(np.abs(totals) + weeks * np.abs(increments).max(axis=0, initial=0.0) < 2.0 ** 42))
+
+def RunningTotals(totals, increments, cycles, exact):
+    # (cycles * period, totals) running totals after every week of 'cycles' repeats of the (period, totals)
+    # 'increments', continuing from 'totals'; a product per week when 'exact', else cumulative sums,
+    # which add in the same order as TakeTurn
+    if exact:
+        withinCycle = np.cumsum(increments, axis=0)
+        completed = np.arange(cycles)[:, None, None] * withinCycle[-1]
+        return (totals + completed + withinCycle).reshape(-1, len(totals))
+    tiled = np.concatenate((np.asarray(totals, dtype=np.float64)[None], np.tile(increments, (cycles, 1))))
+    return np.cumsum(tiled, axis=0)[1:]
+
+def ExtrapolateCycles(result, cycle, cycles):
+    # Append 'cycles' repeats of the 'cycle' of WeekRecords to the statistics of 'result', and book
+    # their costs and deliveries on its actors and customer
+    actors = Actors(result)
+    numTiers = len(TIER_NAMES)
+    records = np.array(cycle, dtype=np.float64)
+    increments = records[:, :numTiers + 1]
+    totals = [actor.costsIncurred for actor in actors] + [result.customer.totalBeerReceived]
+    exact = ExactlySummable(totals, increments, cycles * len(cycle))
+
+    period = len(cycle)
+    blockCycles = max(EXTRAPOLATION_BLOCK_WEEKS // period, 1)
+    running = np.asarray(totals, dtype=np.float64)
+    for first in range(0, cycles, blockCycles):
+        blockRunning = RunningTotals(running, increments, min(blockCycles, cycles - first), exact)
+        block = np.empty((len(blockRunning), numTiers, len(METRIC_NAMES)))
+        block[:, :, COST] = blockRunning[:, :numTiers]
+        block[:, :, ORDERS] = np.tile(records[:, numTiers + 1:2 * numTiers + 1], (len(blockRunning) // period, 1))
+        block[:, :, EFFECTIVE_INVENTORY] = np.tile(records[:, 2 * numTiers + 1:], (len(blockRunning) // period, 1))
+        result.statistics.RecordWeeks(block)
+        running = blockRunning[-1]
+
+    if exact:
+        # Python arithmetic, so totals that were integers stay integers as in a full run
+        cycleSums = [sum(week[column] for week in cycle) for column in range(numTiers + 1)]
+        totals = [total + cycles * cycleSum for total, cycleSum in zip(totals, cycleSums)]
+    else:
+        totals = running.tolist()
+    for actor, total in zip(actors, totals):
+        actor.costsIncurred = total
+    result.customer.totalBeerReceived = totals[-1]
+    result.weeksPlayed += cycles * period
+    return
+
+def run_steady_state(config=DEFAULT_CONFIG, tolerance=0.0, maxPeriod=DEFAULT_MAX_PERIOD, statistics=None,
+                     searchWeeks=None):
+    # Play the Customer step pattern like run_simulation, but stop simulating once the chain state
+    # repeats after at most 'maxPeriod' weeks, or with 'tolerance' > 0 stays within that many cases of
+    # a repeat for a whole cycle, and fill in the remaining weeks from the cycle
+    # 'searchWeeks' (DEFAULT_SEARCH_PERIODS * maxPeriod by default) bounds the weeks searched for a repeat;
+    # after that the rest of the run is played like run_simulation
+    # Returns the SimulationResult, played to config.weeksToPlay, and a SteadyStateReport
+    # 'statistics' replaces the in-memory recorder as in run_simulation; extrapolated weeks are never echoed
+    if searchWeeks is None:
+        searchWeeks = DEFAULT_SEARCH_PERIODS * maxPeriod
+    result = start_simulation(config, statistics=statistics)
+    report = SteadyStateReport(config.weeksToPlay, maxPeriod, tolerance, searchWeeks)
+    detector = CycleDetector(tolerance, maxPeriod)
+    records = deque(maxlen=maxPeriod)  # WeekRecords of the latest weeks, one cycle of which is repeated
+
+    while result.weeksPlayed < min(config.weeksToPlay, STEADY_RULES_WEEK + searchWeeks):
+        continue_simulation(result, result.weeksPlayed + 1)
+        records.append(WeekRecord(result))
+        if result.weeksPlayed < STEADY_RULES_WEEK:
+            continue
+        match = detector.Update(result.weeksPlayed, ChainState(result))
+        if match is not None:
+            report.detectionWeek = result.weeksPlayed
+            report.period, report.deviation = match
+            break
+
+    if report.detected:
+        # Play on to the point of the cycle the horizon falls on; the state there is the final state,
+        # and only whole cycles are left to extrapolate
+        cycles, remainder = divmod(config.weeksToPlay - result.weeksPlayed, report.period)
+        for _ in range(remainder):
+            continue_simulation(result, result.weeksPlayed + 1)
+            records.append(WeekRecord(result))
+        report.weeksSimulated = result.weeksPlayed
+        ExtrapolateCycles(result, list(records)[-report.period:], cycles)
+    else:
+        # No repeat within the search budget: play the rest without looking
+        continue_simulation(result)
+        report.weeksSimulated = result.weeksPlayed
+    return result, report
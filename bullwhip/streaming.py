@@ -0,0 +1,124 @@
+"""Streaming statistics sink keeping memory bounded for arbitrarily long horizons."""
+
+import struct
+import sys
+
+from .statistics import METRIC_NAMES, TIER_NAMES, SupplyChainStatistics
+
+# Weeks held in memory before a chunk is written out (12 doubles per week, so 1.5 MB per chunk)
+DEFAULT_CHUNK_WEEKS = 16384
+
+# Fixed size of the .npy header, so the week count can be rewritten in place after every chunk
+NPY_HEADER_LENGTH = 128
+
+# File extensions written in the Arrow IPC file format; everything else is written as .npy
+ARROW_EXTENSIONS = ('.arrow', '.feather')
+
+def ColumnNames():
+    # Arrow column of every recorded series, in the (tier, metric) order of one recorded week
+    return [f'{tierName}.{metric}' for tierName in TIER_NAMES for metric in METRIC_NAMES]
+
+def NpyHeader(weeksRecorded):
+    # .npy version 1.0 header for a (weeks, tiers, metrics) array of native doubles
+    descr = '<f8' if sys.byteorder == 'little' else '>f8'
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d, %d, %d), }" % (
+        descr, weeksRecorded, len(TIER_NAMES), len(METRIC_NAMES))
+    header = header.ljust(NPY_HEADER_LENGTH - 11) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', NPY_HEADER_LENGTH - 10) + header.encode('latin1')
+
+class StreamingStatistics(SupplyChainStatistics):
+
+    def __init__(self, path, chunkWeeks=DEFAULT_CHUNK_WEEKS, verbose=False):
+        # Drop-in replacement for SupplyChainStatistics that buffers 'chunkWeeks' weeks and appends
+        # them to 'path'; a path ending in .arrow/.feather is written as Arrow IPC (needs pyarrow),
+        # anything else as a .npy file that LoadStreamedStatistics memory-maps
+        super().__init__(verbose, chunkWeeks)
+        self.path = str(path)
+        self.chunkWeeks = chunkWeeks
+        self.bufferedWeeks = 0          # Weeks recorded since the last flush
+        self.useArrow = self.path.endswith(ARROW_EXTENSIONS)
+
+        self.file = open(self.path, 'wb')
+        if self.useArrow:
+            import pyarrow as pa  # Optional dependency, only needed for Arrow output
+
+            self.arrowSchema = pa.schema([(name, pa.float64()) for name in ColumnNames()])
+            self.arrowWriter = pa.ipc.new_file(self.file, self.arrowSchema)
+        else:
+            self.file.write(NpyHeader(0))
+        return
+
+    def ReserveWeek(self):
+        # Offset of the next week in the chunk buffer, flushing the buffer to disk when it is full
+        if self.bufferedWeeks == self.chunkWeeks:
+            self.Flush()
+        offset = self.bufferedWeeks * self.rowLength
+        self.bufferedWeeks += 1
+        return offset
+
+    def Flush(self):
+        # Append the buffered weeks to the file and empty the buffer
+        if self.bufferedWeeks == 0 or self.file.closed:
+            return
+        chunk = memoryview(self.data)[:self.bufferedWeeks * self.rowLength]
+
+        if self.useArrow:
+            import numpy as np
+            import pyarrow as pa
+
+            columns = np.frombuffer(chunk, dtype=np.float64).reshape(self.bufferedWeeks, self.rowLength)
+            batch = pa.RecordBatch.from_arrays([pa.array(columns[:, i]) for i in range(self.rowLength)],
+                                               schema=self.arrowSchema)
+            self.arrowWriter.write_batch(batch)
+        else:
+            self.file.write(chunk)
+            # Keep the header in step so the file can be memory-mapped while the run is still going
+            self.file.seek(0)
+            self.file.write(NpyHeader(self.weeksRecorded))
+            self.file.seek(0, 2)
+            self.file.flush()
+
+        self.bufferedWeeks = 0
+        return
+
+    def Close(self):
+        # Write the last partial chunk and finish the file
+        if self.file.closed:
+            return
+        self.Flush()
+        if self.useArrow:
+            self.arrowWriter.close()
+        self.file.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.Close()
+        return False
+
+    def AsArray(self):
+        # Memory-mapped (weeks, tiers, metrics) view of everything recorded so far
+        if self.useArrow:
+            self.Close()  # An Arrow IPC file can only be read once its footer is written
+        else:
+            self.Flush()
+        return LoadStreamedStatistics(self.path)
+
+def LoadStreamedStatistics(path):
+    # Lazily open a file written by StreamingStatistics as a (weeks, tiers, metrics) array
+    # .npy files are memory-mapped read-only, so weeks are only read from disk when they are touched;
+    # Arrow files are memory-mapped too, but gathering their columns into one array copies them
+    import numpy as np
+
+    path = str(path)
+    if not path.endswith(ARROW_EXTENSIONS):
+        return np.load(path, mmap_mode='r')
+
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    columns = [table.column(name).to_numpy() for name in ColumnNames()]
+    history = np.stack(columns, axis=1) if columns[0].size else np.empty((0, len(ColumnNames())))
+    return history.reshape(-1, len(TIER_NAMES), len(METRIC_NAMES))
@@ -0,0 +1,40 @@
+"""Parameter sweeps: run a Cartesian grid of configs across worker processes."""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import DEFAULT_CONFIG
+from .simulation import run_simulation
+
+def config_grid(baseConfig=DEFAULT_CONFIG, **axes):
+    # Cartesian product of the given settings, e.g. config_grid(targetStock=[8, 12], queueDelayWeeks=[1, 2, 4])
+    # Settings that are not swept keep their value from 'baseConfig'
+    names = list(axes)
+    return [baseConfig.Replace(**dict(zip(names, values))) for values in itertools.product(*axes.values())]
+
+def _RunAndSummarize(config, cache=None):
+    # Worker entry point: play one config quietly (or read it from 'cache') and send back only its summary row
+    if cache is not None:
+        return cache.Run(config).Summarize()
+    return run_simulation(config).Summarize()
+
+def run_sweep(configs, maxWorkers=None, chunksize=None, cache=None):
+    # Run every config and return one tidy pandas DataFrame with a row per config
+    # 'maxWorkers' defaults to the number of cores; 1 runs everything in this process
+    # 'cache' is an optional ResultCache shared by all workers, so repeated configs are only played once
+    import pandas as pd  # Imported lazily so workers and single runs never load pandas
+
+    configs = list(configs)
+    maxWorkers = maxWorkers or os.cpu_count() or 1
+
+    if maxWorkers == 1 or len(configs) <= 1:
+        rows = [_RunAndSummarize(config, cache) for config in configs]
+    else:
+        # Each run takes about a millisecond, so hand configs out in large chunks to amortize the IPC cost
+        if chunksize is None:
+            chunksize = max(1, len(configs) // (maxWorkers * 8))
+        with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+            rows = list(executor.map(_RunAndSummarize, configs, itertools.repeat(cache), chunksize=chunksize))
+
+    return pd.DataFrame.from_records(rows)